@@ -1,6 +1,15 @@
-import csv
+import argparse
 import os
-import re  # ← TILFØJET: Nødvendig for email-validering i Lærer klassen
+import sys
+
+import instrumentering
+from dubletter import Dubletsøgning
+from listevisning import Listevisning, bladr
+from personregister import LISTE, TAL, TEKST, RegisterSkema
+from registerprogram import Registerprogram
+from statistik import Statistik
+from tjeneste import STANDARD_ADRESSE
+from validering import EMAIL_MØNSTER
 
 # --- Klasser ---
 class Person:
@@ -47,7 +56,9 @@ class Lærer(Person):
         # Brug properties - dette kalder automatisk setters med validering
         self.email = email
         self.telefon = telefon
-        self._fag = fag if fag else []
+        # dict bruges som ordnet mængde: fagene beholder rækkefølgen, og
+        # opslag, tilføjelse og fjernelse er O(1)
+        self._fag = dict.fromkeys(fag or ())
     
     @property
     def email(self):
@@ -65,9 +76,8 @@ class Lærer(Person):
         if not isinstance(value, str):
             raise TypeError("Email skal være tekst")
         
-        # Regex mønster for email-validering
-        email_mønster = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_mønster, value):
+        # Prækompileret regex-mønster for email-validering (delt med validering.py)
+        if not EMAIL_MØNSTER.match(value):
             raise ValueError("Email skal have formatet: navn@domæne.dk")
         
         self._email = value
@@ -100,87 +110,129 @@ class Lærer(Person):
     @property
     def fag(self):
         """
-        Getter for fag - returnerer en kopi så den interne liste ikke kan ændres direkte.
+        Getter for fag - returnerer en skrivebeskyttet visning af fagene uden at kopiere dem.
         Dette beskytter vores data - brugere skal bruge tilføj_fag() og fjern_fag().
         """
-        return self._fag.copy()
+        return self._fag.keys()
     
     def tilføj_fag(self, fag_navn):
         """Tilføj et fag til lærerens fagliste hvis det ikke allerede findes."""
         if fag_navn not in self._fag:
-            self._fag.append(fag_navn)
+            self._fag[fag_navn] = None
             return True
         return False
     
     def fjern_fag(self, fag_navn):
         """Fjern et fag fra lærerens fagliste hvis det findes."""
         if fag_navn in self._fag:
-            self._fag.remove(fag_navn)
+            del self._fag[fag_navn]
             return True
         return False
     
     def __str__(self):
-        fag_tekst = ", ".join(self._fag) if self._fag else "Ingen fag tildelt"
+        fag_tekst = ", ".join(self.fag) if self.fag else "Ingen fag tildelt"
         return (f"{super().__str__()}, Email: {self.email}, "
                 f"Telefon: {self.telefon}, Fag: {fag_tekst}")
 
 
+# --- Skema for det kolonnebaserede register ---
+SKEMA = RegisterSkema(
+    felter={
+        "navn": TEKST, "alder": TAL, "adresse": TEKST,
+        "pensionist": TEKST, "indkomst": TEKST, "husleje": TEKST,
+        "email": TEKST, "telefon": TEKST, "fag": LISTE,
+    },
+    typer={
+        Person: ("navn", "alder", "adresse"),
+        Borger: ("navn", "alder", "adresse", "pensionist", "indkomst", "husleje"),
+        Lærer: ("navn", "alder", "adresse", "email", "telefon", "fag"),
+    },
+    indekser=("navn", "fag"),
+    intervaller=("alder", "indkomst", "husleje"),
+)
+
+# Klasserne slået op på navn (fx fra type-feltet i CSV-filen)
+KLASSER = {klasse.__name__: klasse for klasse in SKEMA.klasser}
+
+# Kolonnerne i CSV-filen
+CSV_KOLONNER = ["navn", "alder", "adresse", "pensionist", "indkomst", "husleje"]  # ← RETTET: adresse tilføjet
+
+
 # --- Filnavn ---
 FILENAME = "personliste.csv"
 
 
+# --- Oversæt én CSV-række til type og feltværdier (uden validering) ---
+def række_til_felter(row):
+    navn = row["navn"]
+    alder = row["alder"]
+    adresse = row.get("adresse", "")  # ← TILFØJET
+    pensionist = row.get("pensionist", "")
+    indkomst = row.get("indkomst", "")
+    husleje = row.get("husleje", "")
+    
+    if indkomst or husleje:
+        return "Borger", {"navn": navn, "alder": alder, "adresse": adresse,
+                          "pensionist": pensionist, "indkomst": indkomst, "husleje": husleje}
+    return "Person", {"navn": navn, "alder": alder, "adresse": adresse}
+
+
+# --- Opret objekt ud fra type og feltværdier ---
+def opret_person(type_navn, felter):
+    felter = dict(felter)
+    fag = felter.pop("fag", ())
+    try:
+        person = KLASSER[type_navn](**felter)  # Setterne validerer værdierne
+    except (TypeError, ValueError):
+        instrumentering.tæl("setter_fejl")
+        raise
+    instrumentering.tæl("objekter_oprettet")
+    for fag_navn in fag:
+        person.tilføj_fag(fag_navn)
+    return person
+
+
+# --- Filer, lager, batchkørsel og registertjeneste (se registerprogram.py) ---
+PROGRAM = Registerprogram(
+    SKEMA, CSV_KOLONNER, række_til_felter, opret_person,
+    mappe=os.path.dirname(os.path.abspath(__file__)), filnavn=FILENAME,
+    betegnelse="personer/Borgere",
+)
+
+
 # --- Gem listen til CSV ---
 def gem_personer_csv(personer):
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    filepath = os.path.join(script_dir, FILENAME)
-    
-    felt_navn = ["navn", "alder", "adresse", "pensionist", "indkomst", "husleje"]  # ← RETTET: adresse tilføjet
-    with open(filepath, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=felt_navn)
-        writer.writeheader()
-        for p in personer:
-            row = {
-                "navn": p.navn,
-                "alder": p.alder,
-                "adresse": p.adresse,  # ← TILFØJET
-                "pensionist": getattr(p, "pensionist", ""),
-                "indkomst": getattr(p, "indkomst", ""),
-                "husleje": getattr(p, "husleje", "")
-            }
-            writer.writerow(row)
+    filepath = PROGRAM.filsti()
+    PROGRAM.skriv_personer_csv(personer, filepath)
     print(f"Listen er gemt i '{filepath}' (CSV-fil).")
 
 
 # --- Indlæs liste fra CSV ---
-def indlaes_personer_csv():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    filepath = os.path.join(script_dir, FILENAME)
-    
-    personer = []
-    if os.path.exists(filepath):
-        with open(filepath, "r", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                navn = row["navn"]
-                alder = int(row["alder"])
-                adresse = row.get("adresse", "")  # ← TILFØJET
-                pensionist = row.get("pensionist", "")
-                indkomst = row.get("indkomst", "")
-                husleje = row.get("husleje", "")
-                
-                if indkomst or husleje:
-                    personer.append(Borger(navn, alder, adresse, pensionist, indkomst, husleje))  # ← RETTET
-                else:
-                    personer.append(Person(navn, alder, adresse))  # ← RETTET
-        print(f"{len(personer)} personer/Borgere indlæst fra '{filepath}'")
-    else:
-        print("Ingen tidligere fil fundet, starter med tom liste.")
-    return personer
+def indlaes_personer_csv(rapport=None):
+    return PROGRAM.indlaes_personer_csv(rapport)
+
+
+# --- Læs personer fra CSV én ad gangen (streaming) ---
+def iter_personer_csv(filepath=None, batch_størrelse=None, rapport=None):
+    return PROGRAM.iter_personer_csv(filepath, batch_størrelse, rapport)
+
+
+# --- Formatér et beløb til visning (NaN = ingen værdier) ---
+def _beløb(værdi):
+    return "-" if værdi != værdi else f"{værdi:,.0f}".replace(",", ".")
 
 
 # --- Terminalprogram ---
-def main():
-    personer = indlaes_personer_csv()
+def main(klient_adresse=None):
+    startet = PROGRAM.start(klient_adresse)
+    if startet is None:
+        return
+    # Med en registertjeneste er registeret tjenestens kopi og motoren klienten
+    personer, motor = startet
+    # Sidevis visning - formaterede linjer caches indtil personen ændres
+    liste = Listevisning(personer)
+    # Tal for Borgere - kolonnerne holdes ajour, resultaterne caches mellem visninger
+    statistik = Statistik(personer, "Borger", ("indkomst", "husleje"))
 
     while True:
         print("\n--- Person/Borger Registrering ---")
@@ -188,31 +240,43 @@ def main():
         print("2. Vis alle personer")
         print("3. Opgrader person til Borger")  # ← RETTET tekst
         print("4. Gem liste som CSV")
-        print("5. Afslut")
+        print("5. Vis statistik for Borgere")
+        print("6. Find dubletter")
+        print("7. Afslut")
         valg = input("Vælg en mulighed: ")
+        PROGRAM.synkroniser()  # Andre terminalers ændringer, hvis der er en tjeneste
 
         if valg == "1":
             navn = input("Indtast navn: ")
             alder_input = input("Indtast alder: ")
             adresse = input("Indtast adresse: ")  # ← TILFØJET
             try:
-                alder = int(alder_input)
-                p = Person(navn, alder, adresse)  # ← RETTET
-                personer.append(p)
+                motor.udfør({"kommando": "tilføj", "type": "Person",
+                             "navn": navn, "alder": alder_input, "adresse": adresse})
                 print("Person tilføjet!")
-            except ValueError:
-                print("⚠ Alder skal være et heltal.")
+            except (TypeError, ValueError, ConnectionError) as e:
+                print(f"⚠ {e}")
 
         elif valg == "2":
             if not personer:
                 print("Ingen personer registreret endnu.")
             else:
+                type_navn = input("Vis kun type (Person/Borger, Enter for alle): ").strip()
+                if type_navn and type_navn not in KLASSER:
+                    print("Ukendt type.")
+                    continue
+                navn_præfiks = input("Navn begynder med (Enter for alle): ")
+                interval = input("Interval, fx alder=60-67 eller husleje=5000- (Enter for alle): ").strip()
+                try:
+                    filter = PROGRAM.læs_interval(interval) if interval else {}
+                except ValueError as e:
+                    print(f"⚠ {e}")
+                    continue
                 print("\n--- Registrerede personer/Borgere ---")
-                for i, person in enumerate(personer, start=1):
-                    print(f"{i}. {person}")
+                bladr(liste, type_navn=type_navn or None, navn_præfiks=navn_præfiks or None, **filter)
 
         elif valg == "3":
-            ikke_borgere = [p for p in personer if not isinstance(p, Borger)]
+            ikke_borgere = personer.af_type(Person, Lærer)  # Opslag i type-indekset
             if not ikke_borgere:
                 print("Ingen personer at opgradere.")
                 continue
@@ -232,18 +296,52 @@ def main():
             indkomst = input("Indtast indkomst: ")
             husleje = input("Indtast husleje: ")
             
-            # ← RETTET: Korrekt rækkefølge og parameter
-            borger = Borger(person_valgt.navn, person_valgt.alder, person_valgt.adresse, 
-                           pensionist, indkomst, husleje)
-            personer[personer.index(person_valgt)] = borger
-            print(f"{borger.navn} er nu Borger!")
+            # Navn, alder og adresse følger med over i Borger-rækken
+            try:
+                motor.udfør({"kommando": "opgrader", "id": personer.index(person_valgt), "type": "Borger",
+                             "pensionist": pensionist, "indkomst": indkomst, "husleje": husleje})
+            except (TypeError, ValueError, ConnectionError) as e:
+                print(f"⚠ {e}")
+                continue
+            print(f"{person_valgt.navn} er nu Borger!")
 
         elif valg == "4":
-            gem_personer_csv(personer)
+            PROGRAM.gem(motor)  # Skrives af baggrundstråden - menuen venter ikke
 
         elif valg == "5":
+            if not statistik.antal():
+                print("Ingen Borgere registreret endnu.")
+                continue
+            print(f"\n--- Statistik for {statistik.antal()} Borgere ---")
+            for felt, tal in statistik.oversigt().items():
+                print(f"{felt.capitalize()}: sum {_beløb(tal['sum'])}, gennemsnit {_beløb(tal['middel'])}, "
+                      f"median {_beløb(tal['median'])} ({tal['antal']} med værdi)")
+            pensionister = statistik.antal(pensionist="Ja")
+            print(f"Pensionister: {pensionister}")
+            if pensionister:
+                print(f"Gennemsnitlig indkomst blandt pensionister: {_beløb(statistik.middel('indkomst', pensionist='Ja'))}")
+
+        elif valg == "6":
+            søgning = Dubletsøgning(personer)
+            if not søgning:
+                print("Ingen dubletter fundet.")
+                continue
+            print(f"\n--- {len(søgning)} mulige dubletter ---")
+            for dublet in søgning.dubletter[:20]:
+                print(f"{dublet.score:.2f}: {personer[dublet.række_a]}\n      {personer[dublet.række_b]}")
+            if input("Flet dubletterne? (ja/nej): ").strip().lower() == "ja":
+                try:
+                    fjernet, konflikter = PROGRAM.flet(søgning)
+                except (ValueError, ConnectionError) as e:
+                    print(f"⚠ Fejl: {e}")
+                    continue
+                print(f"{fjernet} dubletter flettet.")
+                if konflikter:
+                    print(f"⚠ {konflikter} grupper med forskellige typer blev ikke flettet.")
+
+        elif valg == "7":
             print("Program afsluttes.")
-            gem_personer_csv(personer)
+            PROGRAM.afslut()
             break
 
         else:
@@ -251,4 +349,17 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # --stats / --profile [cprofile|tracemalloc|begge] - se instrumentering.py
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", metavar="FIL", help="udfør kommandoer fra en JSONL-fil (- for stdin) uden menu")
+    parser.add_argument("--server", metavar="ADRESSE", nargs="?", const=STANDARD_ADRESSE,
+                        help=f"kør registertjenesten (standard {STANDARD_ADRESSE}, eller unix:/sti)")
+    parser.add_argument("--klient", metavar="ADRESSE", nargs="?", const=STANDARD_ADRESSE,
+                        help="brug menuen mod en kørende registertjeneste")
+    args = parser.parse_args(instrumentering.konfigurer())
+    if args.batch:
+        sys.exit(0 if PROGRAM.kør_batch(args.batch) else 1)
+    if args.server:
+        PROGRAM.kør_tjeneste(args.server)
+    else:
+        main(args.klient)
\ No newline at end of file
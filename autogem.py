@@ -0,0 +1,132 @@
+"""
+Automatisk gemning i baggrunden.
+
+Autogem lytter på et PersonRegistry og noterer blot tidspunktet for hver
+ændring. En baggrundstråd sikrer ændringerne, når der har været ro i
+`interval` sekunder (debounce) - dog senest `maks_ventetid` sekunder efter
+den første ugemte ændring, så en lind strøm af ændringer ikke udskyder det
+i det uendelige. Terminalprogrammet venter aldrig på disken.
+
+Der er to funktioner uden argumenter: synkroniser() kaldes efter ro og
+skal være billig, fx Journal.synkroniser (fsync af de linjer der allerede
+er skrevet); gem() er den fulde gemning, fx Journal.komprimer, og kaldes
+kun når nogen beder om det med gem_nu(). Uden synkroniser bruges gem()
+også efter ro.
+"""
+import os
+import threading
+import time
+
+# Sekunder uden ændringer før der gemmes
+STANDARD_INTERVAL = 2.0
+# Der gemmes senest så mange sekunder efter den første ugemte ændring
+MAKS_VENTETID = 30.0
+
+
+def gem_atomisk(register, skriv, sti):
+    """
+    Skriv en kopi af registeret med skriv(register, filsti) til en midlertidig
+    fil og skift den ind med os.replace. Kan kaldes fra en anden tråd.
+    """
+    kopi = register._kolonnekopi()
+    midlertidig = sti + ".tmp"
+    skriv(kopi, midlertidig)
+    with open(midlertidig, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(midlertidig, sti)
+
+
+class Autogem:
+    """Baggrundstråd der kalder synkroniser() når registeret har været ændret og der er ro."""
+    def __init__(self, register, gem, synkroniser=None, interval=STANDARD_INTERVAL, maks_ventetid=MAKS_VENTETID):
+        self.register = register
+        self.gem = gem
+        self.synkroniser = synkroniser or gem
+        self.interval = interval
+        self.maks_ventetid = maks_ventetid
+        # Seneste fejl fra baggrundstråden (ændringerne forsøges gemt igen)
+        self.fejl = None
+        self.antal_gemninger = 0
+        self._betingelse = threading.Condition()
+        self._første = None   # tidspunkt for første ugemte ændring
+        self._seneste = None  # tidspunkt for seneste ændring
+        self._gem_nu = False
+        self._fuld = False    # næste gemning efter ro skal være fuld (gem() fejlede)
+        self._stop = False
+        register.tilføj_lytter(self._hændelse)
+        self._tråd = threading.Thread(target=self._løkke, name="autogem", daemon=True)
+        self._tråd.start()
+
+    def _hændelse(self, hændelse, række_id):
+        nu = time.monotonic()
+        with self._betingelse:
+            if self._første is None:
+                self._første = nu
+            self._seneste = nu
+            self._betingelse.notify()
+
+    @property
+    def ugemt(self):
+        """Om der er ændringer der endnu ikke er gemt."""
+        with self._betingelse:
+            return self._første is not None or self._gem_nu
+
+    def gem_nu(self):
+        """Bed baggrundstråden gemme med det samme. Vender tilbage uden at vente."""
+        with self._betingelse:
+            self._gem_nu = True
+            self._betingelse.notify()
+
+    def _vent_på_gemning(self):
+        """
+        Vent til der skal gemmes. Returnerer (funktion, stop), hvor funktion
+        er gem, synkroniser eller None hvis der intet er at gemme.
+        """
+        with self._betingelse:
+            while True:
+                if self._stop or self._gem_nu:
+                    break
+                if self._første is None:
+                    self._betingelse.wait()
+                    continue
+                frist = min(self._seneste + self.interval, self._første + self.maks_ventetid)
+                tilbage = frist - time.monotonic()
+                if tilbage <= 0:
+                    break
+                self._betingelse.wait(tilbage)
+            if self._gem_nu or (self._fuld and self._første is not None):
+                funktion = self.gem
+            elif self._første is not None:
+                funktion = self.synkroniser
+            else:
+                funktion = None
+            self._første = self._seneste = None
+            self._gem_nu = self._fuld = False
+            return funktion, self._stop
+
+    def _løkke(self):
+        while True:
+            funktion, stop = self._vent_på_gemning()
+            if funktion is not None:
+                try:
+                    funktion()
+                    self.antal_gemninger += 1
+                    self.fejl = None
+                except Exception as fejl:
+                    self.fejl = fejl
+                    print(f"\n⚠ Automatisk gemning fejlede: {fejl}")
+                    if not stop:
+                        # Prøv igen efter næste interval
+                        with self._betingelse:
+                            self._fuld = funktion is self.gem
+                        self._hændelse("fejl", None)
+            if stop:
+                return
+
+    def luk(self):
+        """Sikr evt. ugemte ændringer og stop tråden (venter på at den bliver færdig)."""
+        self.register.fjern_lytter(self._hændelse)
+        with self._betingelse:
+            self._stop = True
+            self._betingelse.notify()
+        self._tråd.join()
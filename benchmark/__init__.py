@@ -0,0 +1,13 @@
+"""
+Benchmarks for KODE.py og registrerings-system-1-1.py.
+
+Genererer deterministiske syntetiske registre i begge scripts' CSV-format og
+måler indlæsning, gemning, "Vis alle personer" og oprettelse af Lærer-objekter.
+Resultaterne gemmes som JSON, så to kørsler kan sammenlignes:
+
+    python -m benchmark --rækker 10000 100000 --ud resultater.json
+    python -m benchmark --rækker 10000 --sammenlign resultater.json
+"""
+from benchmark.generator import generer_kode_csv, generer_registrering_csv
+
+__all__ = ["generer_kode_csv", "generer_registrering_csv"]
@@ -0,0 +1,55 @@
+"""Kør benchmarks fra kommandolinjen: python -m benchmark --help"""
+import argparse
+import json
+import sys
+import tempfile
+
+from benchmark.maaling import FASER, SKEMAER, gem_resultater, kør_skema, sammenlign
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description=__doc__)
+    parser.add_argument("--rækker", type=int, nargs="+", default=[10_000],
+                        help="registerstørrelser, fx 10000 1000000 10000000")
+    parser.add_argument("--skema", choices=sorted(SKEMAER), nargs="+", default=sorted(SKEMAER))
+    parser.add_argument("--faser", choices=FASER, nargs="+", default=FASER)
+    parser.add_argument("--frø", type=int, default=0)
+    parser.add_argument("--data-mappe", help="genbrug genererede filer i denne mappe")
+    parser.add_argument("--uden-hukommelse", action="store_true", help="spring tracemalloc-målingen over")
+    parser.add_argument("--ud", help="gem resultaterne som JSON")
+    parser.add_argument("--sammenlign", help="JSON-fil fra en tidligere kørsel")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="tilladt forværring før en måling regnes som regression")
+    args = parser.parse_args(argv)
+
+    resultater = []
+    with tempfile.TemporaryDirectory() as midlertidig:
+        mappe = args.data_mappe or midlertidig
+        for skema in args.skema:
+            for rækker in args.rækker:
+                for r in kør_skema(skema, rækker, mappe, args.faser, args.frø, not args.uden_hukommelse):
+                    resultater.append(r)
+                    peak = f"{r['peak_bytes'] / 1e6:9.1f} MB" if r["peak_bytes"] is not None else ""
+                    if r.get("beholdt_bytes") is not None:
+                        peak += f" (beholdt {r['beholdt_bytes'] / 1e6:.1f} MB)"
+                    print(f"{skema:13} {rækker:>10} {r['fase']:20} {r['sekunder']:9.3f} s "
+                          f"{r['rækker_pr_sek']:>12.0f} rækker/s {peak}")
+
+    if args.ud:
+        gem_resultater(args.ud, resultater)
+        print(f"Resultater gemt i '{args.ud}'")
+
+    if args.sammenlign:
+        with open(args.sammenlign, encoding="utf-8") as f:
+            gamle = json.load(f)["resultater"]
+        regressioner = sammenlign(gamle, resultater, args.tolerance)
+        for (skema, rækker, fase), gammel, ny, ændring in regressioner:
+            print(f"⚠ Regression: {skema} {rækker} {fase}: {gammel:.3f} s -> {ny:.3f} s (+{ændring:.0%})")
+        if regressioner:
+            return 1
+        print("Ingen regressioner.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Deterministisk generator af syntetiske personregistre.
+
+Samme antal rækker og samme frø giver altid præcis den samme fil, så
+målinger fra forskellige kørsler kan sammenlignes.
+"""
+import csv
+import random
+
+FORNAVNE = [
+    "Anders", "Bente", "Christian", "Dorthe", "Erik", "Freja", "Gustav", "Hanne",
+    "Ida", "Jens", "Karen", "Lars", "Mette", "Niels", "Olivia", "Peter", "Rikke",
+    "Søren", "Tove", "Ulrik", "Vibeke", "William", "Åse", "Øjvind",
+]
+EFTERNAVNE = [
+    "Jensen", "Nielsen", "Hansen", "Pedersen", "Andersen", "Christensen",
+    "Larsen", "Sørensen", "Rasmussen", "Jørgensen", "Petersen", "Madsen",
+]
+VEJE = ["Hovedgaden", "Skolevej", "Kirkevej", "Møllevej", "Strandvejen", "Åboulevarden"]
+SKOLER = ["Nørrevangsskolen", "Søndre Skole", "Vestre Skole", "Østervangsskolen", "Byskolen"]
+FAG = ["Dansk", "Matematik", "Engelsk", "Historie", "Biologi", "Fysik", "Idræt", "Musik"]
+KØN = ["M", "K"]
+
+
+def _ascii(tekst):
+    # Lærer.email accepterer kun a-z i navnedelen
+    return tekst.lower().replace("æ", "ae").replace("ø", "oe").replace("å", "aa")
+
+
+def _navn(tilfældig):
+    return f"{tilfældig.choice(FORNAVNE)} {tilfældig.choice(EFTERNAVNE)}"
+
+
+def _telefon(tilfældig):
+    cifre = f"{tilfældig.randrange(20000000, 99999999)}"
+    # Forskellige inputformater, som Lærer.telefon skal normalisere
+    return tilfældig.choice([cifre, f"{cifre[:4]} {cifre[4:]}", f"{cifre[:2]}-{cifre[2:4]}-{cifre[4:6]}-{cifre[6:]}"])
+
+
+def generer_kode_csv(sti, rækker, frø=0):
+    """Skriv et register i KODE.py's format (Person/Borger)."""
+    tilfældig = random.Random(frø)
+    with open(sti, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["navn", "alder", "adresse", "pensionist", "indkomst", "husleje"])
+        for _ in range(rækker):
+            alder = tilfældig.randrange(0, 100)
+            adresse = f"{tilfældig.choice(VEJE)} {tilfældig.randrange(1, 200)}"
+            if tilfældig.random() < 0.6:
+                writer.writerow([
+                    _navn(tilfældig), alder, adresse,
+                    "Ja" if alder >= 67 else "Nej",
+                    tilfældig.randrange(0, 80) * 5000,
+                    tilfældig.randrange(20, 160) * 50,
+                ])
+            else:
+                writer.writerow([_navn(tilfældig), alder, adresse, "", "", ""])
+
+
+def generer_registrering_csv(sti, rækker, frø=0):
+    """Skriv et register i registrerings-system-1-1.py's format (Person/Elev/Lærer)."""
+    tilfældig = random.Random(frø)
+    with open(sti, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["type", "navn", "alder", "køn", "skole", "klassetrin", "email", "telefon", "fag"])
+        for nummer in range(rækker):
+            navn = _navn(tilfældig)
+            køn = tilfældig.choice(KØN)
+            valg = tilfældig.random()
+            if valg < 0.6:
+                writer.writerow([
+                    "Elev", navn, tilfældig.randrange(6, 17), køn,
+                    tilfældig.choice(SKOLER), tilfældig.randrange(0, 10), "", "", "",
+                ])
+            elif valg < 0.8:
+                email = f"{_ascii(navn.split()[0])}.{nummer}@skole.dk"
+                fag = ";".join(tilfældig.sample(FAG, tilfældig.randrange(1, 4)))
+                writer.writerow([
+                    "Lærer", navn, tilfældig.randrange(25, 67), køn,
+                    "", "", email, _telefon(tilfældig), fag,
+                ])
+            else:
+                writer.writerow(["Person", navn, tilfældig.randrange(0, 100), køn, "", "", "", "", ""])
@@ -0,0 +1,196 @@
+"""
+Målinger af indlæsning, gemning, "Vis alle personer" og oprettelse af Lærer-objekter.
+
+Hver fase køres først uden tracemalloc for at få en ren tidsmåling og
+derefter (valgfrit) med tracemalloc for at måle peak-hukommelse og hvor
+meget resultatet (fx det indlæste register) stadig fylder bagefter.
+"""
+import contextlib
+import gc
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmark.generator import FAG, generer_kode_csv, generer_registrering_csv
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# skema-navn -> (script, generator)
+SKEMAER = {
+    "kode": ("KODE.py", generer_kode_csv),
+    "registrering": ("registrerings-system-1-1.py", generer_registrering_csv),
+}
+FASER = ["indlæs", "indlæs_snapshot", "indlæs_filtreret", "gem", "visning", "visning_side", "lærer_konstruktion"]
+# Udsnittet indlæs_filtreret henter for hvert skema (se filtrering.Filter)
+FILTRE = {
+    "kode": {"type": "Borger", "pensionist": "Ja"},
+    "registrering": {"type": "Elev", "skole": "Vestre Skole"},
+}
+
+
+def indlæs_script(filnavn):
+    """
+    Importér et af scriptene som modul.
+    registrerings-system-1-1.py kan ikke importeres med import-sætningen pga. bindestregerne.
+    """
+    if REPO not in sys.path:
+        sys.path.insert(0, REPO)
+    modulnavn = "benchmark_" + os.path.splitext(filnavn)[0].replace("-", "_")
+    if modulnavn not in sys.modules:
+        spec = importlib.util.spec_from_file_location(modulnavn, os.path.join(REPO, filnavn))
+        modul = importlib.util.module_from_spec(spec)
+        # Registreres før kørslen, så processerne i parallel_import kan finde funktionerne
+        sys.modules[modulnavn] = modul
+        spec.loader.exec_module(modul)
+    return sys.modules[modulnavn]
+
+
+def _kør_stille(funktion):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funktion()
+
+
+def _mål(funktion, hukommelse):
+    """Returnér (resultat, sekunder, peak_bytes, beholdt_bytes) for ét kald af funktion."""
+    gc.collect()
+    start = time.perf_counter()
+    resultat = _kør_stille(funktion)
+    sekunder = time.perf_counter() - start
+    peak = beholdt = None
+    if hukommelse:
+        del resultat
+        gc.collect()
+        tracemalloc.start()
+        resultat = _kør_stille(funktion)
+        beholdt, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return resultat, sekunder, peak, beholdt
+
+
+def _vis_alle(personer):
+    """Samme arbejde som menupunktet "Vis alle personer", men skrevet til en buffer."""
+    ud = io.StringIO()
+    for i, person in enumerate(personer, start=1):
+        ud.write(f"{i}. {person}\n")
+    return ud.tell()
+
+
+def _lærer_argumenter(rækker, frø):
+    tilfældig = random.Random(frø)
+    return [
+        (f"Lærer {i}", 30 + i % 35, "K", f"laerer.{i}@skole.dk",
+         f"{20000000 + i % 70000000:08d}", tilfældig.sample(FAG, 2))
+        for i in range(rækker)
+    ]
+
+
+def _byg_lærere(modul, argumenter):
+    lærere = []
+    for navn, alder, tredje, email, telefon, fag in argumenter:
+        lærer = modul.Lærer(navn, alder, tredje, email, telefon)
+        for fag_navn in fag:
+            lærer.tilføj_fag(fag_navn)
+        lærere.append(lærer)
+    return lærere
+
+
+def kør_skema(skema, rækker, mappe, faser=FASER, frø=0, hukommelse=True):
+    """Mål de valgte faser for ét skema og én størrelse. Returnerer en liste af resultater."""
+    script, generator = SKEMAER[skema]
+    modul = indlæs_script(script)
+    csv_sti = os.path.join(mappe, f"{skema}_{rækker}_{frø}.csv")
+    if not os.path.exists(csv_sti):
+        generator(csv_sti, rækker, frø)
+    bin_sti = os.path.join(mappe, f"{skema}_{rækker}_{frø}.bin")
+
+    program = modul.PROGRAM
+    program.filnavn = csv_sti
+    resultater = []
+
+    def gem(fase, sekunder, peak, beholdt):
+        resultater.append({
+            "skema": skema,
+            "rækker": rækker,
+            "fase": fase,
+            "sekunder": sekunder,
+            "rækker_pr_sek": rækker / sekunder if sekunder else None,
+            "peak_bytes": peak,
+            "beholdt_bytes": beholdt,
+        })
+
+    # Indlæsning direkte fra CSV (uden binært snapshot)
+    program.snapshot_filnavn = None
+    personer, sekunder, peak, beholdt = _mål(program.indlaes_personer_csv, hukommelse)
+    if "indlæs" in faser:
+        gem("indlæs", sekunder, peak, beholdt)
+
+    if "indlæs_snapshot" in faser:
+        from snapshot import skriv_snapshot
+        skriv_snapshot(personer, bin_sti, kilde=csv_sti)
+        program.snapshot_filnavn = bin_sti
+        _, sekunder, peak, beholdt = _mål(program.indlaes_personer_csv, hukommelse)
+        program.snapshot_filnavn = None
+        gem("indlæs_snapshot", sekunder, peak, beholdt)
+
+    if "indlæs_filtreret" in faser:
+        from filtrering import Filter
+        _, sekunder, peak, beholdt = _mål(lambda: program.indlaes_personer_filtreret(Filter(**FILTRE[skema])), hukommelse)
+        gem("indlæs_filtreret", sekunder, peak, beholdt)
+
+    if "gem" in faser:
+        ud_sti = os.path.join(mappe, f"{skema}_{rækker}_gemt.csv")
+        _, sekunder, peak, beholdt = _mål(lambda: program.skriv_personer_csv(personer, ud_sti), hukommelse)
+        gem("gem", sekunder, peak, beholdt)
+
+    if "visning" in faser:
+        _, sekunder, peak, beholdt = _mål(lambda: _vis_alle(personer), hukommelse)
+        gem("visning", sekunder, peak, beholdt)
+
+    if "visning_side" in faser:
+        # Første side i den sidevise visning (kun de synlige linjer formateres)
+        from listevisning import Listevisning
+        _, sekunder, peak, beholdt = _mål(lambda: Listevisning(personer).side(), hukommelse)
+        gem("visning_side", sekunder, peak, beholdt)
+
+    if "lærer_konstruktion" in faser:
+        argumenter = _lærer_argumenter(rækker, frø)
+        _, sekunder, peak, beholdt = _mål(lambda: _byg_lærere(modul, argumenter), hukommelse)
+        gem("lærer_konstruktion", sekunder, peak, beholdt)
+
+    return resultater
+
+
+def miljø():
+    return {
+        "tidspunkt": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_antal": os.cpu_count(),
+    }
+
+
+def gem_resultater(sti, resultater):
+    with open(sti, "w", encoding="utf-8") as f:
+        json.dump({"miljø": miljø(), "resultater": resultater}, f, ensure_ascii=False, indent=2)
+
+
+def sammenlign(gamle, nye, tolerance=0.10):
+    """
+    Sammenlign to sæt resultater. Returnerer en liste af (nøgle, gammel, ny, ændring)
+    for målinger der er blevet mere end tolerance langsommere.
+    """
+    før = {(r["skema"], r["rækker"], r["fase"]): r["sekunder"] for r in gamle}
+    regressioner = []
+    for r in nye:
+        nøgle = (r["skema"], r["rækker"], r["fase"])
+        gammel = før.get(nøgle)
+        if gammel and r["sekunder"] > gammel * (1 + tolerance):
+            regressioner.append((nøgle, gammel, r["sekunder"], r["sekunder"] / gammel - 1))
+    return regressioner
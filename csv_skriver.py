@@ -0,0 +1,154 @@
+"""
+Gemning af et PersonRegistry som CSV, hvor kun ændrede partitioner kodes igen.
+
+Registeret sporer ændringer i partitioner af PARTITION_STØRRELSE række-id'er
+(PersonRegistry.partition_versioner). CSVSkriver husker for den fil den sidst
+skrev, hvor hver partition står og hvilken version den blev skrevet fra. Ved
+næste gemning kopieres de uændrede partitioner byte for byte fra den gamle
+fil, og kun de ændrede kodes - en session der retter en håndfuld personer,
+koder altså kun et par partitioner, uanset hvor stor listen er.
+
+Filen er stadig én almindelig CSV-fil i række-id-rækkefølge, så journalens
+række-id'er, indlæsningen, filtreringen og migreringen virker uændret.
+Partitionerne følger række-id'erne i stedet for typen eller navnet, netop
+for at bevare den rækkefølge.
+
+Kodningen sker kolonnevis: hver forskellig tekst CSV-kodes én gang pr.
+symbol, og typens forskelle (typenavnet og felter typen ikke har) ligger i
+tabeller der bygges én gang ud fra skemaet - ingen isinstance pr. række.
+"""
+import os
+import threading
+from collections import namedtuple
+from contextlib import nullcontext
+
+import instrumentering
+from journal import fil_stempel
+from personregister import PARTITION_STØRRELSE, SLETTET, TAL
+
+# Samme linjeskift som csv.writer, så filerne er byte for byte de samme
+LINJESKIFT = "\r\n"
+# Bytes der kopieres ad gangen fra den gamle fil
+_KOPI_BLOK = 1024 * 1024
+
+# Hvad der blev skrevet sidst: filens stempel, registerets identitet,
+# partitionernes versioner og (start, længde) i bytes for hver partition
+_Skrevet = namedtuple("_Skrevet", ["stempel", "identitet", "versioner", "placering"])
+
+
+def csv_felt(tekst):
+    """Ét felt som csv.writer skriver det (QUOTE_MINIMAL)."""
+    if "," in tekst or '"' in tekst or "\r" in tekst or "\n" in tekst:
+        return '"' + tekst.replace('"', '""') + '"'
+    return tekst
+
+
+class CSVSkriver:
+    """
+    kolonner er filens kolonner i rækkefølge; "type" giver typenavnet og
+    LISTE-felter skrives med liste_skille mellem elementerne.
+    Én skriver bruges til én fil (se skriv()).
+    """
+    def __init__(self, skema, kolonner, liste_skille=";"):
+        self.skema = skema
+        self.kolonner = tuple(kolonner)
+        self.liste_skille = liste_skille
+        self.hoved = (",".join(map(csv_felt, self.kolonner)) + LINJESKIFT).encode("utf-8")
+        # Typetabeller: typenavnet pr. type-kode og de typer der ikke har hvert talfelt
+        self._type_tekst = [csv_felt(navn) for navn in skema.type_navne]
+        self._type_tekst += [""] * (SLETTET + 1 - len(self._type_tekst))
+        self._ubrugt = {
+            kolonne: frozenset(kode for kode, klasse in enumerate(skema.klasser) if kolonne not in skema.typer[klasse])
+            for kolonne in self.kolonner if skema.felter.get(kolonne) == TAL
+        }
+        # Symbol-id -> færdigkodet CSV-tekst for den symboltabel den hører til
+        self._tabel = None
+        self._tekster = []
+        self._skrevet = None
+        self._lås = threading.Lock()
+
+    # --- Kodning ---
+    def _symbol_tekster(self, symboler):
+        """Listen symbol-id -> CSV-tekst, udvidet med symboler der er kommet til siden sidst."""
+        if symboler is not self._tabel:
+            self._tabel = symboler
+            self._tekster = []
+        tekster = self._tekster
+        for symbol_id in range(len(tekster), len(symboler)):
+            værdi = symboler.værdi(symbol_id)
+            tekster.append(csv_felt(værdi if isinstance(værdi, str) else self.liste_skille.join(værdi)))
+        return tekster
+
+    def _kod_partition(self, register, start, slut, tekster):
+        typer = register._typer[start:slut]
+        felter = []
+        for kolonne in self.kolonner:
+            if kolonne == "type":
+                felter.append(map(self._type_tekst.__getitem__, typer))
+                continue
+            værdier = register._kolonner[kolonne][start:slut]
+            if kolonne not in self._ubrugt:
+                felter.append(map(tekster.__getitem__, værdier))
+            elif self._ubrugt[kolonne]:
+                ubrugt = self._ubrugt[kolonne]
+                felter.append("" if kode in ubrugt else str(værdi) for kode, værdi in zip(typer, værdier))
+            else:
+                felter.append(map(str, værdier))
+        linjer = map(",".join, zip(*felter))
+        if SLETTET in typer:
+            linjer = [linje for kode, linje in zip(typer, linjer) if kode != SLETTET]
+        else:
+            linjer = list(linjer)
+        if not linjer:
+            return b""
+        linjer.append("")
+        return LINJESKIFT.join(linjer).encode("utf-8")
+
+    # --- Skrivning ---
+    def skriv(self, register, sti, forrige=None):
+        """
+        Skriv registeret til sti. forrige er filen den nye fil skal erstatte
+        (fx personliste.csv når der skrives til personliste.csv.tmp); er den
+        stadig den fil denne skriver lavede sidst, kopieres de uændrede
+        partitioner fra den. Uden forrige - eller hvis den er ændret af andre -
+        kodes alt.
+        """
+        with self._lås:
+            identitet, versioner = register.partition_versioner()
+            tidligere = self._skrevet
+            if (tidligere is None or forrige is None or tidligere.identitet != identitet
+                    or os.path.abspath(forrige) == os.path.abspath(sti)
+                    or fil_stempel(forrige) != tidligere.stempel):
+                tidligere = None
+            tekster = self._symbol_tekster(register._symboler)
+            placering = []
+            kodet = genbrugt = 0
+            with open(sti, "wb") as ud, (open(forrige, "rb") if tidligere else nullcontext()) as ind:
+                ud.write(self.hoved)
+                for partition, version in enumerate(versioner):
+                    start = ud.tell()
+                    if (tidligere is not None and partition < len(tidligere.versioner)
+                            and tidligere.versioner[partition] == version):
+                        gammel_start, længde = tidligere.placering[partition]
+                        _kopier(ind, ud, gammel_start, længde)
+                        genbrugt += 1
+                    else:
+                        række_start = partition * PARTITION_STØRRELSE
+                        ud.write(self._kod_partition(register, række_start, række_start + PARTITION_STØRRELSE, tekster))
+                        kodet += 1
+                    placering.append((start, ud.tell() - start))
+            instrumentering.tæl("partitioner_kodet", kodet)
+            instrumentering.tæl("partitioner_genbrugt", genbrugt)
+            if forrige is not None:
+                # Passer kun så længe sti bliver skiftet ind som forrige (os.replace bevarer stemplet)
+                self._skrevet = _Skrevet(fil_stempel(sti), identitet, versioner, placering)
+
+
+def _kopier(ind, ud, start, længde):
+    ind.seek(start)
+    while længde > 0:
+        data = ind.read(min(længde, _KOPI_BLOK))
+        if not data:
+            raise OSError(f"'{ind.name}' er kortere end ventet")
+        ud.write(data)
+        længde -= len(data)
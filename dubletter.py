@@ -0,0 +1,240 @@
+"""
+Find (og evt. flet) dubletter i et PersonRegistry.
+
+At sammenligne alle par af personer er O(n²). I stedet arbejdes der i to trin:
+
+1. Navne: hvert forskelligt navn normaliseres én gang (små bogstaver, uden
+   tegnsætning og ekstra mellemrum). Navnene blokeres på deres ord og de
+   første fire bogstaver af hvert ord, så kun navne der deler en nøgle
+   sammenlignes - fx "Bente" og "bente bent".
+2. Rækker: for hvert par af lignende navne sammenlignes kun rækker hvor
+   det andet felt (adresse eller køn) er ens eller tomt.
+
+Blokke med flere end maks_blok navne springes over (nøglen er for almindelig
+til at sige noget), og det tælles i resultatet.
+"""
+import re
+from collections import defaultdict, namedtuple
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from personregister import TAL
+
+STANDARD_TERSKEL = 0.68
+# Nøgler med flere navne end dette bruges ikke til at finde kandidater
+MAKS_BLOK = 200
+# Højst så mange rækkepar sammenlignes for ét par af navne
+MAKS_PAR = 10_000
+
+# Vægte for navn, andet felt og alder i den samlede score
+_VÆGTE = (0.6, 0.25, 0.15)
+_IKKE_ORD = re.compile(r"[^\w\s]")
+
+Dublet = namedtuple("Dublet", ["score", "række_a", "række_b"])
+
+
+def normaliser(tekst):
+    """Små bogstaver, ingen tegnsætning og enkelt mellemrum: " Bente-Bent. " -> "bente bent"."""
+    return " ".join(_IKKE_ORD.sub(" ", tekst.casefold()).split())
+
+
+def _nøgler(navn):
+    nøgler = set()
+    for ord_ in navn.split():
+        nøgler.add(ord_)
+        if len(ord_) > 4:
+            nøgler.add(ord_[:4])
+    return nøgler
+
+
+def navne_lighed(a, b):
+    """Lighed mellem to normaliserede navne fra 0 til 1."""
+    if a == b:
+        return 1.0
+    ord_a, ord_b = set(a.split()), set(b.split())
+    if ord_a and ord_b and (ord_a <= ord_b or ord_b <= ord_a):
+        # Samme navn med ekstra ord - jo flere ekstra, jo lavere
+        return 0.9 + 0.1 * min(len(a), len(b)) / max(len(a), len(b))
+    # Kvadreret, så korte navne der blot ligner hinanden (Bent/Bente) ikke tæller som ens
+    return SequenceMatcher(None, a, b).ratio() ** 2
+
+
+class Dubletsøgning:
+    """
+    Resultatet af en søgning: dubletter (sorteret efter score) og hvor mange
+    blokke der blev sprunget over fordi de var for store.
+    """
+    def __init__(self, register, felt=None, terskel=STANDARD_TERSKEL, maks_blok=MAKS_BLOK, maks_par=MAKS_PAR):
+        self.register = register
+        if felt is None:
+            felt = next((f for f in ("adresse", "køn") if f in register.skema.felter), None)
+        self.felt = felt
+        self.terskel = terskel
+        self.maks_blok = maks_blok
+        self.maks_par = maks_par
+        self.sprunget_over = 0
+        self.dubletter = self._find()
+
+    # --- Trin 1: lignende navne ---
+    def _navnepar(self, navne):
+        """Par af normaliserede navne (inkl. (navn, navn)) med deres lighed."""
+        blokke = defaultdict(list)
+        for navn in navne:
+            for nøgle in _nøgler(navn):
+                blokke[nøgle].append(navn)
+        par = {(navn, navn): 1.0 for navn in navne}
+        for nøgle, blok in blokke.items():
+            if len(blok) > self.maks_blok:
+                self.sprunget_over += 1
+                continue
+            for a, b in combinations(sorted(blok), 2):
+                if (a, b) not in par:
+                    par[a, b] = navne_lighed(a, b)
+        # Kun navnepar der kan nå over terskelen med fuld score for de andre felter
+        mindst = (self.terskel - _VÆGTE[1] - _VÆGTE[2]) / _VÆGTE[0]
+        return {nøgle: lighed for nøgle, lighed in par.items() if lighed >= mindst}
+
+    # --- Trin 2: rækker ---
+    def _find(self):
+        register = self.register
+        symboler = register._symboler
+        navne_kolonne = register._kolonner["navn"]
+        felt_kolonne = register._kolonner[self.felt] if self.felt else None
+
+        normaliseret = {}
+        rækker_for_navn = defaultdict(list)
+        for række_id in register.række_id():
+            symbol_id = navne_kolonne[række_id]
+            navn = normaliseret.get(symbol_id)
+            if navn is None:
+                navn = normaliseret[symbol_id] = normaliser(symboler.værdi(symbol_id))
+            rækker_for_navn[navn].append(række_id)
+
+        felt_værdi = {}
+
+        def felt_for(række_id):
+            if felt_kolonne is None:
+                return ""
+            symbol_id = felt_kolonne[række_id]
+            værdi = felt_værdi.get(symbol_id)
+            if værdi is None:
+                værdi = felt_værdi[symbol_id] = normaliser(symboler.værdi(symbol_id))
+            return værdi
+
+        alder = register._kolonner["alder"]
+        dubletter = []
+        for (navn_a, navn_b), navne_score in self._navnepar(list(rækker_for_navn)).items():
+            for a, b in self._rækkepar(rækker_for_navn[navn_a], rækker_for_navn[navn_b], navn_a == navn_b, felt_for):
+                felt_a, felt_b = felt_for(a), felt_for(b)
+                if felt_a and felt_b:
+                    felt_score = 1.0 if felt_a == felt_b else 0.0
+                else:
+                    felt_score = 0.5  # Ukendt
+                forskel = abs(alder[a] - alder[b])
+                alder_score = 1.0 if forskel == 0 else 0.5 if forskel == 1 else 0.0
+                score = _VÆGTE[0] * navne_score + _VÆGTE[1] * felt_score + _VÆGTE[2] * alder_score
+                if score >= self.terskel:
+                    dubletter.append(Dublet(round(score, 3), min(a, b), max(a, b)))
+        dubletter.sort(key=lambda d: (-d.score, d.række_a, d.række_b))
+        return dubletter
+
+    def _rækkepar(self, rækker_a, rækker_b, samme_navn, felt_for):
+        """Rækkepar hvor det andet felt er ens eller tomt i mindst én af rækkerne."""
+        grupper_a = defaultdict(list)
+        for række_id in rækker_a:
+            grupper_a[felt_for(række_id)].append(række_id)
+        grupper_b = grupper_a if samme_navn else defaultdict(list)
+        if not samme_navn:
+            for række_id in rækker_b:
+                grupper_b[felt_for(række_id)].append(række_id)
+
+        i_alt = sum(map(len, grupper_b.values()))
+        antal = sum(
+            len(gruppe) * (i_alt if værdi == "" else len(grupper_b.get(værdi, ())) + len(grupper_b.get("", ())))
+            for værdi, gruppe in grupper_a.items()
+        )
+        if antal > self.maks_par:
+            self.sprunget_over += 1
+            return
+
+        sete = set()
+        for værdi, gruppe in grupper_a.items():
+            modparter = list(grupper_b.values()) if værdi == "" else [grupper_b.get(værdi, ()), grupper_b.get("", ())]
+            for andre in modparter:
+                for a in gruppe:
+                    for b in andre:
+                        if a != b:
+                            par = (a, b) if a < b else (b, a)
+                            if par not in sete:
+                                sete.add(par)
+                                yield par
+
+    def __len__(self):
+        return len(self.dubletter)
+
+    def klynger(self):
+        """
+        Dubletterne samlet i grupper af række-id'er. Parrene gennemgås efter
+        score, og en række kommer kun med i en gruppe hvis den er dublet af
+        alle gruppens rækker - så "bente bent" ikke binder "Bent" og "Bente" sammen.
+        """
+        par = {(d.række_a, d.række_b) for d in self.dubletter}
+        gruppe_for = {}
+        grupper = []
+        for dublet in self.dubletter:
+            a, b = dublet.række_a, dublet.række_b
+            gruppe_a, gruppe_b = gruppe_for.get(a), gruppe_for.get(b)
+            if gruppe_a is None and gruppe_b is None:
+                gruppe = [a, b]
+                grupper.append(gruppe)
+                gruppe_for[a] = gruppe_for[b] = gruppe
+            elif gruppe_a is None or gruppe_b is None:
+                gruppe, ny = (gruppe_a, b) if gruppe_b is None else (gruppe_b, a)
+                if all((min(ny, x), max(ny, x)) in par for x in gruppe):
+                    gruppe.append(ny)
+                    gruppe_for[ny] = gruppe
+        return sorted(sorted(gruppe) for gruppe in grupper)
+
+
+# --- Fletning ---
+def _beholder(register, gruppe):
+    """Rækken hvis klasse arver fra alle de andres (fx Borger frem for Person), eller None."""
+    klasser = {række_id: register.skema.klasser[register._typer[række_id]] for række_id in gruppe}
+    for række_id in gruppe:
+        if all(issubclass(klasser[række_id], klasse) for klasse in klasser.values()):
+            return række_id
+    return None
+
+
+def flet(register, søgning):
+    """
+    Flet hver klynge af dubletter til én række. Den mest specifikke type
+    beholdes (Borger frem for Person); tomme felter udfyldes fra de andre
+    rækker, som derefter fjernes. Klynger med typer fra forskellige grene
+    (fx Borger og Lærer) flettes ikke.
+    Returnerer (antal fjernede rækker, antal klynger der ikke kunne flettes).
+    """
+    fjernet = konflikter = 0
+    for gruppe in søgning.klynger():
+        beholdt = _beholder(register, gruppe)
+        if beholdt is None:
+            konflikter += 1
+            continue
+        type_navn, felter = register.række_felter(beholdt)
+        ændret = False
+        for række_id in gruppe:
+            if række_id == beholdt:
+                continue
+            _, andre = register.række_felter(række_id)
+            for felt, værdi in felter.items():
+                slags = register.skema.felter[felt]
+                if slags != TAL and not værdi and andre.get(felt):
+                    felter[felt] = andre[felt]
+                    ændret = True
+        if ændret:
+            register.erstat_række(beholdt, type_navn, felter)
+        for række_id in gruppe:
+            if række_id != beholdt:
+                register.fjern(række_id)
+                fjernet += 1
+    return fjernet, konflikter
@@ -0,0 +1,206 @@
+"""
+Indlæs kun de rækker der matcher et filter (predicate pushdown).
+
+Filteret er betingelser på rækkens rå CSV-tekster:
+
+    Filter(type="Lærer")
+    Filter(type="Elev", skole="Vestre Skole")
+    Filter(type="Borger", pensionist="Ja")
+    Filter(alder=(18, 30), køn={"K", "M"})
+    Filter(indkomst=lambda tekst: tekst != "")
+
+En tekst betyder lighed, en mængde "en af", en tuple (fra, til) et interval
+med begge ender inklusive (som SQLiteLager.find) og en funktion et vilkårligt
+krav til den rå tekst. "type" sammenlignes med den type scriptets
+række_til_felter giver rækken - KODE.py har ingen type-kolonne.
+
+Rækkerne sorteres fra i tre trin, det billigste først:
+
+1. Linjen: mangler den rå linje en tekst som en lighedsbetingelse kræver,
+   springes den over uden at blive splittet i felter.
+2. Felterne: linjen splittes, og betingelserne testes på de rå tekster.
+3. Typen: række_til_felter giver typen; kun rækker med den rigtige type
+   valideres og tilføjes registeret. Der oprettes aldrig objekter.
+"""
+import csv
+import os
+
+import instrumentering
+from personregister import LISTE, TAL, PersonRegistry
+from validering import STANDARD_BATCH, ValideringsRapport, valider_rækker
+
+
+def _test(betingelse):
+    """En funktion af den rå tekst for én betingelse."""
+    if callable(betingelse):
+        return betingelse
+    if isinstance(betingelse, (set, frozenset)):
+        værdier = frozenset(map(str, betingelse))
+        return værdier.__contains__
+    if isinstance(betingelse, tuple):
+        fra, til = betingelse
+        if isinstance(fra, int) and isinstance(til, int):
+            def i_interval(tekst):
+                tekst = tekst.strip()
+                return tekst.isdigit() and fra <= int(tekst) <= til
+            return i_interval
+        return lambda tekst: fra <= tekst <= til
+    tekst = str(betingelse)
+    return tekst.__eq__
+
+
+class Filter:
+    """Betingelser på rå felter; se modulets docstring."""
+    def __init__(self, type=None, **felter):
+        if type is None:
+            self.typer = None
+        elif isinstance(type, str):
+            self.typer = frozenset((type,))
+        else:
+            self.typer = frozenset(type)
+        self.felter = felter
+        self._tests = {felt: _test(betingelse) for felt, betingelse in felter.items()}
+        # Tekster der skal stå i linjen for at rækken kan matche (trin 1).
+        # Tekster med anførselstegn står anderledes i filen og bruges ikke.
+        self._påkrævet = [
+            str(betingelse) for betingelse in felter.values()
+            if isinstance(betingelse, (str, int)) and str(betingelse) and '"' not in str(betingelse)
+        ]
+
+    def __repr__(self):
+        betingelser = ([f"type={sorted(self.typer)!r}"] if self.typer else []) + [
+            f"{felt}={betingelse!r}" for felt, betingelse in self.felter.items()]
+        return f"Filter({', '.join(betingelser)})"
+
+    def passer_type(self, type_navn):
+        return self.typer is None or type_navn in self.typer
+
+    # --- Rækker der allerede er i et register ---
+    def passer_række(self, register, række_id):
+        """Samme betingelser på en registerrække; værdierne testes som de ville stå i CSV-filen."""
+        if not self.passer_type(register.type_navn(række_id)):
+            return False
+        for felt, test in self._tests.items():
+            slags = register.skema.felter.get(felt)
+            if slags is None:
+                tekst = ""
+            elif slags == LISTE:
+                tekst = ";".join(register.felt_værdi(række_id, felt))  # Som i CSV-filen
+            else:
+                værdi = register.felt_værdi(række_id, felt)
+                tekst = str(værdi) if slags == TAL else værdi
+            if not test(tekst):
+                return False
+        return True
+
+    # --- Trin 1 og 2 på en åben CSV-fil ---
+    def rækker(self, f, rapport=None):
+        """
+        (rækkenummer, {kolonne: rå tekst}) for de rækker i en åben CSV-fil
+        (newline="") der består trin 1 og 2. Manglende kolonner tæller som
+        tomme. Rækkenumrene tæller alle filens rækker fra 1 = første række
+        efter hovedlinjen; til sidst lægges antallet til rapport.antal_rækker.
+        """
+        poster = _poster(f)
+        kolonner = next(csv.reader(poster), None)
+        if kolonner is None:
+            return
+        # Har filen en type-kolonne, kan typen også testes allerede i trin 1 og 2
+        tests = dict(self._tests)
+        påkrævet = list(self._påkrævet)
+        if self.typer is not None and "type" in kolonner:
+            tests["type"] = self.typer.__contains__
+            if len(self.typer) == 1:
+                påkrævet.extend(self.typer)
+        nummer = 0
+
+        def kandidater():
+            nonlocal nummer
+            for nummer, post in enumerate(poster, start=1):
+                if all(tekst in post for tekst in påkrævet):
+                    yield post
+
+        antal_kolonner = len(kolonner)
+        for felter in csv.reader(kandidater()):
+            if not felter:
+                continue
+            if len(felter) < antal_kolonner:
+                felter += [None] * (antal_kolonner - len(felter))
+            række = dict(zip(kolonner, felter))
+            if all(test("" if (værdi := række.get(felt)) is None else værdi) for felt, test in tests.items()):
+                yield nummer, række
+        if rapport is not None:
+            rapport.antal_rækker += nummer
+
+
+def _poster(f):
+    """
+    Filens CSV-poster som tekst, én ad gangen. En linje med et ulige antal
+    anførselstegn slutter inde i et felt og samles med de næste linjer.
+    """
+    for linje in f:
+        antal = linje.count('"')
+        if antal % 2:
+            dele = [linje]
+            for linje in f:
+                dele.append(linje)
+                antal += linje.count('"')
+                if antal % 2 == 0:
+                    break
+            linje = "".join(dele)
+        yield linje
+
+
+# --- Indlæsning ---
+def indlæs_filtreret(filsti, række_til_felter, skema, filter, rapport=None, batch_størrelse=STANDARD_BATCH):
+    """
+    Indlæs kun de rækker i CSV-filen der matcher filteret. Valideringsfejl i
+    de matchende rækker noteres i rapporten med filens rækkenumre; rækker der
+    er sorteret fra, valideres ikke.
+    """
+    if rapport is None:
+        rapport = ValideringsRapport()
+    register = PersonRegistry(skema)
+    if not os.path.exists(filsti):
+        return register
+    fejl_start = len(rapport.fejl)
+    batch, numre = [], []
+
+    def tilføj_batch():
+        register.tilføj_rækker([række for række in valider_rækker(batch, rapport, numre=numre) if række[0] is not None])
+        batch.clear()
+        numre.clear()
+
+    with instrumentering.fase("csv_indlæsning_filtreret") as måling:
+        with open(filsti, "r", newline="", encoding="utf-8") as f:
+            for nummer, række in filter.rækker(f, rapport):
+                try:
+                    type_navn, felter = række_til_felter(række)
+                except KeyError as fejl:
+                    rapport.tilføj(nummer, None, None, f"Mangler feltet {fejl}")
+                    continue
+                except ValueError as fejl:
+                    rapport.tilføj(nummer, None, None, str(fejl))
+                    continue
+                if filter.passer_type(type_navn):
+                    batch.append((type_navn, felter))
+                    numre.append(nummer)
+                    if len(batch) >= batch_størrelse:
+                        tilføj_batch()
+            if batch:
+                tilføj_batch()
+        rapport.fejl[fejl_start:] = sorted(rapport.fejl[fejl_start:], key=lambda fejl: fejl.række)
+        måling.rækker += len(register)
+        måling.fejl += len(rapport.fejl) - fejl_start
+    return register
+
+
+def filtrer_register(register, filter):
+    """Et nyt register med de rækker fra register der matcher filteret (symboltabellen deles)."""
+    udsnit = PersonRegistry(register.skema, symboler=register._symboler)
+    udsnit.tilføj_rækker([
+        register.række_felter(række_id)
+        for række_id in register.række_id()
+        if filter.passer_række(register, række_id)
+    ])
+    return udsnit
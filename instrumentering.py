@@ -0,0 +1,174 @@
+"""
+Målinger af hvor tiden går: CSV-indlæsning, validering, objekter,
+visning og skrivning.
+
+Slås til med --stats (eller PERSONREGISTER_STATS=1) og koster næsten
+intet når den er slået fra: fase() giver så en fælles tom kontekst, og
+tæl() er en enkelt if. Ved programmets afslutning skrives en rapport
+til stderr med kald, tid, rækker/s og bytes pr. fase samt tællerne.
+
+--profile [cprofile|tracemalloc|begge] (eller PERSONREGISTER_PROFIL)
+kører desuden hele programmet under cProfile og/eller tracemalloc og
+tilføjer deres top-liste til rapporten.
+"""
+import argparse
+import atexit
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Sættes af konfigurer(); læses som instrumentering.AKTIV i de varme stier
+AKTIV = False
+PROFILER = ("cprofile", "tracemalloc", "begge")
+
+_faser = {}
+_lås = threading.Lock()
+_tællere = Counter()
+_profil = None
+_profil_fil = None
+_tracemalloc = False
+
+
+class Fasemåling:
+    """Samlet antal kald, tid og mængder for én fase."""
+    __slots__ = ("kald", "sekunder", "rækker", "bytes", "fejl")
+
+    def __init__(self):
+        self.kald = 0
+        self.sekunder = 0.0
+        self.rækker = 0
+        self.bytes = 0
+        self.fejl = 0
+
+
+class _Måling:
+    """Ét kald af en fase. rækker, bytes og fejl sættes af den målte kode."""
+    __slots__ = ("_fase", "_start", "rækker", "bytes", "fejl")
+
+    def __init__(self, fase):
+        self._fase = fase
+        self.rækker = self.bytes = self.fejl = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *fejlinfo):
+        sekunder = time.perf_counter() - self._start
+        with _lås:
+            fase = self._fase
+            fase.kald += 1
+            fase.sekunder += sekunder
+            fase.rækker += self.rækker
+            fase.bytes += self.bytes
+            fase.fejl += self.fejl
+        return False
+
+
+class _IngenMåling:
+    """Bruges når instrumenteringen er slået fra - alt hvad der skrives til den glemmes."""
+    __slots__ = ()
+    rækker = bytes = fejl = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *fejlinfo):
+        return False
+
+    def __setattr__(self, navn, værdi):
+        pass
+
+
+_INGEN = _IngenMåling()
+
+
+def fase(navn):
+    """
+    Kontekst der måler tiden for en fase:
+
+        with instrumentering.fase("csv_skrivning") as måling:
+            ...
+            måling.rækker += antal
+    """
+    if not AKTIV:
+        return _INGEN
+    samlet = _faser.get(navn)
+    if samlet is None:
+        with _lås:
+            samlet = _faser.setdefault(navn, Fasemåling())
+    return _Måling(samlet)
+
+
+def tæl(navn, antal=1):
+    if AKTIV:
+        with _lås:
+            _tællere[navn] += antal
+
+
+# --- Rapport ---
+def rapport():
+    linjer = ["", "--- Instrumentering ---",
+              f"{'fase':24} {'kald':>6} {'sekunder':>10} {'rækker':>10} {'rækker/s':>12} {'bytes':>12} {'fejl':>6}"]
+    for navn, m in sorted(_faser.items(), key=lambda par: -par[1].sekunder):
+        pr_sek = f"{m.rækker / m.sekunder:12.0f}" if m.rækker and m.sekunder else f"{'':12}"
+        linjer.append(f"{navn:24} {m.kald:6} {m.sekunder:10.4f} {m.rækker:10} {pr_sek} {m.bytes:12} {m.fejl:6}")
+    if _tællere:
+        linjer.append("Tællere: " + ", ".join(f"{navn}={antal}" for navn, antal in sorted(_tællere.items())))
+    return "\n".join(linjer)
+
+
+def _skriv_rapport():
+    ud = sys.stderr
+    if AKTIV:
+        print(rapport(), file=ud)
+    if _profil is not None:
+        _profil.disable()
+        import pstats
+        if _profil_fil:
+            _profil.dump_stats(_profil_fil)
+            print(f"cProfile-data gemt i '{_profil_fil}'", file=ud)
+        print("\n--- cProfile (top 25 efter samlet tid) ---", file=ud)
+        pstats.Stats(_profil, stream=ud).sort_stats("cumulative").print_stats(25)
+    if _tracemalloc:
+        import tracemalloc
+        nu, top = tracemalloc.get_traced_memory()
+        print(f"\n--- tracemalloc (nu {nu / 1e6:.1f} MB, peak {top / 1e6:.1f} MB) ---", file=ud)
+        for statistik in tracemalloc.take_snapshot().statistics("lineno")[:15]:
+            print(statistik, file=ud)
+        tracemalloc.stop()
+
+
+# --- Opsætning ---
+def konfigurer(argv=None):
+    """
+    Slå instrumentering og profilering til ud fra kommandolinjen og miljøet.
+    Returnerer de argumenter der ikke hørte til instrumenteringen.
+    """
+    global AKTIV, _profil, _profil_fil, _tracemalloc
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--profile", nargs="?", const="cprofile", choices=PROFILER)
+    parser.add_argument("--profil-fil")
+    args, resten = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+
+    stats = args.stats or os.environ.get("PERSONREGISTER_STATS", "") not in ("", "0")
+    profil = args.profile or os.environ.get("PERSONREGISTER_PROFIL") or None
+    if profil is not None and profil not in PROFILER:
+        raise ValueError(f"Ukendt profilering: {profil} (vælg {', '.join(PROFILER)})")
+
+    AKTIV = stats
+    if profil in ("tracemalloc", "begge"):
+        import tracemalloc
+        tracemalloc.start()
+        _tracemalloc = True
+    if profil in ("cprofile", "begge"):
+        import cProfile
+        _profil = cProfile.Profile()
+        _profil_fil = args.profil_fil
+        _profil.enable()
+    if stats or profil:
+        atexit.register(_skriv_rapport)
+    return resten
@@ -0,0 +1,215 @@
+"""
+Append-only ændringsjournal for et PersonRegistry.
+
+I stedet for at omskrive hele CSV-filen ved hver gemning skrives hver ændring
+(tilføj, erstat/opgradér, fjern) som én JSON-linje i "<fil>.journal".
+Ved indlæsning genafspilles journalen oven på CSV-filen (snapshot'et).
+Når journalen bliver stor, komprimeres den: registeret skrives som et nyt
+snapshot, og journalen startes forfra. Begge filer skiftes med os.replace,
+så et nedbrud aldrig efterlader en halvt skrevet fil.
+"""
+import json
+import os
+import threading
+from bisect import bisect_left
+
+import instrumentering
+
+# Journalen komprimeres automatisk når den passerer denne størrelse
+STANDARD_GRÆNSE = 64 * 1024 * 1024
+
+
+def fil_stempel(sti):
+    """Størrelse og mtime for en fil - bruges til at se om en afledt fil hører til den."""
+    try:
+        info = os.stat(sti)
+    except FileNotFoundError:
+        return None
+    return [info.st_size, info.st_mtime_ns]
+
+
+def _fsync_fil(sti):
+    with open(sti, "rb") as f:
+        os.fsync(f.fileno())
+
+
+class Journal:
+    """
+    Journal der ligger ved siden af snapshot-filen.
+
+    skriv_snapshot(personer, filsti) skal skrive hele registeret til filsti
+    (fx skriv_personer_csv fra scriptet). Første linje i journalen er et
+    hoved med snapshot'ets størrelse og mtime; passer det ikke med filen på
+    disken, er journalen allerede indeholdt i snapshot'et og ignoreres.
+    Med grænse=None komprimeres der kun når komprimer() kaldes.
+    """
+    def __init__(self, snapshot_sti, skriv_snapshot, grænse=STANDARD_GRÆNSE):
+        self.snapshot_sti = snapshot_sti
+        self.sti = snapshot_sti + ".journal"
+        self.skriv_snapshot = skriv_snapshot
+        self.grænse = grænse
+        self._register = None
+        self._fil = None
+        self._lås = threading.Lock()
+        # Holdes fra kopien tages til det nye snapshot er på plads (frigives
+        # evt. af baggrundstråden), så der kun kører én komprimering ad gangen
+        self._komprimerer = threading.Lock()
+        # Id'er for fjernede rækker da snapshot'et blev skrevet. Snapshot'et
+        # gemmer kun levende rækker, så journalens id'er skal forskydes.
+        self._slettede = ()
+        # Ændringer der sker mens en baggrundskomprimering kører
+        self._efter_kopi = None
+
+    # --- Indlæsning ---
+    def _læs_hoved(self, f):
+        linje = f.readline()
+        if not linje:
+            return False
+        hoved = json.loads(linje)
+        return hoved.get("snapshot") == fil_stempel(self.snapshot_sti)
+
+    def genafspil(self, register):
+        """Anvend journalens ændringer på et register indlæst fra snapshot'et."""
+        if not os.path.exists(self.sti):
+            return 0
+        antal = 0
+        with open(self.sti, "r", encoding="utf-8") as f:
+            if not self._læs_hoved(f):
+                return 0
+            for linje in f:
+                if not linje.endswith("\n"):
+                    break  # Halvt skrevet linje efter et nedbrud
+                post = json.loads(linje)
+                op = post["op"]
+                if op == "tilføj":
+                    register.tilføj_række(post["type"], post["felter"])
+                elif op == "erstat":
+                    register.erstat_række(post["id"], post["type"], post["felter"])
+                elif op == "fjern":
+                    register.fjern(post["id"])
+                antal += 1
+        return antal
+
+    def har_ændringer(self):
+        """Om journalen hører til snapshot'et og indeholder mindst én ændring."""
+        if not os.path.exists(self.sti):
+            return False
+        with open(self.sti, "r", encoding="utf-8") as f:
+            return self._læs_hoved(f) and f.readline().endswith("\n")
+
+    # --- Skrivning ---
+    def følg(self, register):
+        """Log alle fremtidige ændringer i registeret til journalen."""
+        self._register = register
+        gyldig = False
+        if os.path.exists(self.sti):
+            with open(self.sti, "r", encoding="utf-8") as f:
+                gyldig = self._læs_hoved(f)
+        if not gyldig:
+            os.replace(self._skriv_ny_journal(fil_stempel(self.snapshot_sti), []), self.sti)
+        self._fil = open(self.sti, "a", encoding="utf-8")
+        register.tilføj_lytter(self._hændelse)
+
+    def _journal_id(self, række_id):
+        return række_id - bisect_left(self._slettede, række_id)
+
+    def _linje(self, hændelse, række_id, type_navn, felter):
+        if hændelse == "fjern":
+            post = {"op": "fjern", "id": self._journal_id(række_id)}
+        else:
+            # Ændring af ét felt logges som en erstatning af hele rækken
+            op = "tilføj" if hændelse == "tilføj" else "erstat"
+            post = {"op": op, "id": self._journal_id(række_id), "type": type_navn, "felter": felter}
+        return json.dumps(post, ensure_ascii=False) + "\n"
+
+    def _hændelse(self, hændelse, række_id):
+        if hændelse == "fjern":
+            type_navn = felter = None
+        else:
+            type_navn, felter = self._register.række_felter(række_id)
+        with self._lås:
+            self._fil.write(self._linje(hændelse, række_id, type_navn, felter))
+            self._fil.flush()
+            if self._efter_kopi is not None:
+                self._efter_kopi.append((hændelse, række_id, type_navn, felter))
+            for_stor = self.grænse is not None and self._fil.tell() > self.grænse
+        if for_stor and not self._komprimerer.locked():
+            self.komprimer(baggrund=True, vent=False)
+
+    def synkroniser(self):
+        """Sørg for at de linjer der er skrevet indtil nu, ligger på disken (fsync)."""
+        with self._lås:
+            if self._fil is not None:
+                self._fil.flush()
+                os.fsync(self._fil.fileno())
+
+    def _skriv_ny_journal(self, stempel, linjer):
+        """Skriv en ny journal til en midlertidig fil og returnér dens sti."""
+        midlertidig = self.sti + ".tmp"
+        with open(midlertidig, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"snapshot": stempel}) + "\n")
+            f.writelines(linjer)
+            f.flush()
+            os.fsync(f.fileno())
+        return midlertidig
+
+    # --- Komprimering ---
+    def komprimer(self, baggrund=False, vent=True):
+        """
+        Skriv et nyt snapshot og start journalen forfra.
+        Med baggrund=True skrives snapshot'et fra en kopi af kolonnerne i en
+        separat tråd, så terminalprogrammet ikke venter på disken.
+        Kører der allerede en komprimering, ventes der på den - eller med
+        vent=False springes denne over. Returnerer om komprimeringen startede.
+        """
+        if not self._komprimerer.acquire(blocking=vent):
+            return False
+        try:
+            # Registerets lås først (samme rækkefølge som når en lytter kalder _hændelse),
+            # så ingen ændring kan falde mellem kopien og starten på _efter_kopi
+            with self._register._lås, self._lås:
+                kopi = self._register._kolonnekopi()
+                slettede = self._register.slettede_id()
+                self._efter_kopi = []
+        except BaseException:
+            self._komprimerer.release()
+            raise
+        if baggrund:
+            threading.Thread(target=self._komprimer, args=(kopi, slettede), daemon=True).start()
+        else:
+            self._komprimer(kopi, slettede)
+        return True
+
+    def _komprimer(self, kopi, slettede):
+        try:
+            midlertidig = self.snapshot_sti + ".tmp"
+            with instrumentering.fase("komprimering") as måling:
+                self.skriv_snapshot(kopi, midlertidig)
+                måling.rækker += len(kopi)
+            _fsync_fil(midlertidig)
+            # os.replace bevarer størrelse og mtime, så stemplet passer efter omdøbningen
+            stempel = fil_stempel(midlertidig)
+            with self._lås:
+                self._slettede = slettede
+                linjer = [self._linje(*ændring) for ændring in self._efter_kopi]
+                ny_journal = self._skriv_ny_journal(stempel, linjer)
+                self._fil.close()
+                os.replace(midlertidig, self.snapshot_sti)
+                os.replace(ny_journal, self.sti)
+                self._fil = open(self.sti, "a", encoding="utf-8")
+        finally:
+            with self._lås:
+                self._efter_kopi = None
+            self._komprimerer.release()
+
+    def luk(self):
+        """Vent på en evt. komprimering og sørg for at journalen ligger på disken."""
+        with self._komprimerer:
+            pass
+        if self._fil is not None:
+            with self._lås:
+                self._fil.flush()
+                os.fsync(self._fil.fileno())
+                self._fil.close()
+                self._fil = None
+            self._register.fjern_lytter(self._hændelse)
@@ -0,0 +1,179 @@
+"""
+Kommandomotor: tilføj, opgrader, fjern og gem - fra menuen eller i batch.
+
+En kommando er en dict, i batch én JSON-linje:
+
+    {"kommando": "tilføj", "type": "Lærer", "navn": "Bo", "alder": 41, ..., "fag": ["Dansk"]}
+    {"kommando": "opgrader", "navn": "Bo", "type": "Borger", "indkomst": "300000", ...}
+    {"kommando": "fjern", "id": 17}
+    {"kommando": "gem"}
+
+"type" er som standard Person. Opgrader og fjern finder rækken med "id"
+(række-id) eller "navn" (skal være entydigt); ved opgradering beholdes de
+felter den nye type har til fælles med den gamle.
+
+Menuen kalder udfør() med én kommando ad gangen, og objektet valideres af
+setterne. udfør_batch() samler i stedet tilføj-kommandoer i træk i store
+batches, der valideres kolonnevis og tilføjes som rækker uden objekter
+(validering.importer_rækker). Fejl stopper ikke kørslen men noteres i en
+ValideringsRapport under kommandoens nummer, og der gemmes én gang til sidst.
+"""
+import json
+from collections import Counter
+from itertools import groupby
+
+from personregister import LISTE
+from validering import STANDARD_BATCH, importer_rækker
+
+KOMMANDOER = ("tilføj", "opgrader", "fjern", "gem")
+# Nøgler i en kommando der ikke er feltværdier
+_STYRENØGLER = frozenset(("kommando", "type", "id"))
+
+
+def læs_jsonl(f):
+    """
+    Kommandoerne fra en åben JSONL-fil; tomme linjer springes over.
+    En linje med ugyldig JSON gives videre som JSONDecodeError, så fejlen
+    kan noteres under linjens nummer i stedet for at stoppe kørslen.
+    """
+    for linje in f:
+        if not linje.strip():
+            continue
+        try:
+            yield json.loads(linje)
+        except json.JSONDecodeError as fejl:
+            yield fejl
+
+
+def _art(kommando):
+    if isinstance(kommando, json.JSONDecodeError):
+        raise ValueError(f"Ugyldig JSON: {kommando.msg}")
+    if not isinstance(kommando, dict):
+        raise ValueError("Kommandoen skal være et JSON-objekt")
+    art = kommando.get("kommando")
+    if art not in KOMMANDOER:
+        raise ValueError(f"Ukendt kommando: {art!r} (vælg {', '.join(KOMMANDOER)})")
+    return art
+
+
+class Kommandomotor:
+    """
+    Udfører kommandoer mod et PersonRegistry.
+    opret(type_navn, felter) laver et valideret objekt (scriptets opret_person);
+    gem() kaldes ved gem-kommandoer - i batch højst én gang, til sidst.
+    """
+    def __init__(self, register, opret, gem=None):
+        self.register = register
+        self.opret_person = opret
+        self.gem = gem
+        skema = register.skema
+        self._brugte = {navn: skema.typer[klasse] for navn, klasse in zip(skema.type_navne, skema.klasser)}
+
+    # --- Fra kommando til række ---
+    def type_og_felter(self, kommando):
+        """
+        (type_navn, felter) for en tilføj-kommando, uden validering af værdierne.
+        KeyError hvis et felt mangler, ValueError ved ukendt type eller felt.
+        """
+        type_navn = kommando.get("type", "Person")
+        try:
+            brugte = self._brugte[type_navn]
+        except (KeyError, TypeError):
+            raise ValueError(f"Ukendt type: {type_navn!r}") from None
+        ukendte = kommando.keys() - _STYRENØGLER - set(brugte)
+        if ukendte:
+            raise ValueError(f"Ukendte felter for {type_navn}: {', '.join(sorted(ukendte))}")
+        felter = {}
+        for felt in brugte:
+            if self.register.skema.felter[felt] == LISTE:
+                værdi = kommando.get(felt, [])
+                if not isinstance(værdi, list) or not all(isinstance(v, str) for v in værdi):
+                    raise ValueError(f"Feltet '{felt}' skal være en liste af tekster")
+                felter[felt] = list(dict.fromkeys(værdi))
+            else:
+                felter[felt] = kommando[felt]
+        return type_navn, felter
+
+    def opret(self, kommando):
+        """Det validerede objekt for en tilføj-kommando (setterne rejser TypeError/ValueError)."""
+        return self.opret_person(*self.type_og_felter(kommando))
+
+    def find_række(self, kommando):
+        """Række-id ud fra kommandoens "id" eller (entydige) "navn"."""
+        if "id" in kommando:
+            try:
+                række_id = int(kommando["id"])
+                self.register[række_id]
+            except (TypeError, ValueError, IndexError):
+                raise ValueError(f"Ingen person med id {kommando['id']!r}") from None
+            return række_id
+        if "navn" not in kommando:
+            raise KeyError("id")
+        fundne = list(self.register.find_id("navn", kommando["navn"]))
+        if not fundne:
+            raise ValueError(f"Ingen person med navnet {kommando['navn']!r}")
+        if len(fundne) > 1:
+            raise ValueError(f"{len(fundne)} personer hedder {kommando['navn']!r} - angiv id")
+        return fundne[0]
+
+    # --- Én kommando ---
+    def udfør(self, kommando):
+        """
+        Udfør én kommando og returnér det berørte række-id (None for gem).
+        Ugyldige kommandoer og værdier rejser KeyError, TypeError eller ValueError.
+        """
+        art = _art(kommando)
+        if art == "tilføj":
+            return self.register.tilføj(self.opret(kommando))
+        if art == "gem":
+            if self.gem is not None:
+                self.gem()
+            return None
+        række_id = self.find_række(kommando)
+        if art == "fjern":
+            self.register.fjern(række_id)
+            return række_id
+        if "type" not in kommando:
+            raise KeyError("type")
+        _, gamle = self.register.række_felter(række_id)
+        brugte = self._brugte.get(kommando["type"], ())
+        ny = {felt: værdi for felt, værdi in gamle.items() if felt in brugte}
+        ny.update((nøgle, værdi) for nøgle, værdi in kommando.items() if nøgle != "id")
+        self.register.erstat(række_id, self.opret(ny))
+        return række_id
+
+    # --- En strøm af kommandoer ---
+    def udfør_batch(self, kommandoer, rapport, batch_størrelse=STANDARD_BATCH):
+        """
+        Udfør kommandoerne i rækkefølge. Tilføj-kommandoer i træk valideres og
+        tilføjes batchvis; de øvrige udføres én ad gangen. Ugyldige kommandoer
+        noteres i rapporten (række = kommandoens nummer fra 1) og springes over.
+        gem() kaldes én gang til sidst hvis noget er ændret eller der blev bedt
+        om det. Returnerer en Counter med antal udførte kommandoer pr. slags.
+        """
+        udført = Counter()
+
+        def er_tilføj(kommando):
+            return isinstance(kommando, dict) and kommando.get("kommando") == "tilføj"
+
+        for tilføj, gruppe in groupby(kommandoer, er_tilføj):
+            if tilføj:
+                før = len(self.register)
+                importer_rækker(gruppe, self.type_og_felter, self.register, rapport, batch_størrelse)
+                udført["tilføj"] += len(self.register) - før
+                continue
+            for kommando in gruppe:
+                rapport.antal_rækker += 1
+                try:
+                    art = _art(kommando)
+                    if art != "gem":
+                        self.udfør(kommando)
+                except KeyError as fejl:
+                    rapport.tilføj(rapport.antal_rækker, None, None, f"Mangler feltet {fejl}")
+                except (TypeError, ValueError) as fejl:
+                    rapport.tilføj(rapport.antal_rækker, None, None, str(fejl))
+                else:
+                    udført[art] += 1
+        if self.gem is not None and udført:
+            self.gem()
+        return udført
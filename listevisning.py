@@ -0,0 +1,139 @@
+"""
+Sidevis visning af et PersonRegistry til menupunktet "Vis alle personer".
+
+Kun den synlige side formateres. Hver persons tekstlinje gemmes i en cache,
+som registeret selv rydder for en række når den ændres, fjernes eller
+opgraderes - så en uændret side ikke bygger __str__-kæden op igen.
+"""
+from itertools import islice
+
+import instrumentering
+from personregister import TAL
+
+STANDARD_SIDE = 20
+# Cachen tømmes hvis den vokser sig større end dette antal linjer
+MAKS_CACHE = 100_000
+
+
+class Listevisning:
+    """
+    Sider af et register med filter på type, navnepræfiks og feltværdier
+    (fx skole="Byskolen"). En tuple (fra, til) er et interval over feltets
+    tal med begge ender inklusive og None som åben ende (fx alder=(60, 67)).
+    Indekserede felter slås op i registerets indeks, andre sammenlignes
+    direkte i kolonnen.
+    """
+    def __init__(self, register):
+        self.register = register
+        self._cache = {}
+        register.tilføj_lytter(self._hændelse)
+
+    def _hændelse(self, hændelse, række_id):
+        if hændelse != "tilføj":
+            self._cache.pop(række_id, None)
+
+    def linje(self, række_id):
+        tekst = self._cache.get(række_id)
+        if tekst is None:
+            if len(self._cache) >= MAKS_CACHE:
+                self._cache.clear()
+            tekst = self._cache[række_id] = str(self.register[række_id])
+            instrumentering.tæl("linjer_formateret")
+        return tekst
+
+    def _kandidater(self, type_navn, felter):
+        register = self.register
+        indekserede = [
+            felt for felt, værdi in felter.items()
+            if (register.har_intervalindeks(felt) if isinstance(værdi, tuple) else register.har_indeks(felt))
+        ]
+        if indekserede:
+            første = indekserede[0]
+            værdi = felter[første]
+            if isinstance(værdi, tuple):
+                kandidater = register.find_interval_id(første, *værdi)
+            else:
+                kandidater = register.find_id(første, værdi)
+            felter = {felt: værdi for felt, værdi in felter.items() if felt != første}
+        elif type_navn:
+            kandidater = register.id_af_type(type_navn)
+            type_navn = None
+        else:
+            kandidater = register.række_id()
+
+        if type_navn:
+            kode = register.skema.type_navne.index(type_navn)
+            kandidater = (i for i in kandidater if register._typer[i] == kode)
+        for felt, værdi in felter.items():
+            kandidater = _filtrer_felt(register, kandidater, felt, værdi)
+        return kandidater
+
+    def id_på_side(self, side_størrelse=STANDARD_SIDE, offset=0, type_navn=None, navn_præfiks=None, **felter):
+        """
+        Række-id'er på den ønskede side og om der findes flere sider efter den.
+        Kun så mange rækker som nødvendigt gennemgås.
+        """
+        kandidater = self._kandidater(type_navn, felter)
+        if navn_præfiks:
+            kandidater = _filtrer_præfiks(self.register, kandidater, navn_præfiks)
+        valgte = list(islice(kandidater, offset, offset + side_størrelse + 1))
+        return valgte[:side_størrelse], len(valgte) > side_størrelse
+
+    def side(self, side_størrelse=STANDARD_SIDE, offset=0, **filter):
+        """Færdigformaterede linjer "nr. person" for én side samt om der er flere."""
+        with instrumentering.fase("visning") as måling:
+            række_id, flere = self.id_på_side(side_størrelse, offset, **filter)
+            linjer = [f"{nummer}. {self.linje(i)}" for nummer, i in enumerate(række_id, start=offset + 1)]
+            måling.rækker += len(linjer)
+        return linjer, flere
+
+
+def _filtrer_felt(register, kandidater, felt, værdi):
+    if isinstance(værdi, tuple):
+        fra, til = værdi
+        return (
+            i for i in kandidater
+            if (tal := register.felt_tal(i, felt)) is not None
+            and (fra is None or tal >= fra) and (til is None or tal <= til)
+        )
+    kolonne = register._kolonner[felt]
+    if register.skema.felter[felt] == TAL:
+        ønsket = int(værdi)
+    else:
+        ønsket = register._symboler.find_id(værdi)
+        if ønsket is None:
+            return iter(())
+    return (i for i in kandidater if kolonne[i] == ønsket)
+
+
+def _filtrer_præfiks(register, kandidater, præfiks):
+    # Hvert navn tjekkes kun én gang pr. symbol, selvom mange personer deler navnet
+    kolonne = register._kolonner["navn"]
+    symboler = register._symboler
+    passer = {}
+    for i in kandidater:
+        symbol_id = kolonne[i]
+        ok = passer.get(symbol_id)
+        if ok is None:
+            ok = passer[symbol_id] = symboler.værdi(symbol_id).startswith(præfiks)
+        if ok:
+            yield i
+
+
+def bladr(listevisning, side_størrelse=STANDARD_SIDE, **filter):
+    """Interaktiv sidevisning i terminalen: n = næste, f = forrige, Enter = tilbage."""
+    offset = 0
+    while True:
+        linjer, flere = listevisning.side(side_størrelse, offset, **filter)
+        if not linjer:
+            print("Ingen personer matcher." if offset == 0 else "Ingen flere personer.")
+            return
+        for linje in linjer:
+            print(linje)
+        valg = input("[n]æste, [f]orrige eller Enter for menuen: ").strip().lower()
+        if valg == "n" and flere:
+            offset += side_størrelse
+        elif valg == "f" and offset:
+            offset = max(0, offset - side_størrelse)
+        elif not valg:
+            return
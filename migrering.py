@@ -0,0 +1,246 @@
+"""
+Migrér en personliste mellem CSV-formaterne - i konstant hukommelse.
+
+Der findes tre formater:
+
+    kode          navn,alder,adresse,pensionist,indkomst,husleje          (KODE.py)
+    registrering  type,navn,alder,køn,skole,klassetrin,email,telefon,fag  (registrerings-system-1-1.py)
+    gammel        navn,alder,pensionist,modtager,husleje                  (den oprindelige personliste.csv)
+
+Kildens format findes ud fra hovedlinjen. Hver række får en type - fra
+type-kolonnen, ellers ud fra hvilke felter der er udfyldt - og skrives med
+samme type i målformatet, eller som Person hvis målet ikke kender typen.
+Værdier målformatet ikke har plads til (fx adresse -> registrering) tælles
+pr. felt; med --streng afvises rækken i stedet.
+
+Filen deles i intervaller på rækkegrænser (som parallel_import), og hvert
+interval konverteres række for række af sin egen proces til en delfil, der
+til sidst sættes sammen i den oprindelige rækkefølge. Afviste rækker (forkert
+antal kolonner, ugyldig alder, email eller telefon, ukendt type) skrives i
+rapporten med rækkenumre for hele filen.
+
+    python migrering.py personliste.csv ny.csv --til registrering --rapport afviste.csv
+"""
+import argparse
+import csv
+import os
+import shutil
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from parallel_import import STANDARD_BLOK, find_intervaller
+from validering import STANDARD_BATCH, ValideringsRapport, valider_rækker
+
+# kolonner: rækkefølgen i filen; typer: felterne hver type bruger (Person først)
+Format = namedtuple("Format", ["kolonner", "typer"])
+
+FORMATER = {
+    "kode": Format(
+        ("navn", "alder", "adresse", "pensionist", "indkomst", "husleje"),
+        {"Person": ("navn", "alder", "adresse"),
+         "Borger": ("navn", "alder", "adresse", "pensionist", "indkomst", "husleje")},
+    ),
+    "registrering": Format(
+        ("type", "navn", "alder", "køn", "skole", "klassetrin", "email", "telefon", "fag"),
+        {"Person": ("navn", "alder", "køn"),
+         "Elev": ("navn", "alder", "køn", "skole", "klassetrin"),
+         "Lærer": ("navn", "alder", "køn", "email", "telefon", "fag")},
+    ),
+    "gammel": Format(
+        ("navn", "alder", "pensionist", "modtager", "husleje"),
+        {"Person": ("navn", "alder"),
+         "Borger": ("navn", "alder", "pensionist", "modtager", "husleje")},
+    ),
+}
+
+Migreringsresultat = namedtuple("Migreringsresultat", ["fra", "til", "skrevet", "tabt"])
+
+
+def find_format(kolonner):
+    """Navnet på formatet for en hovedlinje. ValueError hvis det ikke kan afgøres entydigt."""
+    kolonner = set(kolonner)
+    for navn, fmt in FORMATER.items():
+        if kolonner == set(fmt.kolonner):
+            return navn
+    # Fx en ældre registreringsfil uden type-kolonne
+    mulige = [navn for navn, fmt in FORMATER.items() if kolonner <= set(fmt.kolonner)]
+    if len(mulige) == 1:
+        return mulige[0]
+    årsag = f"passer til både {' og '.join(mulige)}" if mulige else "ukendte kolonner"
+    raise ValueError(f"Kan ikke afgøre formatet for hovedlinjen {sorted(kolonner)} ({årsag}) - angiv --fra")
+
+
+# --- Én række ---
+def _type_for(fmt, felter):
+    """Typen for en række uden type-kolonne: den sidste type hvis egne felter er udfyldt."""
+    fælles = set(fmt.typer["Person"])
+    for type_navn, brugte in reversed(fmt.typer.items()):
+        if any(felter.get(felt) for felt in brugte if felt not in fælles):
+            return type_navn
+    return "Person"
+
+
+class _Konvertering:
+    """Oversætter rækker fra ét format til et andet."""
+    def __init__(self, kolonner_ind, fra, til, streng):
+        self.kolonner_ind = kolonner_ind
+        self.fra = FORMATER[fra]
+        self.til = FORMATER[til]
+        self.til_navn = til
+        self.streng = streng
+        self.har_type = "type" in kolonner_ind
+
+    def række(self, nummer, række, rapport, tabt):
+        """(type_navn, felter) i målformatet, eller None hvis rækken afvises."""
+        if not række:
+            return None  # Tom linje - springes over ligesom i csv.DictReader
+        if len(række) != len(self.kolonner_ind):
+            rapport.tilføj(nummer, None, None, f"Forventede {len(self.kolonner_ind)} kolonner, fandt {len(række)}")
+            return None
+        felter = dict(zip(self.kolonner_ind, række))
+        type_navn = felter.pop("type", "") if self.har_type else ""
+        if not type_navn:
+            type_navn = _type_for(self.fra, felter)
+        elif type_navn not in self.fra.typer:
+            rapport.tilføj(nummer, "type", type_navn, "Ukendt type")
+            return None
+
+        ny_type = type_navn if type_navn in self.til.typer else "Person"
+        brugte = self.til.typer[ny_type]
+        mistede = [felt for felt, værdi in felter.items() if værdi and felt not in brugte]
+        if mistede:
+            if self.streng:
+                for felt in mistede:
+                    rapport.tilføj(nummer, felt, felter[felt], f"{type_navn} har ikke feltet '{felt}' i formatet '{self.til_navn}'")
+                return None
+            tabt.update(mistede)
+        return ny_type, {felt: felter.get(felt, "") for felt in brugte}
+
+    def skriv(self, writer, rækker):
+        kolonner = self.til.kolonner
+        for type_navn, felter in rækker:
+            felter["type"] = type_navn
+            writer.writerow([felter.get(kolonne, "") for kolonne in kolonner])
+
+
+def _linjer(f, slut):
+    """Tekstlinjerne i en binær fil fra den nuværende position til slut."""
+    while f.tell() < slut:
+        linje = f.readline()
+        if not linje:
+            return
+        yield linje.decode("utf-8")
+
+
+# --- Arbejde i hver proces ---
+def _migrer_interval(sti, start, slut, del_sti, kolonner_ind, fra, til, streng, batch_størrelse):
+    """Konvertér ét interval til delfilen. Rækkenumrene tælles fra 1 i intervallet."""
+    konvertering = _Konvertering(kolonner_ind, fra, til, streng)
+    rapport = ValideringsRapport()
+    tabt = Counter()
+    skrevet = 0
+    with open(sti, "rb") as ind, open(del_sti, "w", newline="", encoding="utf-8") as ud:
+        ind.seek(start)
+        writer = csv.writer(ud)
+        batch = []
+        første, nummer = 1, 0
+        for nummer, række in enumerate(csv.reader(_linjer(ind, slut)), start=1):
+            # Afviste rækker holder deres plads, så rækkenumrene i batchen passer
+            batch.append(konvertering.række(nummer, række, rapport, tabt) or (None, {}))
+            if len(batch) >= batch_størrelse:
+                gyldige = [r for r in valider_rækker(batch, rapport, første) if r[0] is not None]
+                konvertering.skriv(writer, gyldige)
+                skrevet += len(gyldige)
+                batch = []
+                første = nummer + 1
+        if batch:
+            gyldige = [r for r in valider_rækker(batch, rapport, første) if r[0] is not None]
+            konvertering.skriv(writer, gyldige)
+            skrevet += len(gyldige)
+    rapport.fejl.sort(key=lambda fejl: fejl.række)
+    return nummer, skrevet, rapport.fejl, tabt
+
+
+def migrer(ind_sti, ud_sti, til, fra=None, rapport=None, streng=False, arbejdere=None,
+           blok_størrelse=STANDARD_BLOK, batch_størrelse=STANDARD_BATCH):
+    """
+    Konvertér ind_sti til formatet til og skriv resultatet i ud_sti (som
+    skiftes ind med os.replace, så ind_sti og ud_sti godt må være den samme fil).
+    Afviste rækker noteres i rapport. Returnerer et Migreringsresultat.
+    """
+    if til not in FORMATER:
+        raise ValueError(f"Ukendt format: {til} (vælg {', '.join(FORMATER)})")
+    if rapport is None:
+        rapport = ValideringsRapport()
+    _, intervaller = find_intervaller(ind_sti, blok_størrelse)
+    with open(ind_sti, "r", newline="", encoding="utf-8-sig") as f:
+        kolonner_ind = next(csv.reader(f), [])
+    fra = fra or find_format(kolonner_ind)
+
+    midlertidig = ud_sti + ".tmp"
+    dele = [f"{midlertidig}.{i}" for i in range(len(intervaller))]
+    argumenter = [(ind_sti, start, slut, del_sti, kolonner_ind, fra, til, streng, batch_størrelse)
+                  for (start, slut), del_sti in zip(intervaller, dele)]
+    tabt = Counter()
+    skrevet = 0
+    try:
+        if len(argumenter) > 1:
+            with ProcessPoolExecutor(max_workers=arbejdere) as pulje:
+                resultater = list(pulje.map(_migrer_interval, *zip(*argumenter)))
+        else:
+            resultater = [_migrer_interval(*a) for a in argumenter]
+
+        with open(midlertidig, "w", newline="", encoding="utf-8") as ud:
+            csv.writer(ud).writerow(FORMATER[til].kolonner)
+            for del_sti, (antal, del_skrevet, fejl, del_tabt) in zip(dele, resultater):
+                forskydning = rapport.antal_rækker
+                rapport.fejl.extend(f._replace(række=f.række + forskydning) for f in fejl)
+                rapport.antal_rækker += antal
+                skrevet += del_skrevet
+                tabt.update(del_tabt)
+                with open(del_sti, "r", newline="", encoding="utf-8") as del_fil:
+                    shutil.copyfileobj(del_fil, ud)
+            ud.flush()
+            os.fsync(ud.fileno())
+        os.replace(midlertidig, ud_sti)
+    finally:
+        for sti in dele + [midlertidig]:
+            if os.path.exists(sti):
+                os.remove(sti)
+    return Migreringsresultat(fra, til, skrevet, tabt)
+
+
+# --- Kommandolinje ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Konvertér en personliste mellem CSV-formaterne.")
+    parser.add_argument("ind", help="CSV-filen der skal konverteres")
+    parser.add_argument("ud", help="den nye CSV-fil (må være den samme som ind)")
+    parser.add_argument("--til", choices=FORMATER, required=True)
+    parser.add_argument("--fra", choices=FORMATER, help="kildens format (ellers findes det ud fra hovedlinjen)")
+    parser.add_argument("--streng", action="store_true", help="afvis rækker med værdier målformatet ikke kan rumme")
+    parser.add_argument("--rapport", help="skriv de afviste rækker til denne CSV-fil")
+    parser.add_argument("--arbejdere", type=int, help="antal processer (standard: antal CPU'er)")
+    parser.add_argument("--blok", type=int, default=STANDARD_BLOK, help="bytes pr. interval")
+    args = parser.parse_args(argv)
+
+    rapport = ValideringsRapport()
+    try:
+        resultat = migrer(args.ind, args.ud, args.til, args.fra, rapport, args.streng, args.arbejdere, args.blok)
+    except (OSError, ValueError) as fejl:
+        parser.exit(2, f"⚠ {fejl}\n")
+    print(f"{resultat.fra} -> {resultat.til}: {resultat.skrevet} af {rapport.antal_rækker} rækker skrevet til '{args.ud}'")
+    if resultat.tabt:
+        print("Værdier uden plads i målformatet (udeladt): "
+              + ", ".join(f"{felt}={antal}" for felt, antal in resultat.tabt.most_common()))
+    if rapport:
+        print(f"⚠ {rapport}")
+        for fejl in rapport.fejl[:5]:
+            print(f"  Række {fejl.række}: {fejl.besked} ({fejl.værdi!r})")
+        if args.rapport:
+            rapport.skriv_csv(args.rapport)
+            print(f"Rapporten er gemt i '{args.rapport}'")
+    return 0 if not rapport else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""
+Parallel indlæsning af en stor CSV-fil med flere processer.
+
+Filen deles i byte-intervaller, der altid starter og slutter på en
+rækkegrænse - også når et felt i anførselstegn indeholder linjeskift.
+Hvert interval parses og valideres i en ProcessPoolExecutor og kommer
+tilbage som færdige kolonner og en liste af afviste rækker, der flettes
+ind i registeret og rapporten i filens oprindelige rækkefølge.
+"""
+import csv
+import io
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from personregister import PersonRegistry
+from validering import ValideringsRapport, importer_rækker
+
+# Intervallerne er mindre end filen / antal processer, så arbejdet fordeles jævnt
+STANDARD_BLOK = 32 * 1024 * 1024
+_LÆSEBLOK = 64 * 1024 * 1024
+
+
+# --- Rækkegrænser ---
+def _næste_rækkegrænse(f, offset, anførselstegn_før):
+    """
+    Første position efter offset hvor en ny række starter.
+    Et linjeskift afslutter kun en række hvis antallet af anførselstegn
+    før det er lige - ellers står det inde i et felt.
+    """
+    f.seek(offset)
+    paritet = anførselstegn_før
+    position = offset
+    while True:
+        data = f.read(1024 * 1024)
+        if not data:
+            return position
+        start = 0
+        while True:
+            ny_linje = data.find(b"\n", start)
+            if ny_linje < 0:
+                paritet += data.count(b'"', start)
+                break
+            paritet += data.count(b'"', start, ny_linje)
+            if paritet % 2 == 0:
+                return position + ny_linje + 1
+            start = ny_linje + 1
+        position += len(data)
+
+
+def find_intervaller(filsti, blok_størrelse=STANDARD_BLOK):
+    """
+    Del filen i (start, slut)-intervaller der falder på rækkegrænser.
+    Returnerer også slutningen af hovedlinjen (første interval starter der).
+    """
+    størrelse = os.path.getsize(filsti)
+    with open(filsti, "rb") as f:
+        hoved_slut = _næste_rækkegrænse(f, 0, 0)
+
+        # Antal anførselstegn før hver foreløbig grænse - bytes.count er hurtig
+        kandidater = list(range(hoved_slut + blok_størrelse, størrelse, blok_størrelse))
+        paritet_ved = {}
+        f.seek(0)
+        læst = antal = 0
+        for kandidat in kandidater:
+            while læst < kandidat:
+                data = f.read(min(_LÆSEBLOK, kandidat - læst))
+                antal += data.count(b'"')
+                læst += len(data)
+            paritet_ved[kandidat] = antal % 2
+
+        grænser = [hoved_slut]
+        for kandidat in kandidater:
+            grænse = _næste_rækkegrænse(f, kandidat, paritet_ved[kandidat])
+            if grænse > grænser[-1]:
+                grænser.append(grænse)
+        if grænser[-1] < størrelse:
+            grænser.append(størrelse)
+    return hoved_slut, list(zip(grænser, grænser[1:]))
+
+
+# --- Arbejde i hver proces ---
+def _indlæs_interval(filsti, start, slut, feltnavne, række_til_felter, skema):
+    """Pars og validér ét interval og returnér det som kolonner plus afviste rækker."""
+    with open(filsti, "rb") as f:
+        f.seek(start)
+        tekst = io.TextIOWrapper(io.BytesIO(f.read(slut - start)), encoding="utf-8", newline="")
+        register = PersonRegistry(skema)
+        rapport = ValideringsRapport()
+        importer_rækker(csv.DictReader(tekst, fieldnames=feltnavne), række_til_felter, register, rapport)
+    kolonner = {felt: kolonne.tobytes() for felt, kolonne in register._kolonner.items()}
+    return register._typer.tobytes(), kolonner, register._symboler._værdier, rapport.antal_rækker, rapport.fejl
+
+
+def indlæs_parallelt(filsti, række_til_felter, skema, rapport=None, arbejdere=None, blok_størrelse=STANDARD_BLOK):
+    """
+    Indlæs CSV-filen i et PersonRegistry med flere processer.
+    række_til_felter skal kunne pickles (en funktion på modulniveau i scriptet).
+    Afviste rækker noteres i rapport med rækkenumre for hele filen.
+    """
+    if rapport is None:
+        rapport = ValideringsRapport()
+    hoved_slut, intervaller = find_intervaller(filsti, blok_størrelse)
+    with open(filsti, "r", newline="", encoding="utf-8") as f:
+        feltnavne = next(csv.reader(io.StringIO(f.read(hoved_slut))), [])
+
+    register = PersonRegistry(skema)
+    if not intervaller:
+        return register
+    with ProcessPoolExecutor(max_workers=arbejdere) as pulje:
+        resultater = pulje.map(
+            _indlæs_interval,
+            *zip(*((filsti, start, slut, feltnavne, række_til_felter, skema) for start, slut in intervaller)),
+        )
+        # map giver resultaterne i intervallernes rækkefølge, så rækkefølgen bevares
+        for typer_data, kolonne_data, symbol_værdier, antal_rækker, fejl in resultater:
+            forskydning = rapport.antal_rækker
+            rapport.fejl.extend(f._replace(række=f.række + forskydning) for f in fejl)
+            rapport.antal_rækker += antal_rækker
+            typer = array("B")
+            typer.frombytes(typer_data)
+            kolonner = {}
+            for felt, data in kolonne_data.items():
+                kolonne = array(register._kolonner[felt].typecode)
+                kolonne.frombytes(data)
+                kolonner[felt] = kolonne
+            register._tilføj_kolonner(typer, kolonner, symbol_værdier)
+    return register
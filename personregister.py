@@ -0,0 +1,766 @@
+"""
+Kompakt, kolonnebaseret register over personer.
+
+I stedet for en liste af Person-objekter (hver med sin egen __dict__) gemmes
+felterne i kolonner: tal i array, tekst som id'er i en fælles symboltabel.
+Registeret udleverer lette visninger, der opfører sig som de oprindelige
+klasser - inklusive __str__ og de validerende setters.
+"""
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import count, repeat
+
+# Kolonnetyper
+TAL = "tal"        # heltal i array("i") (TAL_MIN..TAL_MAX)
+TEKST = "tekst"    # id i symboltabellen
+LISTE = "liste"    # id for en tuple af tekster i symboltabellen
+
+# Type-kode for en række der er fjernet fra registeret
+SLETTET = 255
+
+# Grænserne for et TAL-felt (array("i") er 32 bit)
+TAL_MIN = -2 ** (8 * array("i").itemsize - 1)
+TAL_MAX = 2 ** (8 * array("i").itemsize - 1) - 1
+
+# Rækker pr. partition i ændringssporingen (se PersonRegistry.partition_versioner)
+PARTITION_STØRRELSE = 4096
+
+# Løbenummer der adskiller registre, så en gemt partition ikke forveksles med et andet registers
+_registre = count()
+
+_TUSINDER = re.compile(r"^-?\d{1,3}(\.\d{3})+$")
+
+
+def tal_fra_tekst(tekst):
+    """
+    Fortolk et beløb skrevet som tekst: "25000", "25.000", "25.000,50" og
+    "25000.5" giver tal; tom eller ugyldig tekst giver NaN.
+    """
+    tekst = tekst.strip().replace(" ", "").removesuffix("kr").removesuffix("kr.")
+    if "," in tekst:
+        tekst = tekst.replace(".", "").replace(",", ".")
+    elif _TUSINDER.match(tekst):
+        tekst = tekst.replace(".", "")
+    try:
+        return float(tekst)
+    except ValueError:
+        return float("nan")
+
+
+# --- Symboltabel ---
+class SymbolTabel:
+    """
+    Gemmer hver forskellig værdi (tekst eller tuple af tekster) præcis én gang.
+    Kolonnerne gemmer kun værdiens heltals-id, så gentagne værdier er gratis.
+    """
+    __slots__ = ("_id_for", "_værdier")
+
+    def __init__(self):
+        self._id_for = {}
+        self._værdier = []
+        self.id_for("")
+        self.id_for(())
+
+    def id_for(self, værdi):
+        """Returnér id for værdien - opret den hvis den ikke findes endnu."""
+        try:
+            return self._id_for[værdi]
+        except KeyError:
+            pass
+        if isinstance(værdi, str):
+            værdi = sys.intern(værdi)
+        elif isinstance(værdi, tuple):
+            værdi = tuple(map(sys.intern, værdi))
+        nyt_id = len(self._værdier)
+        self._id_for[værdi] = nyt_id
+        self._værdier.append(værdi)
+        return nyt_id
+
+    def find_id(self, værdi):
+        """Id for værdien, eller None hvis den ikke findes (opretter intet)."""
+        return self._id_for.get(værdi)
+
+    def værdi(self, symbol_id):
+        return self._værdier[symbol_id]
+
+    def __len__(self):
+        return len(self._værdier)
+
+
+# --- Skema ---
+class RegisterSkema:
+    """
+    Beskriver registerets kolonner og hvilke felter hver klasse bruger.
+
+    felter:     {feltnavn: TAL/TEKST/LISTE}
+    typer:      {klasse: (feltnavn, ...)} - rækkefølgen giver type-koderne
+    indekser:   felter der skal have et hash-indeks (værdi -> rækker)
+    intervaller: felter der skal have et sorteret indeks over feltets tal til
+                intervalopslag; tekstfelter fortolkes med tal_fra_tekst
+    """
+    def __init__(self, felter, typer, indekser=(), intervaller=()):
+        self.felter = dict(felter)
+        self.indekser = tuple(indekser)
+        self.intervaller = tuple(intervaller)
+        self.typer = {klasse: tuple(brugte) for klasse, brugte in typer.items()}
+        self.klasser = list(self.typer)
+        self.type_navne = [klasse.__name__ for klasse in self.klasser]
+        self.type_kode = {klasse: kode for kode, klasse in enumerate(self.klasser)}
+        self.visningsklasser = [self._lav_visningsklasse(klasse) for klasse in self.klasser]
+        for kode, visningsklasse in enumerate(self.visningsklasser):
+            self.type_kode[visningsklasse] = kode
+
+    def __reduce__(self):
+        # Visningsklasserne kan ikke pickles - skemaet genopbygges i den anden proces
+        return (RegisterSkema, (self.felter, self.typer, self.indekser, self.intervaller))
+
+    def kode_for(self, person):
+        """Find type-koden for et objekt - også for visninger og underklasser."""
+        for klasse in type(person).__mro__:
+            kode = self.type_kode.get(klasse)
+            if kode is not None:
+                return kode
+        raise TypeError(f"Ukendt persontype: {type(person).__name__}")
+
+    def _lav_visningsklasse(self, klasse):
+        attributter = {"__slots__": ()}
+        for felt in self.typer[klasse]:
+            # Felter med validerende property (fx alder) gemmer værdien i "_felt".
+            # Visningen overtager den interne attribut, så klassens setter stadig validerer.
+            egenskab = getattr(klasse, felt, None)
+            if not isinstance(egenskab, property):
+                attributter[felt] = _kolonne_property(felt, self.felter[felt])
+            elif self.felter[felt] == LISTE:
+                # Læsning giver tuplen fra symboltabellen uden kopi; den ændrbare
+                # _ListeVisning bygges først når klassen selv går til "_felt" (fx tilføj_fag)
+                attributter[felt] = property(_kolonne_property(felt, LISTE).fget, egenskab.fset)
+                attributter[f"_{felt}"] = _liste_property(felt)
+            else:
+                attributter[f"_{felt}"] = _kolonne_property(felt, self.felter[felt])
+        return type(f"{klasse.__name__}Visning", (RegisterVisning, klasse), attributter)
+
+
+def _kolonne_property(felt, slags):
+    if slags == TAL:
+        def hent(self):
+            return self._register._kolonner[felt][self._id]
+    else:
+        # TEKST og LISTE: den internerede str/tuple direkte fra symboltabellen
+        def hent(self):
+            register = self._register
+            return register._symboler.værdi(register._kolonner[felt][self._id])
+
+    def sæt(self, værdi):
+        self._register._sæt(self._id, felt, værdi)
+
+    return property(hent, sæt)
+
+
+def _liste_property(felt):
+    """Den ændrbare side af et LISTE-felt: en _ListeVisning der skriver tilbage til kolonnen."""
+    def hent(self):
+        return _ListeVisning(self, felt)
+
+    def sæt(self, værdi):
+        self._register._sæt(self._id, felt, værdi)
+
+    return property(hent, sæt)
+
+
+# --- Visninger ---
+class RegisterVisning:
+    """
+    Let visning af én række i et PersonRegistry.
+    Visningen har ingen egne data - alle felter læses og skrives i registerets kolonner.
+    """
+    __slots__ = ("_register", "_id")
+
+    def __init__(self, register, række_id):
+        self._register = register
+        self._id = række_id
+
+    @property
+    def register_id(self):
+        return self._id
+
+    def __eq__(self, other):
+        if isinstance(other, RegisterVisning):
+            return other._register is self._register and other._id == self._id
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._register), self._id))
+
+    def __repr__(self):
+        return f"<{type(self).__name__} #{self._id}: {self.navn}>"
+
+
+class _ListeVisning(dict):
+    """
+    Ordnet mængde over en LISTE-kolonne (bruges til Lærer._fag): en rigtig
+    dict som den Lærer selv bruger, så tilføj_fag og fjern_fag virker ens
+    for objekter og visninger, og opslag og ændringer i den er O(1).
+    Den bygges kun ved adgang til "_felt" - læsning af feltet giver tuplen.
+    [værdi] = None og del [værdi] skrives tilbage til kolonnen som én tuple
+    (kolonnen gemmer symbol-id'er for tupler); andre ændringer afvises.
+    """
+    __slots__ = ("_visning", "_felt")
+
+    def __init__(self, visning, felt):
+        register = visning._register
+        super().__init__(zip(register._symboler.værdi(register._kolonner[felt][visning._id]), repeat(None)))
+        self._visning = visning
+        self._felt = felt
+
+    def _gem(self):
+        self._visning._register._sæt(self._visning._id, self._felt, tuple(self))
+
+    def __setitem__(self, værdi, _):
+        if værdi not in self:
+            super().__setitem__(værdi, None)
+            self._gem()
+
+    def __delitem__(self, værdi):
+        super().__delitem__(værdi)
+        self._gem()
+
+    def _kun_tilføj_og_fjern(self, *args, **kwargs):
+        raise TypeError("Ændr listen med [værdi] = None og del [værdi]")
+
+    clear = pop = popitem = setdefault = update = __ior__ = _kun_tilføj_og_fjern
+
+    def copy(self):
+        return dict(self)
+
+
+# --- Sorteret indeks til intervalopslag ---
+class Intervalindeks:
+    """
+    Tal -> rækker som hash-indekserne, plus tallene i en sorteret liste, så
+    et interval findes med bisect i O(log n + k). Nye tal lægges bagerst og
+    listen sorteres først ved næste opslag - en hel indlæsning koster derfor
+    én sortering i stedet for en indsættelse pr. tal.
+    """
+    __slots__ = ("_tal", "_rækker", "_sorteret")
+
+    def __init__(self):
+        self._tal = []
+        self._rækker = {}
+        self._sorteret = True
+
+    def __len__(self):
+        return len(self._rækker)
+
+    def _sorter(self):
+        if not self._sorteret:
+            self._tal.sort()
+            self._sorteret = True
+
+    def tilføj(self, tal, række_id):
+        rækker = self._rækker.get(tal)
+        if rækker is None:
+            rækker = self._rækker[tal] = {}
+            if self._tal and tal < self._tal[-1]:
+                self._sorteret = False
+            self._tal.append(tal)
+        rækker[række_id] = None
+
+    def fjern(self, tal, række_id):
+        rækker = self._rækker[tal]
+        del rækker[række_id]
+        if not rækker:
+            del self._rækker[tal]
+            self._sorter()
+            del self._tal[bisect_left(self._tal, tal)]
+
+    def find(self, fra=None, til=None):
+        """Række-id'er med fra <= tal <= til (None = åben ende), ordnet efter tallet."""
+        self._sorter()
+        start = 0 if fra is None else bisect_left(self._tal, fra)
+        slut = len(self._tal) if til is None else bisect_right(self._tal, til)
+        for tal in self._tal[start:slut]:
+            yield from self._rækker[tal]
+
+
+# --- Registeret ---
+class PersonRegistry:
+    """
+    Kolonnebaseret container for Person-objekter og deres underklasser.
+
+    Hvert objekt der tilføjes pakkes ud i kolonnerne og smides væk; alder fylder
+    4 bytes i et array, og tekstfelter fylder 4 bytes pr. række plus én fælles
+    kopi af hver forskellig tekst. Rækker identificeres af et fast række-id.
+    """
+    def __init__(self, skema, personer=(), symboler=None):
+        self.skema = skema
+        self._symboler = symboler if symboler is not None else SymbolTabel()
+        self._typer = array("B")
+        self._kolonner = {
+            felt: array("i" if slags == TAL else "I")
+            for felt, slags in skema.felter.items()
+        }
+        self._brugte_felter = [frozenset(skema.typer[klasse]) for klasse in skema.klasser]
+        self._antal = 0
+        # Sekundære indekser. dict bruges som ordnet mængde af række-id'er,
+        # så tilføj og fjern er O(1) og rækkefølgen stadig er stabil.
+        # Indekserne bygges først ved det første opslag (se _byg_indekser).
+        self._type_indeks = None
+        self._indekser = None
+        self._intervaller = None
+        # Tekst -> tal for intervalfelterne; hver forskellig tekst fortolkes én gang
+        self._symbol_tal = {}
+        # Funktioner der kaldes med (hændelse, række_id) ved hver ændring
+        self._lyttere = []
+        # Holdes under hver ændring (inkl. lytterne), så en anden tråd kan tage
+        # en sammenhængende kopi af kolonnerne, fx ved gemning i baggrunden
+        self._lås = threading.RLock()
+        # Ændringssporing: for hver partition af PARTITION_STØRRELSE række-id'er
+        # nummeret på den seneste ændring i den (0 = uændret siden oprettelsen)
+        self._identitet = next(_registre)
+        self._partitioner = []
+        self._ændringer = 0
+        self.udvid(personer)
+
+    def tilføj_lytter(self, lytter):
+        """
+        Registrér en funktion der kaldes som lytter(hændelse, række_id) efter hver
+        ændring. Hændelserne er "tilføj", "erstat", "fjern" og "sæt" (ét felt ændret).
+        """
+        self._lyttere.append(lytter)
+
+    def fjern_lytter(self, lytter):
+        self._lyttere.remove(lytter)
+
+    def _meld(self, hændelse, række_id):
+        self._marker(række_id, række_id + 1)
+        for lytter in self._lyttere:
+            lytter(hændelse, række_id)
+
+    # --- Ændringssporing pr. partition ---
+    def _marker(self, start, slut):
+        """Notér at rækkerne start..slut-1 er ændret (kaldes med låsen holdt)."""
+        if start >= slut:
+            return
+        første, sidste = start // PARTITION_STØRRELSE, (slut - 1) // PARTITION_STØRRELSE
+        partitioner = self._partitioner
+        if sidste >= len(partitioner):
+            partitioner.extend(repeat(0, sidste + 1 - len(partitioner)))
+        self._ændringer += 1
+        for partition in range(første, sidste + 1):
+            partitioner[partition] = self._ændringer
+
+    def partition_versioner(self):
+        """
+        (identitet, versioner): versioner har én post pr. partition af
+        PARTITION_STØRRELSE række-id'er og skifter hver gang en række i
+        partitionen tilføjes, ændres eller fjernes. Sammen med identiteten
+        (der følger med i _kolonnekopi) kan en gemning se hvilke dele af en
+        tidligere skrevet fil der stadig passer.
+        """
+        antal = -(-len(self._typer) // PARTITION_STØRRELSE)
+        versioner = self._partitioner[:antal]
+        versioner.extend(repeat(0, antal - len(versioner)))
+        return self._identitet, versioner
+
+    def __len__(self):
+        return self._antal
+
+    def __iter__(self):
+        visningsklasser = self.skema.visningsklasser
+        for række_id, kode in enumerate(self._typer):
+            if kode != SLETTET:
+                yield visningsklasser[kode](self, række_id)
+
+    def __getitem__(self, række_id):
+        kode = self._typer[række_id]
+        if kode == SLETTET:
+            raise IndexError(f"Række {række_id} er fjernet")
+        return self.skema.visningsklasser[kode](self, række_id)
+
+    def index(self, visning):
+        """Række-id for en visning fra dette register (O(1) i stedet for en søgning)."""
+        if isinstance(visning, RegisterVisning) and visning._register is self:
+            return visning._id
+        raise ValueError("Personen findes ikke i registeret")
+
+    def _kod(self, felt, værdi):
+        slags = self.skema.felter[felt]
+        if slags == TAL:
+            if værdi is None:
+                return 0
+            tal = int(værdi)
+            if not TAL_MIN <= tal <= TAL_MAX:
+                raise ValueError(f"'{felt}' er uden for {TAL_MIN}..{TAL_MAX}: {tal}")
+            return tal
+        if slags == TEKST:
+            return self._symboler.id_for("" if værdi is None else str(værdi))
+        return self._symboler.id_for(tuple(sys.intern(str(v)) for v in værdi or ()))
+
+    def _sæt(self, række_id, felt, værdi):
+        with self._lås:
+            kodet = self._kod(felt, værdi)
+            indeks = self._indekser.get(felt) if self._indekser is not None else None
+            interval = self._intervaller.get(felt) if self._intervaller is not None else None
+            if indeks is not None:
+                self._indeks_fjern(indeks, felt, række_id)
+            if interval is not None and (tal := self.felt_tal(række_id, felt)) is not None:
+                interval.fjern(tal, række_id)
+            self._kolonner[felt][række_id] = kodet
+            if indeks is not None:
+                self._indeks_tilføj(indeks, felt, række_id)
+            if interval is not None and (tal := self.felt_tal(række_id, felt)) is not None:
+                interval.tilføj(tal, række_id)
+            self._meld("sæt", række_id)
+
+    # --- Vedligeholdelse af indekser ---
+    def _byg_indekser(self):
+        """Byg alle indekser i én gennemgang; derefter vedligeholdes de løbende."""
+        self._type_indeks = [{} for _ in self.skema.klasser]
+        self._indekser = {felt: {} for felt in self.skema.indekser}
+        self._intervaller = {felt: Intervalindeks() for felt in self.skema.intervaller}
+        for række_id, kode in enumerate(self._typer):
+            if kode != SLETTET:
+                self._indekser_række(række_id)
+
+    def _indeksnøgler(self, felt, række_id):
+        """
+        Nøglerne en række har i et indeks. Tomme værdier indekseres ikke.
+        Tekst indekseres på symbol-id, lister på hvert enkelt element (fx hvert fag).
+        """
+        kodet = self._kolonner[felt][række_id]
+        slags = self.skema.felter[felt]
+        if slags == TAL:
+            return (kodet,)
+        if slags == TEKST:
+            return (kodet,) if kodet else ()
+        return self._symboler.værdi(kodet)
+
+    def _indeks_tilføj(self, indeks, felt, række_id):
+        for nøgle in self._indeksnøgler(felt, række_id):
+            rækker = indeks.get(nøgle)
+            if rækker is None:
+                rækker = indeks[nøgle] = {}
+            rækker[række_id] = None
+
+    def _indeks_fjern(self, indeks, felt, række_id):
+        for nøgle in self._indeksnøgler(felt, række_id):
+            rækker = indeks[nøgle]
+            del rækker[række_id]
+            if not rækker:
+                del indeks[nøgle]
+
+    def _indekser_række(self, række_id, fjern=False):
+        if self._type_indeks is None:
+            return
+        kode = self._typer[række_id]
+        if fjern:
+            del self._type_indeks[kode][række_id]
+        else:
+            self._type_indeks[kode][række_id] = None
+        opdater = self._indeks_fjern if fjern else self._indeks_tilføj
+        for felt, indeks in self._indekser.items():
+            opdater(indeks, felt, række_id)
+        for felt, interval in self._intervaller.items():
+            tal = self.felt_tal(række_id, felt)
+            if tal is not None:
+                (interval.fjern if fjern else interval.tilføj)(tal, række_id)
+
+    def _skriv_række(self, række_id, kode, hent):
+        """
+        Skriv en række i kolonnerne; hent(felt) giver feltets værdi.
+        række_id == len(...) betyder ny række.
+        Alle værdier kodes før registeret røres, så en ugyldig værdi
+        (ValueError/TypeError) efterlader kolonner og indekser som før.
+        """
+        brugte = self._brugte_felter[kode]
+        kodet = [self._kod(felt, hent(felt) if felt in brugte else None) for felt in self._kolonner]
+        ny = række_id == len(self._typer)
+        if ny:
+            self._typer.append(kode)
+            for kolonne, værdi in zip(self._kolonner.values(), kodet):
+                kolonne.append(værdi)
+        else:
+            self._indekser_række(række_id, fjern=True)
+            self._typer[række_id] = kode
+            for kolonne, værdi in zip(self._kolonner.values(), kodet):
+                kolonne[række_id] = værdi
+        self._indekser_række(række_id)
+        return kode
+
+    def tilføj(self, person):
+        """Tilføj en person og returnér dens række-id."""
+        with self._lås:
+            række_id = len(self._typer)
+            self._skriv_række(række_id, self.skema.kode_for(person), lambda felt: getattr(person, felt))
+            self._antal += 1
+            self._meld("tilføj", række_id)
+            return række_id
+
+    def udvid(self, personer):
+        for person in personer:
+            self.tilføj(person)
+
+    def erstat(self, række_id, person):
+        """Erstat rækken med et nyt objekt, fx når en Person opgraderes til Borger."""
+        with self._lås:
+            self[række_id]  # Fejl hvis rækken ikke findes
+            self._skriv_række(række_id, self.skema.kode_for(person), lambda felt: getattr(person, felt))
+            self._meld("erstat", række_id)
+
+    def fjern(self, række_id):
+        with self._lås:
+            self[række_id]
+            self._indekser_række(række_id, fjern=True)
+            self._typer[række_id] = SLETTET
+            self._antal -= 1
+            self._meld("fjern", række_id)
+
+    # --- Rå rækker (uden objekter og uden ny validering) ---
+    def række_felter(self, række_id):
+        """Rækkens typenavn og {felt: værdi} for de felter typen bruger."""
+        kode = self._typer[række_id]
+        if kode == SLETTET:
+            raise IndexError(f"Række {række_id} er fjernet")
+        symboler = self._symboler
+        felter = {}
+        for felt in self.skema.typer[self.skema.klasser[kode]]:
+            kodet = self._kolonner[felt][række_id]
+            slags = self.skema.felter[felt]
+            if slags == TAL:
+                felter[felt] = kodet
+            elif slags == TEKST:
+                felter[felt] = symboler.værdi(kodet)
+            else:
+                felter[felt] = list(symboler.værdi(kodet))
+        return self.skema.type_navne[kode], felter
+
+    def tilføj_række(self, type_navn, felter):
+        """
+        Tilføj en række direkte fra feltværdier uden at oprette et objekt.
+        Bruges til data der allerede er valideret, fx ved genafspilning af journalen.
+        """
+        with self._lås:
+            række_id = len(self._typer)
+            self._skriv_række(række_id, self.skema.type_navne.index(type_navn), felter.get)
+            self._antal += 1
+            self._meld("tilføj", række_id)
+            return række_id
+
+    def tilføj_rækker(self, rækker):
+        """
+        Tilføj en batch af validerede (type_navn, felter)-rækker kolonne for
+        kolonne. Hver kolonne kodes samlet mod symboltabellen, så gentagne
+        værdier (køn, skole, fag, ...) kun slås op og aldrig gemmes igen.
+        """
+        if not rækker:
+            return
+        koder_for = {navn: kode for kode, navn in enumerate(self.skema.type_navne)}
+        koder = [koder_for[type_navn] for type_navn, _ in rækker]
+        alle_felter = [felter for _, felter in rækker]
+        with self._lås:
+            # Alle kolonner kodes færdigt (TAL direkte til array("i")) før nogen
+            # udvides, så en ugyldig værdi rejser ValueError uden at efterlade halve rækker
+            kodet = {}
+            for felt in self._kolonner:
+                værdier = list(map(dict.get, alle_felter, repeat(felt)))
+                # Felter typen ikke bruger gemmes tomme, ligesom i tilføj_række
+                for i, kode in enumerate(koder):
+                    if værdier[i] is not None and felt not in self._brugte_felter[kode]:
+                        værdier[i] = None
+                kodet[felt] = self._kod_kolonne(felt, værdier)
+            start = len(self._typer)
+            for felt, kolonne in self._kolonner.items():
+                kolonne.extend(kodet[felt])
+            self._typer.extend(koder)
+            self._antal += len(rækker)
+            self._marker(start, len(self._typer))
+            if self._type_indeks is not None or self._lyttere:
+                for række_id in range(start, len(self._typer)):
+                    self._indekser_række(række_id)
+                    self._meld("tilføj", række_id)
+
+    def _kod_kolonne(self, felt, værdier):
+        """Som _kod for en hel kolonne; kendte værdier slås op direkte i symboltabellen."""
+        slags = self.skema.felter[felt]
+        if slags == TAL:
+            tal = [0 if værdi is None else int(værdi) for værdi in værdier]
+            try:
+                return array("i", tal)
+            except OverflowError:
+                for værdi in tal:
+                    self._kod(felt, værdi)  # Rejser ValueError for den første værdi uden for TAL_MIN..TAL_MAX
+                raise
+        kendt = self._symboler._id_for.get
+        id_for = self._symboler.id_for
+        if slags == LISTE:
+            værdier = [værdi if værdi.__class__ is tuple else tuple(map(str, værdi or ())) for værdi in værdier]
+            return [symbol_id if (symbol_id := kendt(værdi)) is not None else id_for(værdi) for værdi in værdier]
+        tom = kendt("")
+        return [
+            tom if værdi is None
+            else symbol_id if (symbol_id := kendt(værdi)) is not None
+            else id_for(værdi if værdi.__class__ is str else str(værdi))
+            for værdi in værdier
+        ]
+
+    def erstat_række(self, række_id, type_navn, felter):
+        with self._lås:
+            self[række_id]
+            self._skriv_række(række_id, self.skema.type_navne.index(type_navn), felter.get)
+            self._meld("erstat", række_id)
+
+    def _tilføj_kolonner(self, typer, kolonner, symbol_værdier=None):
+        """
+        Tilføj færdigkodede rækker, fx fra et register bygget i en anden proces.
+        kolonner er {felt: array} og symbol_værdier den anden symboltabels
+        værdier; symbol-id'erne oversættes til dette registers symboltabel.
+        Uden symbol_værdier er kolonnerne kodet med registerets egen symboltabel.
+        """
+        with self._lås:
+            if symbol_værdier is not None:
+                oversæt = [self._symboler.id_for(værdi) for værdi in symbol_værdier]
+            start = len(self._typer)
+            self._typer.extend(typer)
+            for felt, kolonne in self._kolonner.items():
+                if symbol_værdier is None or self.skema.felter[felt] == TAL:
+                    kolonne.extend(kolonner[felt])
+                else:
+                    kolonne.extend(map(oversæt.__getitem__, kolonner[felt]))
+            # Fjernede rækker (SLETTET) følger med, så række-id'erne bevares
+            self._antal += len(typer) - typer.count(SLETTET)
+            self._marker(start, len(self._typer))
+            if self._type_indeks is not None or self._lyttere:
+                for række_id in range(start, len(self._typer)):
+                    if self._typer[række_id] != SLETTET:
+                        self._indekser_række(række_id)
+                        self._meld("tilføj", række_id)
+
+    def slettede_id(self):
+        """Række-id'er for fjernede rækker i stigende orden."""
+        return array("I", (række_id for række_id, kode in enumerate(self._typer) if kode == SLETTET))
+
+    @classmethod
+    def _fra_kolonner(cls, skema, typer, kolonner, symboler):
+        """Opret et register direkte fra færdige kolonner (fx fra et binært snapshot)."""
+        register = cls(skema, symboler=symboler)
+        register._typer = typer
+        register._kolonner = kolonner
+        register._antal = len(typer) - typer.count(SLETTET)
+        return register
+
+    def _kolonnekopi(self):
+        """
+        Kopi af kolonnerne (uden indekser og lyttere) der kan skrives til fil
+        fra en anden tråd, mens registeret selv fortsat ændres.
+        """
+        with self._lås:
+            kopi = PersonRegistry(self.skema, symboler=self._symboler)
+            kopi._typer = array("B", self._typer)
+            kopi._kolonner = {felt: array(kolonne.typecode, kolonne) for felt, kolonne in self._kolonner.items()}
+            kopi._antal = self._antal
+            kopi._identitet = self._identitet
+            kopi._partitioner = list(self._partitioner)
+            kopi._ændringer = self._ændringer
+            return kopi
+
+    def type_navn(self, række_id):
+        return self.skema.type_navne[self._typer[række_id]]
+
+    # --- Opslag via indekser ---
+    def række_id(self):
+        """Række-id'er for alle levende rækker i indsættelsesrækkefølge."""
+        return (række_id for række_id, kode in enumerate(self._typer) if kode != SLETTET)
+
+    def id_af_type(self, klasse):
+        """Række-id'er for præcis den givne klasse (klasse eller klassenavn)."""
+        if self._type_indeks is None:
+            self._byg_indekser()
+        kode = self.skema.type_navne.index(klasse) if isinstance(klasse, str) else self.skema.type_kode[klasse]
+        return self._type_indeks[kode].keys()
+
+    def af_type(self, *klasser):
+        """Alle personer af præcis de givne klasser (fx Person, men ikke Borger)."""
+        return [self[række_id] for klasse in klasser for række_id in self.id_af_type(klasse)]
+
+    def antal_af_type(self, klasse):
+        return len(self.id_af_type(klasse))
+
+    def har_indeks(self, felt):
+        return felt in self.skema.indekser
+
+    def find_id(self, felt, værdi):
+        """
+        Række-id'er hvor feltet har værdien - for fag: alle lærere med faget.
+        Feltet skal være nævnt i skemaets indekser.
+        """
+        if self._indekser is None:
+            self._byg_indekser()
+        try:
+            indeks = self._indekser[felt]
+        except KeyError:
+            raise KeyError(f"Feltet '{felt}' har intet indeks") from None
+        slags = self.skema.felter[felt]
+        if slags == TAL:
+            nøgle = int(værdi)
+        elif slags == TEKST:
+            nøgle = self._symboler.find_id(værdi)
+        else:
+            nøgle = værdi
+        return indeks.get(nøgle, {}).keys()
+
+    def find(self, felt, værdi):
+        """Alle personer hvor feltet har værdien (se find_id)."""
+        return [self[række_id] for række_id in self.find_id(felt, værdi)]
+
+    def har_intervalindeks(self, felt):
+        return felt in self.skema.intervaller
+
+    def find_interval_id(self, felt, fra=None, til=None):
+        """
+        Række-id'er hvor feltets tal ligger fra og med fra til og med til
+        (None = åben ende), ordnet efter tallet - fx find_interval_id("alder", 60, 67)
+        eller find_interval_id("husleje", 5000). Feltet skal være nævnt i
+        skemaets intervaller; rækker uden et tal i feltet er ikke med.
+        """
+        if self._intervaller is None:
+            self._byg_indekser()
+        try:
+            interval = self._intervaller[felt]
+        except KeyError:
+            raise KeyError(f"Feltet '{felt}' har intet intervalindeks") from None
+        return interval.find(fra, til)
+
+    def find_interval(self, felt, fra=None, til=None):
+        """Alle personer hvor feltets tal ligger i intervallet (se find_interval_id)."""
+        return [self[række_id] for række_id in self.find_interval_id(felt, fra, til)]
+
+    def felt_tal(self, række_id, felt):
+        """
+        Feltets værdi som tal, eller None hvis rækkens type ikke har feltet
+        eller teksten ikke er et tal (fx en tom indkomst).
+        """
+        kode = self._typer[række_id]
+        if kode == SLETTET or felt not in self._brugte_felter[kode]:
+            return None
+        kodet = self._kolonner[felt][række_id]
+        slags = self.skema.felter[felt]
+        if slags == TAL:
+            return kodet
+        if slags == LISTE:
+            return None
+        tal = self._symbol_tal.get(kodet)
+        if tal is None:
+            tal = self._symbol_tal[kodet] = tal_fra_tekst(self._symboler.værdi(kodet))
+        return None if tal != tal else tal  # NaN: ingen talværdi
+
+    def felt_værdi(self, række_id, felt):
+        """Ét felts værdi uden at oprette en visning."""
+        kodet = self._kolonner[felt][række_id]
+        slags = self.skema.felter[felt]
+        if slags == TAL:
+            return kodet
+        værdi = self._symboler.værdi(kodet)
+        return list(værdi) if slags == LISTE else værdi
@@ -0,0 +1,402 @@
+"""
+Det KODE.py og registrerings-system-1-1.py har til fælles: filerne,
+indlæsningen, lageret (journal eller SQLite), batchkørsel, registertjenesten
+og opstarten af terminalprogrammet.
+
+Scriptene har hver deres klasser, skema og CSV-format; de giver dem til et
+Registerprogram og beholder selv kun menuen:
+
+    PROGRAM = Registerprogram(SKEMA, CSV_KOLONNER, række_til_felter, opret_person,
+                              mappe=os.path.dirname(os.path.abspath(__file__)))
+
+række_til_felter(row) oversætter én CSV-række (dict) til (type_navn, felter)
+uden validering, og opret_person(type_navn, felter) laver det validerede
+objekt. række_til_felter skal ligge øverst i et modul, så processerne i
+parallel_import kan finde den.
+"""
+import asyncio
+import csv
+import os
+import sys
+from contextlib import nullcontext
+from itertools import islice
+
+import instrumentering
+from autogem import Autogem, gem_atomisk
+from csv_skriver import CSVSkriver
+from dubletter import flet
+from filtrering import filtrer_register, indlæs_filtreret
+from journal import STANDARD_GRÆNSE, Journal
+from kommandoer import Kommandomotor, læs_jsonl
+from parallel_import import indlæs_parallelt
+from personregister import PersonRegistry
+from snapshot import skriv_snapshot, åbn_snapshot
+from sqlite_lager import SQLiteLager
+from tjeneste import STANDARD_ADRESSE, Registerklient, Registertjeneste
+from validering import STANDARD_BATCH, ValideringsRapport, importer_rækker
+
+# --- Filnavne og lager ---
+FILENAME = "personliste.csv"
+# Binært snapshot ved siden af CSV-filen for hurtig opstart (None slår det fra)
+SNAPSHOT_FILENAME = "personliste.bin"
+# Lager: "csv" (CSV-fil + journal) eller "sqlite" (databasefil; CSV bruges til import/eksport)
+LAGER = os.environ.get("PERSONREGISTER_LAGER", "csv")
+SQLITE_FILENAME = "personliste.db"
+# CSV-filer over denne størrelse indlæses parallelt med flere processer
+PARALLEL_GRÆNSE = 64 * 1024 * 1024
+
+
+class Registerprogram:
+    """
+    Filer, lager og kørselsformer for ét skema og ét CSV-format.
+    Filnavnene er attributter, så fx benchmark kan pege programmet på andre filer.
+    """
+    def __init__(self, skema, csv_kolonner, række_til_felter, opret_person, mappe,
+                 filnavn=FILENAME, snapshot_filnavn=SNAPSHOT_FILENAME, lagertype=LAGER,
+                 sqlite_filnavn=SQLITE_FILENAME, parallel_grænse=PARALLEL_GRÆNSE, betegnelse="personer"):
+        self.skema = skema
+        self.række_til_felter = række_til_felter
+        self.opret_person = opret_person
+        self.mappe = mappe
+        self.filnavn = filnavn
+        self.snapshot_filnavn = snapshot_filnavn
+        self.lagertype = lagertype
+        self.sqlite_filnavn = sqlite_filnavn
+        self.parallel_grænse = parallel_grænse
+        # Bruges i beskederne om indlæsningen, fx "personer/Borgere"
+        self.betegnelse = betegnelse
+        # Koder CSV-filen partitionsvis og husker hvad den skrev sidst
+        self.csv_skriver = CSVSkriver(skema, csv_kolonner)
+        # Rækker i kildefilen som indlæsningen afviste (se åbn_lager())
+        self.afviste = 0
+        # Terminalprogrammets lager eller klient (se start())
+        self.klient = self.lager = self.autogem = self.personer = None
+
+    def filsti(self, filnavn=None):
+        return os.path.join(self.mappe, filnavn or self.filnavn)
+
+    def _snapshot_sti(self):
+        return self.filsti(self.snapshot_filnavn) if self.snapshot_filnavn else None
+
+    # --- Skrivning ---
+    def skriv_personer_csv(self, personer, filepath):
+        with instrumentering.fase("csv_skrivning") as måling:
+            # Rækkerne kodes direkte fra kolonnerne, og kun partitioner der er ændret
+            # siden sidste gemning - resten kopieres fra den nuværende fil (se csv_skriver.py)
+            self.csv_skriver.skriv(personer, filepath, forrige=self.filsti())
+            måling.rækker += len(personer)
+            if instrumentering.AKTIV:
+                måling.bytes += os.path.getsize(filepath)
+
+    def skriv_snapshot_filer(self, personer, filepath):
+        """CSV-fil og binært snapshot (bruges når journalen komprimeres)."""
+        self.skriv_personer_csv(personer, filepath)
+        if self.snapshot_filnavn:
+            # Stemplet for filepath overlever omdøbningen, så snapshot'et passer bagefter
+            skriv_snapshot(personer, self._snapshot_sti(), kilde=filepath)
+
+    def gem_lager(self, lager, personer):
+        """Fuld gemning (kaldes fra autogem-tråden ved "Gem")."""
+        if self.afviste:
+            # Kildefilen må ikke overskrives; ændringerne ligger i journalen
+            lager.synkroniser()
+            return
+        lager.komprimer()
+        if isinstance(lager, SQLiteLager):
+            # CSV-eksporten ved siden af databasen skiftes ind med os.replace
+            gem_atomisk(personer, self.skriv_personer_csv, self.filsti())
+
+    # --- Indlæsning ---
+    def iter_personer_csv(self, filepath=None, batch_størrelse=None, rapport=None, symboler=None):
+        """
+        Generator over personerne i CSV-filen, uden at hele filen ligger i
+        hukommelsen. Rækkerne læses med csv.DictReader og række_til_felter og
+        valideres kolonnevis, højst batch_størrelse (ellers STANDARD_BATCH) ad
+        gangen. Uden batch_størrelse gives én person ad gangen, med gives hver
+        batch som et PersonRegistry med højst så mange personer. Personerne er
+        visninger, så objektet først bygges når et felt bruges. Afviste rækker
+        noteres i rapport med rækkenumre for hele filen og springes over.
+        symboler er en SymbolTabel som alle batchene deler (fx symboltabellen
+        i det register de skal lægges ind i) - ellers har hver batch sin egen.
+        """
+        filepath = filepath or self.filsti()
+        if rapport is None:
+            rapport = ValideringsRapport()
+        if not os.path.exists(filepath):
+            return
+        with open(filepath, "r", newline="", encoding="utf-8") as f:
+            rækker = csv.DictReader(f)
+            while True:
+                før = rapport.antal_rækker
+                batch = PersonRegistry(self.skema, symboler=symboler)
+                importer_rækker(islice(rækker, batch_størrelse or STANDARD_BATCH), self.række_til_felter,
+                                batch, rapport)
+                if rapport.antal_rækker == før:
+                    return
+                if not batch_størrelse:
+                    yield from batch
+                elif batch:
+                    yield batch
+
+    def indlaes_personer_csv(self, rapport=None):
+        """
+        Indlæs alle personer fra CSV (eller snapshot'et) til et PersonRegistry
+        og genafspil journalen. Afviste rækker samles i rapport hvis den gives.
+        """
+        filepath = self.filsti()
+        if rapport is None:
+            rapport = ValideringsRapport()
+
+        # Brug det binære snapshot hvis det stadig passer til CSV-filen
+        snapshot_sti = self._snapshot_sti()
+        with instrumentering.fase("snapshot_indlæsning") as måling:
+            personer = åbn_snapshot(snapshot_sti, self.skema, kilde=filepath) if snapshot_sti else None
+            måling.rækker += len(personer) if personer is not None else 0
+        if personer is not None:
+            print(f"{len(personer)} {self.betegnelse} indlæst fra '{snapshot_sti}'")
+        elif os.path.exists(filepath):
+            with instrumentering.fase("csv_indlæsning") as måling:
+                if os.path.getsize(filepath) >= self.parallel_grænse:
+                    personer = indlæs_parallelt(filepath, self.række_til_felter, self.skema, rapport)
+                else:
+                    # Rækkerne valideres kolonnevis i batches; ugyldige rækker afvises
+                    # og noteres i rapporten i stedet for at stoppe indlæsningen.
+                    # Batchene koder med registerets symboltabel, så kolonnerne lægges ind som de er
+                    personer = PersonRegistry(self.skema)
+                    for batch in self.iter_personer_csv(filepath, STANDARD_BATCH, rapport, personer._symboler):
+                        personer._tilføj_kolonner(batch._typer, batch._kolonner)
+                måling.rækker += rapport.antal_rækker
+                måling.fejl += len(rapport.fejl)
+            print(f"{len(personer)} {self.betegnelse} indlæst fra '{filepath}'")
+            if rapport:
+                print(f"⚠ {rapport}:")
+                for fejl in rapport.fejl[:5]:
+                    print(f"  Række {fejl.række}: {fejl.besked} ({fejl.værdi!r})")
+            elif snapshot_sti:
+                # Kun et fejlfrit resultat gemmes som snapshot, så advarslerne ikke forsvinder
+                skriv_snapshot(personer, snapshot_sti, kilde=filepath)
+        else:
+            personer = PersonRegistry(self.skema)
+            print("Ingen tidligere fil fundet, starter med tom liste.")
+
+        # Ændringer siden sidste fulde gemning ligger i journalen
+        with instrumentering.fase("journal_genafspilning") as måling:
+            antal = måling.rækker = Journal(filepath, self.skriv_snapshot_filer).genafspil(personer)
+        if antal:
+            print(f"{antal} ændringer genafspillet fra journalen.")
+        return personer
+
+    def indlaes_personer_filtreret(self, filter, rapport=None):
+        """
+        Kun de personer der matcher et filter (se filtrering.py), fx
+        Filter(type="Borger", pensionist="Ja"). Rækker der ikke matcher, bliver
+        hverken valideret eller lagt i registeret. Udsnittet er til opslag og
+        rapporter - det skal ikke gemmes over hele listen.
+        """
+        filepath = self.filsti()
+        # Journalen kan kun genafspilles på hele registeret, og et gyldigt snapshot
+        # indlæses på et øjeblik - i de tilfælde filtreres det færdige register
+        if Journal(filepath, self.skriv_snapshot_filer).har_ændringer():
+            return filtrer_register(self.indlaes_personer_csv(rapport), filter)
+        snapshot_sti = self._snapshot_sti()
+        personer = åbn_snapshot(snapshot_sti, self.skema, kilde=filepath) if snapshot_sti else None
+        if personer is not None:
+            return filtrer_register(personer, filter)
+        if rapport is None:
+            rapport = ValideringsRapport()
+        personer = indlæs_filtreret(filepath, self.række_til_felter, self.skema, filter, rapport)
+        print(f"{len(personer)} af {rapport.antal_rækker} rækker matcher {filter}")
+        if rapport:
+            print(f"⚠ {len(rapport.afviste_rækker)} matchende rækker afvist:")
+            for fejl in rapport.fejl[:5]:
+                print(f"  Række {fejl.række}: {fejl.besked} ({fejl.værdi!r})")
+        return personer
+
+    def indlaes_personer_sqlite(self, lager, rapport=None):
+        """Indlæs fra SQLite; CSV-filen importeres første gang."""
+        if lager.antal():
+            personer = lager.indlæs()
+            print(f"{len(personer)} {self.betegnelse} indlæst fra '{lager.sti}'")
+            return personer
+        # Tom database: CSV-filen er importvejen; lager.følg skriver rækkerne til databasen
+        return self.indlaes_personer_csv(rapport)
+
+    def åbn_lager(self):
+        """
+        (lager, personer) - lageret følger endnu ikke registeret.
+
+        Afviste indlæsningen rækker, har kildefilen personer som registeret
+        ikke har, og en fuld gemning ville slette dem. Så længe det er
+        tilfældet, bruges journalen uden komprimering: ændringerne gemmes og
+        genafspilles som ellers, men CSV-filen overskrives ikke (og en tom
+        SQLite-database får ikke en halv import).
+        """
+        rapport = ValideringsRapport()
+        if self.lagertype == "sqlite":
+            # Hver ændring skrives straks til databasen; CSV-filen er kun eksport
+            lager = SQLiteLager(self.filsti(self.sqlite_filnavn), self.skema)
+            personer = self.indlaes_personer_sqlite(lager, rapport)
+            if not rapport:
+                self.afviste = 0
+                return lager, personer
+            lager.luk()
+        else:
+            # Hver ændring skrives straks som én linje i journalen i stedet for at
+            # omskrive hele CSV-filen; "Gem" komprimerer journalen til et nyt snapshot.
+            personer = self.indlaes_personer_csv(rapport)
+        self.afviste = len(rapport.afviste_rækker)
+        if self.afviste:
+            print(f"⚠ '{self.filsti()}' overskrives ikke, så de {self.afviste} afviste rækker ikke går tabt.\n"
+                  "  Ændringerne gemmes i journalen; ret eller fjern rækkerne for at gemme hele filen igen.")
+        return Journal(self.filsti(), self.skriv_snapshot_filer, grænse=None if self.afviste else STANDARD_GRÆNSE), personer
+
+    def gem(self, motor):
+        """Menuens "Gem": skrives af baggrundstråden - menuen venter ikke."""
+        try:
+            motor.udfør({"kommando": "gem"})
+        except (ValueError, ConnectionError) as fejl:
+            # Kun med en registertjeneste: den svarede med en fejl eller er væk
+            print(f"⚠ Listen blev ikke gemt: {fejl}")
+            return
+        if self.afviste:
+            print(f"⚠ Ændringerne er gemt i journalen; '{self.filsti()}' overskrives ikke "
+                  f"pga. {self.afviste} afviste rækker.")
+        else:
+            print(f"Listen gemmes i '{self.filsti()}' (CSV-fil).")
+
+    # --- Menuen ---
+    def læs_interval(self, tekst):
+        """
+        Intervalfilter fra menuen, fx "alder=60-67" eller "husleje=5000-", som
+        {felt: (fra, til)} til Listevisning; ValueError ved ukendt felt eller ugyldige tal.
+        """
+        felt, lig, grænser = tekst.partition("=")
+        felt = felt.strip()
+        if not lig or felt not in self.skema.intervaller:
+            raise ValueError(f"Skriv felt=fra-til, hvor feltet er {', '.join(self.skema.intervaller)}")
+        fra, streg, til = grænser.partition("-")
+        fra = fra.strip()
+        til = til.strip() if streg else fra  # Ét tal: præcis den værdi
+        try:
+            return {felt: (float(fra) if fra else None, float(til) if til else None)}
+        except ValueError:
+            raise ValueError(f"Ugyldigt interval: {grænser.strip()!r}") from None
+
+    # --- Batchkørsel: kommandoer fra en JSONL-fil eller stdin (se kommandoer.py) ---
+    def kør_batch(self, kilde):
+        """
+        Ændringerne skrives ikke løbende til journalen/databasen: lageret følger
+        først registeret når alle kommandoer er udført, og så gemmes alt én gang.
+        Returnerer om alle kommandoer blev udført.
+        """
+        # Kører der en registertjeneste for filen, sendes kommandoerne til den
+        klient = Registerklient.find(STANDARD_ADRESSE, self.skema, self.opret_person, self.filsti())
+        if klient is not None:
+            return self.kør_batch_klient(klient, kilde)
+        lager, personer = self.åbn_lager()
+        if self.afviste:
+            # Ingen fuld gemning - ændringerne skal i journalen efterhånden
+            lager.følg(personer)
+
+        def gem():
+            if isinstance(lager, SQLiteLager):
+                lager.gem(personer)
+            elif not self.afviste:
+                lager.følg(personer)
+            self.gem_lager(lager, personer)
+
+        motor = Kommandomotor(personer, self.opret_person, gem)
+        rapport = ValideringsRapport()
+        with nullcontext(sys.stdin) if kilde == "-" else open(kilde, encoding="utf-8") as f:
+            udført = motor.udfør_batch(læs_jsonl(f), rapport)
+        lager.luk()
+        return _vis_batchresultat(rapport, udført)
+
+    def kør_batch_klient(self, klient, kilde):
+        """Batchkørsel gennem registertjenesten - den gemmer som den plejer."""
+        rapport = ValideringsRapport()
+        try:
+            with nullcontext(sys.stdin) if kilde == "-" else open(kilde, encoding="utf-8") as f:
+                udført = klient.udfør_batch(læs_jsonl(f), rapport)
+        finally:
+            klient.luk()
+        print(f"(Udført af registertjenesten på {klient.adresse})")
+        return _vis_batchresultat(rapport, udført)
+
+    # --- Registertjeneste: ét register for mange terminaler (se tjeneste.py) ---
+    def kør_tjeneste(self, adresse):
+        lager, personer = self.åbn_lager()
+        lager.følg(personer)
+        autogem = Autogem(personer, lambda: self.gem_lager(lager, personer), lager.synkroniser)
+        motor = Kommandomotor(personer, self.opret_person, autogem.gem_nu)
+        try:
+            asyncio.run(Registertjeneste(personer, motor, lager, self.filsti()).kør(adresse))
+        except KeyboardInterrupt:
+            print("\nRegistertjenesten stoppes.")
+        finally:
+            autogem.luk()
+            lager.luk()
+
+    # --- Terminalprogram ---
+    def start(self, klient_adresse=None):
+        """
+        Åbn registeret til menuen og returnér (personer, motor) - eller None
+        hvis den angivne tjeneste ikke kan bruges. Kører der allerede en
+        registertjeneste for filen, bruges dens register i stedet for en egen kopi.
+        """
+        if klient_adresse is not None:
+            try:
+                self.klient = Registerklient(klient_adresse, self.skema, self.opret_person, self.filsti())
+            except (OSError, ValueError) as fejl:
+                print(f"⚠ Kan ikke bruge registertjenesten på {klient_adresse}: {fejl}")
+                return None
+        else:
+            self.klient = Registerklient.find(STANDARD_ADRESSE, self.skema, self.opret_person, self.filsti())
+        if self.klient is not None:
+            # Registeret er tjenestens kopi; ændringer sendes til tjenesten, der gemmer dem
+            print(f"Forbundet til registertjenesten på {self.klient.adresse}.")
+            self.personer = self.klient.register
+            return self.personer, self.klient
+        lager, personer = self.åbn_lager()
+        lager.følg(personer)
+        # Efter et øjebliks ro fsync'es journalen i baggrunden; fuld gemning
+        # (komprimering) sker ved "Gem" eller når journalen når sin grænse
+        self.autogem = Autogem(personer, lambda: self.gem_lager(lager, personer), lager.synkroniser)
+        self.lager, self.personer = lager, personer
+        # Menuen er et tyndt lag over samme kommandomotor som batchkørslen
+        return personer, Kommandomotor(personer, self.opret_person, self.autogem.gem_nu)
+
+    def synkroniser(self):
+        """Hent andre terminalers ændringer (kun med en registertjeneste)."""
+        if self.klient is not None:
+            try:
+                self.klient.synkroniser()
+            except (ValueError, ConnectionError) as fejl:
+                print(f"⚠ {fejl}")
+
+    def flet(self, søgning):
+        """Flet dubletterne; med en tjeneste flettes der i dens register (den søger selv igen)."""
+        if self.klient is not None:
+            return self.klient.flet()
+        return flet(self.personer, søgning)
+
+    def afslut(self):
+        """Luk forbindelsen, eller gem de sidste ændringer og luk lageret."""
+        if self.klient is not None:
+            self.klient.luk()
+            return
+        if self.autogem.ugemt:
+            print("Gemmer de sidste ændringer...")
+        self.autogem.luk()
+        self.lager.luk()
+
+
+def _vis_batchresultat(rapport, udført):
+    print(f"{rapport.antal_rækker} kommandoer læst: "
+          + (", ".join(f"{antal} {art}" for art, antal in udført.items()) or "intet udført"))
+    if rapport:
+        print(f"⚠ {len(rapport.afviste_rækker)} kommandoer afvist ({len(rapport.fejl)} fejl):")
+        for fejl in rapport.fejl[:5]:
+            felt = f"{fejl.felt}: " if fejl.felt else ""
+            print(f"  Kommando {fejl.række}: {felt}{fejl.besked}")
+    return not rapport
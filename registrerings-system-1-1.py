@@ -1,6 +1,15 @@
-import csv
+import argparse
 import os
-import re
+import sys
+from functools import lru_cache
+
+import instrumentering
+from dubletter import Dubletsøgning
+from listevisning import Listevisning, bladr
+from personregister import LISTE, TAL, TEKST, RegisterSkema
+from registerprogram import Registerprogram
+from tjeneste import STANDARD_ADRESSE
+from validering import EMAIL_MØNSTER
 
 # --- Klasser ---
 class Person:
@@ -47,7 +56,9 @@ class Lærer(Person):
         # Brug properties - dette kalder automatisk setters med validering
         self.email = email
         self.telefon = telefon
-        self._fag = fag if fag else []
+        # dict bruges som ordnet mængde: fagene beholder rækkefølgen, og
+        # opslag, tilføjelse og fjernelse er O(1)
+        self._fag = dict.fromkeys(fag or ())
     
     @property
     def email(self):
@@ -65,9 +76,8 @@ class Lærer(Person):
         if not isinstance(value, str):
             raise TypeError("Email skal være tekst")
         
-        # Regex mønster for email-validering
-        email_mønster = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_mønster, value):
+        # Prækompileret regex-mønster for email-validering (delt med validering.py)
+        if not EMAIL_MØNSTER.match(value):
             raise ValueError("Email skal have formatet: navn@domæne.dk")
         
         self._email = value
@@ -100,158 +110,157 @@ class Lærer(Person):
     @property
     def fag(self):
         """
-        Getter for fag - returnerer en kopi så den interne liste ikke kan ændres direkte.
+        Getter for fag - returnerer en skrivebeskyttet visning af fagene uden at kopiere dem.
         Dette beskytter vores data - brugere skal bruge tilføj_fag() og fjern_fag().
         """
-        return self._fag.copy()
+        return self._fag.keys()
     
     def tilføj_fag(self, fag_navn):
         """Tilføj et fag til lærerens fagliste hvis det ikke allerede findes."""
         if fag_navn not in self._fag:
-            self._fag.append(fag_navn)
+            self._fag[fag_navn] = None
             return True
         return False
     
     def fjern_fag(self, fag_navn):
         """Fjern et fag fra lærerens fagliste hvis det findes."""
         if fag_navn in self._fag:
-            self._fag.remove(fag_navn)
+            del self._fag[fag_navn]
             return True
         return False
     
     def __str__(self):
-        fag_tekst = ", ".join(self._fag) if self._fag else "Ingen fag tildelt"
+        fag_tekst = ", ".join(self.fag) if self.fag else "Ingen fag tildelt"
         return (f"{super().__str__()}, Email: {self.email}, "
                 f"Telefon: {self.telefon}, Fag: {fag_tekst}")
 
 
+# --- Skema for det kolonnebaserede register ---
+SKEMA = RegisterSkema(
+    felter={
+        "navn": TEKST, "alder": TAL, "køn": TEKST,
+        "skole": TEKST, "klassetrin": TEKST,
+        "email": TEKST, "telefon": TEKST, "fag": LISTE,
+    },
+    typer={
+        Person: ("navn", "alder", "køn"),
+        Elev: ("navn", "alder", "køn", "skole", "klassetrin"),
+        Lærer: ("navn", "alder", "køn", "email", "telefon", "fag"),
+    },
+    indekser=("navn", "skole", "fag"),
+    intervaller=("alder", "klassetrin"),
+)
+
+# Klasserne slået op på navn (fx fra type-feltet i CSV-filen)
+KLASSER = {klasse.__name__: klasse for klasse in SKEMA.klasser}
+
+# Kolonnerne i CSV-filen - udvidet for at rumme både Elev og Lærer attributter
+CSV_KOLONNER = [
+    "type",  # NYT: Hvilken klasse er objektet
+    "navn", "alder", "køn",
+    "skole", "klassetrin",  # For Elev
+    "email", "telefon", "fag"  # For Lærer (semikolon-separeret)
+]
+
+
 # --- Filnavn ---
 FILENAME = "personliste.csv"
 
 
-# --- Gem listen til CSV (opdateret version) ---
-def gem_personer_csv(personer):
+# --- Fag-teksten fra CSV-filen ("Dansk;Matematik") som tuple ---
+@lru_cache(maxsize=4096)
+def _fag_fra_tekst(fag_str):
+    """
+    Uden tomme strenge og dubletter. De samme kombinationer af fag går igen
+    hos mange lærere, så hver forskellig tekst deles kun op én gang, og den
+    samme tuple genkendes direkte af registerets symboltabel.
+    """
+    return tuple(dict.fromkeys(f for f in fag_str.split(";") if f))
+
+
+# --- Oversæt én CSV-række til type og feltværdier (uden validering) ---
+def række_til_felter(row):
     """
-    Gem personer til CSV med understøttelse for både Person, Elev og Lærer.
-    Tilføjer type-felt så vi ved hvilken slags objekt der skal oprettes ved indlæsning.
+    Finder typen (Person, Elev eller Lærer) ud fra type-feltet i rækken.
+    Rækker uden type-felt håndteres med den gamle logik (bagudkompatibilitet).
     """
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    filepath = os.path.join(script_dir, FILENAME)
+    felter = {"navn": row["navn"], "alder": row["alder"], "køn": row["køn"]}
     
-    # Udvidede felter for at rumme både Elev og Lærer attributter
-    felt_navn = [
-        "type",  # NYT: Hvilken klasse er objektet
-        "navn", "alder", "køn",
-        "skole", "klassetrin",  # For Elev
-        "email", "telefon", "fag"  # For Lærer
-    ]
+    # Læs typen for at vide hvad vi skal oprette
+    person_type = row.get("type", "")
     
-    with open(filepath, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=felt_navn)
-        writer.writeheader()
+    if person_type == "Lærer":
+        felter["email"] = row["email"]
+        felter["telefon"] = row["telefon"]
+        felter["fag"] = _fag_fra_tekst(row.get("fag", ""))
+        return "Lærer", felter
         
-        for p in personer:
-            # Start med grundlæggende info alle har
-            row = {
-                "navn": p.navn,
-                "alder": p.alder,
-                "køn": p.køn,
-            }
-            
-            # Tilføj type-specifik information
-            if isinstance(p, Lærer):
-                row["type"] = "Lærer"
-                row["email"] = p.email
-                row["telefon"] = p.telefon
-                # Fag er en liste - gem som semikolon-separeret string
-                row["fag"] = ";".join(p.fag)
-                # Sæt elev-felter til tomme
-                row["skole"] = ""
-                row["klassetrin"] = ""
-                
-            elif isinstance(p, Elev):
-                row["type"] = "Elev"
-                row["skole"] = p.skole
-                row["klassetrin"] = p.klassetrin
-                # Sæt lærer-felter til tomme
-                row["email"] = ""
-                row["telefon"] = ""
-                row["fag"] = ""
-                
-            else:  # Almindelig Person
-                row["type"] = "Person"
-                # Sæt alle specifikke felter til tomme
-                row["skole"] = ""
-                row["klassetrin"] = ""
-                row["email"] = ""
-                row["telefon"] = ""
-                row["fag"] = ""
-            
-            writer.writerow(row)
+    # "Elev", eller gammel fil uden type-felt men med skole/klassetrin
+    if person_type == "Elev" or (not person_type and (row.get("skole") or row.get("klassetrin"))):
+        felter["skole"] = row["skole"]
+        felter["klassetrin"] = row["klassetrin"]
+        return "Elev", felter
     
+    return "Person", felter
+
+
+# --- Opret objekt ud fra type og feltværdier ---
+def opret_person(type_navn, felter):
+    """Opretter objektet; email, telefon og alder valideres af setterne."""
+    felter = dict(felter)
+    fag = felter.pop("fag", ())
+    try:
+        person = KLASSER[type_navn](**felter)
+    except (TypeError, ValueError):
+        instrumentering.tæl("setter_fejl")
+        raise
+    instrumentering.tæl("objekter_oprettet")
+    # Tilføj hvert fag
+    for fag_navn in fag:
+        person.tilføj_fag(fag_navn)
+    return person
+
+
+# --- Filer, lager, batchkørsel og registertjeneste (se registerprogram.py) ---
+PROGRAM = Registerprogram(
+    SKEMA, CSV_KOLONNER, række_til_felter, opret_person,
+    mappe=os.path.dirname(os.path.abspath(__file__)), filnavn=FILENAME,
+)
+
+
+# --- Gem listen til CSV (opdateret version) ---
+def gem_personer_csv(personer):
+    """Gem hele listen i personliste.csv - kun partitioner ændret siden sidste gemning kodes igen."""
+    filepath = PROGRAM.filsti()
+    PROGRAM.skriv_personer_csv(personer, filepath)
     print(f"Listen er gemt i '{filepath}' (CSV-fil).")
 
 
 # --- Indlæs liste fra CSV (opdateret version) ---
-def indlaes_personer_csv():
+def indlaes_personer_csv(rapport=None):
     """
-    Indlæs personer fra CSV med understøttelse for forskellige typer.
-    Opretter det rigtige objekt baseret på type-feltet.
+    Indlæs alle personer fra CSV til et kolonnebaseret PersonRegistry.
+    Rækkerne streames i batches ind i registeret uden at oprette objekter.
+    Afviste rækker samles i rapport (en ValideringsRapport) hvis den gives.
     """
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    filepath = os.path.join(script_dir, FILENAME)
-    
-    personer = []
-    if os.path.exists(filepath):
-        with open(filepath, "r", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            
-            for row in reader:
-                navn = row["navn"]
-                alder = int(row["alder"])
-                køn = row["køn"]
-                
-                # Læs typen for at vide hvad vi skal oprette
-                person_type = row.get("type", "")
-                
-                if person_type == "Lærer":
-                    email = row["email"]
-                    telefon = row["telefon"]
-                    # Konverter fag-string tilbage til liste
-                    fag_str = row.get("fag", "")
-                    fag = fag_str.split(";") if fag_str else []
-                    
-                    lærer = Lærer(navn, alder, køn, email, telefon)
-                    # Tilføj hvert fag
-                    for fag_navn in fag:
-                        if fag_navn:  # Spring over tomme strenge
-                            lærer.tilføj_fag(fag_navn)
-                    
-                    personer.append(lærer)
-                    
-                elif person_type == "Elev":
-                    skole = row["skole"]
-                    klassetrin = row["klassetrin"]
-                    personer.append(Elev(navn, alder, køn, skole, klassetrin))
-                    
-                else:  # "Person" eller tomt (bagudkompatibilitet)
-                    # Hvis ingen type, prøv den gamle logik
-                    if not person_type and (row.get("skole") or row.get("klassetrin")):
-                        # Gammel fil uden type-felt, men med skole/klassetrin
-                        personer.append(Elev(navn, alder, køn, row["skole"], row["klassetrin"]))
-                    else:
-                        personer.append(Person(navn, alder, køn))
-        
-        print(f"{len(personer)} personer indlæst fra '{filepath}'")
-    else:
-        print("Ingen tidligere fil fundet, starter med tom liste.")
-    
-    return personer
+    return PROGRAM.indlaes_personer_csv(rapport)
+
+
+# --- Læs personer fra CSV én ad gangen (streaming) ---
+def iter_personer_csv(filepath=None, batch_størrelse=None, rapport=None):
+    """Person/Elev/Lærer-objekterne i CSV-filen én ad gangen, eller i batches (se Registerprogram)."""
+    return PROGRAM.iter_personer_csv(filepath, batch_størrelse, rapport)
 
 
 # --- Terminalprogram ---
-def main():
-    personer = indlaes_personer_csv()
+def main(klient_adresse=None):
+    startet = PROGRAM.start(klient_adresse)
+    if startet is None:
+        return
+    # Med en registertjeneste er registeret tjenestens kopi og motoren klienten
+    personer, motor = startet
+    # Sidevis visning - formaterede linjer caches indtil personen ændres
+    liste = Listevisning(personer)
 
     while True:
         print("\n" + "="*60)
@@ -262,29 +271,41 @@ def main():
         print("3. Tilføj elev")
         print("4. Tilføj lærer")  # NYT
         print("5. Gem liste som CSV")
-        print("6. Afslut")
+        print("6. Find dubletter")
+        print("7. Afslut")
         print("="*60)
         valg = input("Vælg en mulighed: ")
+        PROGRAM.synkroniser()  # Andre terminalers ændringer, hvis der er en tjeneste
 
         if valg == "1":
             navn = input("Indtast navn: ")
             alder = input("Indtast alder: ")
             køn = input("Indtast køn: ")
             try:
-                alder = int(alder)
-                p = Person(navn, alder, køn)
-                personer.append(p)
+                motor.udfør({"kommando": "tilføj", "type": "Person", "navn": navn, "alder": alder, "køn": køn})
                 print("✓ Person tilføjet!")
-            except ValueError as e:
+            except (TypeError, ValueError, ConnectionError) as e:
                 print(f"⚠ Fejl: {e}")
 
         elif valg == "2":
             if not personer:
                 print("Ingen personer registreret endnu.")
             else:
+                type_navn = input("Vis kun type (Person/Elev/Lærer, Enter for alle): ").strip()
+                if type_navn and type_navn not in KLASSER:
+                    print("⚠ Ukendt type.")
+                    continue
+                navn_præfiks = input("Navn begynder med (Enter for alle): ")
+                skole = input("Skole (Enter for alle): ").strip()
+                filter = {"skole": skole} if skole else {}
+                interval = input("Interval, fx klassetrin=7-9 eller alder=60-67 (Enter for alle): ").strip()
+                try:
+                    filter.update(PROGRAM.læs_interval(interval) if interval else {})
+                except ValueError as e:
+                    print(f"⚠ Fejl: {e}")
+                    continue
                 print("\n--- Registrerede personer ---")
-                for i, person in enumerate(personer, start=1):
-                    print(f"{i}. {person}")
+                bladr(liste, type_navn=type_navn or None, navn_præfiks=navn_præfiks or None, **filter)
 
         elif valg == "3":
             navn = input("Indtast navn: ")
@@ -293,10 +314,10 @@ def main():
             skole = input("Indtast skole: ")
             klassetrin = input("Indtast klassetrin: ")
             try:
-                elev = Elev(navn, int(alder), køn, skole, klassetrin)
-                personer.append(elev)
+                motor.udfør({"kommando": "tilføj", "type": "Elev", "navn": navn, "alder": alder,
+                             "køn": køn, "skole": skole, "klassetrin": klassetrin})
                 print(f"✓ Elev {navn} tilføjet!")
-            except ValueError as e:
+            except (TypeError, ValueError, ConnectionError) as e:
                 print(f"⚠ Fejl: {e}")
 
         elif valg == "4":
@@ -308,9 +329,11 @@ def main():
             email = input("Indtast email: ")
             telefon = input("Indtast telefon (8 cifre): ")
             
+            kommando = {"kommando": "tilføj", "type": "Lærer", "navn": navn, "alder": alder,
+                        "køn": køn, "email": email, "telefon": telefon}
             try:
-                # Email og telefon valideres automatisk via properties
-                lærer = Lærer(navn, int(alder), køn, email, telefon)
+                # Email og telefon valideres automatisk via properties - før fagene spørges
+                lærer = motor.opret(kommando)
                 
                 # Tilføj fag
                 print("\nTilføj fag (tryk Enter uden at skrive noget for at afslutte)")
@@ -323,20 +346,39 @@ def main():
                     else:
                         print(f"  ⚠ {fag} er allerede tilføjet")
                 
-                personer.append(lærer)
+                kommando["fag"] = list(lærer.fag)
+                motor.udfør(kommando)
                 print(f"✓ Lærer {navn} tilføjet!")
                 
-            except ValueError as e:
+            except (ValueError, ConnectionError) as e:
                 print(f"⚠ Fejl: {e}")
             except TypeError as e:
                 print(f"⚠ Fejl: {e}")
 
         elif valg == "5":
-            gem_personer_csv(personer)
+            PROGRAM.gem(motor)  # Skrives af baggrundstråden - menuen venter ikke
 
         elif valg == "6":
+            søgning = Dubletsøgning(personer)
+            if not søgning:
+                print("Ingen dubletter fundet.")
+                continue
+            print(f"\n--- {len(søgning)} mulige dubletter ---")
+            for dublet in søgning.dubletter[:20]:
+                print(f"{dublet.score:.2f}: {personer[dublet.række_a]}\n      {personer[dublet.række_b]}")
+            if input("Flet dubletterne? (ja/nej): ").strip().lower() == "ja":
+                try:
+                    fjernet, konflikter = PROGRAM.flet(søgning)
+                except (ValueError, ConnectionError) as e:
+                    print(f"⚠ Fejl: {e}")
+                    continue
+                print(f"{fjernet} dubletter flettet.")
+                if konflikter:
+                    print(f"⚠ {konflikter} grupper med forskellige typer blev ikke flettet.")
+
+        elif valg == "7":
             print("Program afsluttes.")
-            gem_personer_csv(personer)
+            PROGRAM.afslut()
             break
 
         else:
@@ -344,4 +386,17 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # --stats / --profile [cprofile|tracemalloc|begge] - se instrumentering.py
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", metavar="FIL", help="udfør kommandoer fra en JSONL-fil (- for stdin) uden menu")
+    parser.add_argument("--server", metavar="ADRESSE", nargs="?", const=STANDARD_ADRESSE,
+                        help=f"kør registertjenesten (standard {STANDARD_ADRESSE}, eller unix:/sti)")
+    parser.add_argument("--klient", metavar="ADRESSE", nargs="?", const=STANDARD_ADRESSE,
+                        help="brug menuen mod en kørende registertjeneste")
+    args = parser.parse_args(instrumentering.konfigurer())
+    if args.batch:
+        sys.exit(0 if PROGRAM.kør_batch(args.batch) else 1)
+    if args.server:
+        PROGRAM.kør_tjeneste(args.server)
+    else:
+        main(args.klient)
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+Binært snapshot af et PersonRegistry, der åbnes med mmap.
+
+Filformat (tal i maskinens byte-rækkefølge, som står i hovedet):
+
+    8 bytes    magisk tal b"PREGSNAP"
+    4 bytes    længden af hovedet (uint32, little-endian)
+    hoved      JSON med formatversion, skema, antal rækker og symboler,
+               kildefilens stempel og placeringen af hver sektion
+    sektioner  type-koder (uint8), én kolonne pr. felt (4 bytes pr. række),
+               symbolernes slags (uint8), start-offsets (uint64) og til sidst
+               strengheapen (UTF-8)
+
+Kolonnerne kopieres direkte over i array'er, mens tekster først afkodes når
+de bliver brugt. Data valideres ikke igen - de blev valideret da de kom ind i
+registeret.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from journal import fil_stempel
+from personregister import TAL, SLETTET, PersonRegistry, SymbolTabel
+
+MAGISK = b"PREGSNAP"
+FORMAT_VERSION = 1
+
+# Symbolernes slags i heapen - lister gemmes som tekster adskilt af \x1f
+_TEKST = 0
+_TUPLE = 1
+_LISTESKILLE = "\x1f"
+
+
+def _juster(offset):
+    """Sektioner starter på en 8-byte grænse, så de kan læses som uint64."""
+    return (offset + 7) & ~7
+
+
+def _skema_beskrivelse(skema):
+    return {"felter": skema.felter, "typer": skema.type_navne}
+
+
+def _typekode(slags):
+    return "i" if slags == TAL else "I"
+
+
+# --- Doven symboltabel ---
+class MmapSymbolTabel(SymbolTabel):
+    """
+    Symboltabel oven på snapshot'ets strengheap.
+    Tekster afkodes først ved første opslag, og den omvendte tabel (tekst -> id)
+    bygges kun hvis der tilføjes nye værdier eller søges på en tekst.
+    """
+    __slots__ = ("_mm", "_slags", "_start", "_heap", "_antal_fra_fil", "_omvendt_klar")
+
+    def __init__(self, mm, slags, start, heap):
+        # SymbolTabel.__init__ springes over - værdierne ligger allerede i filen
+        self._mm = mm
+        self._slags = slags
+        self._start = start
+        self._heap = heap
+        self._antal_fra_fil = len(slags)
+        self._værdier = [None] * len(slags)
+        self._id_for = {}
+        self._omvendt_klar = False
+
+    def _rå(self, symbol_id):
+        """Symbolets slags og UTF-8 bytes direkte fra filen."""
+        start = self._heap + self._start[symbol_id]
+        slut = self._heap + self._start[symbol_id + 1]
+        return self._slags[symbol_id], self._mm[start:slut]
+
+    def værdi(self, symbol_id):
+        værdi = self._værdier[symbol_id]
+        if værdi is None:
+            slags, data = self._rå(symbol_id)
+            tekst = sys.intern(data.decode("utf-8"))
+            if slags == _TUPLE:
+                værdi = tuple(map(sys.intern, tekst.split(_LISTESKILLE))) if tekst else ()
+            else:
+                værdi = tekst
+            self._værdier[symbol_id] = værdi
+        return værdi
+
+    def _byg_omvendt(self):
+        for symbol_id in range(len(self._værdier)):
+            self._id_for[self.værdi(symbol_id)] = symbol_id
+        self._omvendt_klar = True
+
+    def id_for(self, værdi):
+        if not self._omvendt_klar:
+            self._byg_omvendt()
+        return super().id_for(værdi)
+
+    def find_id(self, værdi):
+        if not self._omvendt_klar:
+            self._byg_omvendt()
+        return super().find_id(værdi)
+
+
+# --- Skrivning ---
+def _symbol_bytes(symboler):
+    """Giv (slags, bytes) for hvert symbol; rå bytes genbruges fra et mmap-snapshot."""
+    fra_fil = symboler._antal_fra_fil if isinstance(symboler, MmapSymbolTabel) else 0
+    for symbol_id in range(len(symboler)):
+        if symbol_id < fra_fil:
+            yield symboler._rå(symbol_id)
+            continue
+        værdi = symboler.værdi(symbol_id)
+        if isinstance(værdi, tuple):
+            yield _TUPLE, _LISTESKILLE.join(værdi).encode("utf-8")
+        else:
+            yield _TEKST, værdi.encode("utf-8")
+
+
+def skriv_snapshot(register, sti, kilde=None):
+    """
+    Skriv registeret som binært snapshot. Fjernede rækker udelades.
+    kilde er filen snapshot'et er lavet ud fra (fx personliste.csv); dens
+    stempel gemmes, så et forældet snapshot kan genkendes ved indlæsning.
+    """
+    typer = register._typer
+    kolonner = register._kolonner
+    if len(typer) != len(register):
+        levende = [række_id for række_id, kode in enumerate(typer) if kode != SLETTET]
+        typer = array("B", (typer[i] for i in levende))
+        kolonner = {felt: array(k.typecode, (k[i] for i in levende)) for felt, k in kolonner.items()}
+
+    slags = array("B")
+    start = array("Q", [0])
+    heap = []
+    for symbol_slags, data in _symbol_bytes(register._symboler):
+        slags.append(symbol_slags)
+        heap.append(data)
+        start.append(start[-1] + len(data))
+
+    sektioner = [("typer", typer.tobytes())]
+    sektioner += [(f"kolonne:{felt}", kolonne.tobytes()) for felt, kolonne in kolonner.items()]
+    sektioner += [("slags", slags.tobytes()), ("start", start.tobytes())]
+
+    placering = {}
+    offset = 0
+    for navn, data in sektioner:
+        placering[navn] = [offset, len(data)]
+        offset = _juster(offset + len(data))
+    placering["heap"] = [offset, start[-1]]
+
+    hoved = json.dumps({
+        "version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "skema": _skema_beskrivelse(register.skema),
+        "rækker": len(typer),
+        "symboler": len(slags),
+        "kilde": fil_stempel(kilde) if kilde else None,
+        "sektioner": placering,
+    }).encode("utf-8")
+
+    midlertidig = sti + ".tmp"
+    with open(midlertidig, "wb") as f:
+        f.write(MAGISK)
+        f.write(struct.pack("<I", len(hoved)))
+        f.write(hoved)
+        data_start = _juster(f.tell())
+        for navn, data in sektioner + [("heap", None)]:
+            f.write(b"\0" * (data_start + placering[navn][0] - f.tell()))
+            if data is None:
+                f.writelines(heap)
+            else:
+                f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(midlertidig, sti)
+
+
+# --- Indlæsning ---
+def åbn_snapshot(sti, skema, kilde=None):
+    """
+    Åbn et binært snapshot som PersonRegistry.
+    Returnerer None hvis filen mangler, har et andet format eller skema, eller
+    ikke længere passer til kildefilen - så må kalderen læse CSV-filen i stedet.
+    """
+    try:
+        with open(sti, "rb") as f:
+            if os.fstat(f.fileno()).st_size < len(MAGISK) + 4:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+    if mm[:len(MAGISK)] != MAGISK:
+        return None
+    (hoved_længde,) = struct.unpack_from("<I", mm, len(MAGISK))
+    hoved_start = len(MAGISK) + 4
+    hoved = json.loads(mm[hoved_start:hoved_start + hoved_længde])
+    if (hoved["version"] != FORMAT_VERSION
+            or hoved["byteorder"] != sys.byteorder
+            or hoved["skema"] != _skema_beskrivelse(skema)):
+        return None
+    if kilde is not None and hoved["kilde"] != fil_stempel(kilde):
+        return None
+
+    data_start = _juster(hoved_start + hoved_længde)
+    visning = memoryview(mm)
+
+    def sektion(navn):
+        offset, længde = hoved["sektioner"][navn]
+        return visning[data_start + offset:data_start + offset + længde]
+
+    typer = array("B")
+    typer.frombytes(sektion("typer"))
+    kolonner = {}
+    for felt, slags in skema.felter.items():
+        kolonne = array(_typekode(slags))
+        kolonne.frombytes(sektion(f"kolonne:{felt}"))
+        kolonner[felt] = kolonne
+
+    symboler = MmapSymbolTabel(
+        mm,
+        sektion("slags"),
+        sektion("start").cast("Q"),
+        data_start + hoved["sektioner"]["heap"][0],
+    )
+    return PersonRegistry._fra_kolonner(skema, typer, kolonner, symboler)
@@ -0,0 +1,295 @@
+"""
+SQLite som lager for et PersonRegistry.
+
+Alle typer (Person, Borger, Elev, Lærer, ...) ligger i én tabel "personer"
+med en type-kolonne og en kolonne pr. felt i skemaet; felter typen ikke
+bruger er NULL. LISTE-felter (fag) ligger i hver sin undertabel med én
+række pr. element. Tabellerne oprettes ud fra RegisterSkema, så begge
+scripts kan bruge modulet.
+
+Store mængder skrives med executemany i én transaktion, og der er indekser
+på type, navn, skole og alder, så forespørgsler ikke kræver en fuld
+gennemgang i Python. Forbindelsen til en databasefil genbruges.
+"""
+import os
+import sqlite3
+import threading
+
+import instrumentering
+from personregister import LISTE, SLETTET, TAL, PersonRegistry
+
+# Kolonner der får et indeks, hvis skemaet har dem
+INDEKS_FELTER = ("type", "navn", "skole", "alder")
+# Rækker pr. executemany-kald ved import
+STANDARD_BATCH = 10_000
+
+_forbindelser = {}
+_forbindelser_lås = threading.Lock()
+
+
+def forbind(sti):
+    """Åbn (eller genbrug) forbindelsen til databasefilen."""
+    sti = os.path.abspath(sti)
+    with _forbindelser_lås:
+        forbindelse = _forbindelser.get(sti)
+        if forbindelse is None:
+            forbindelse = sqlite3.connect(sti, check_same_thread=False)
+            forbindelse.execute("PRAGMA journal_mode=WAL")
+            forbindelse.execute("PRAGMA synchronous=NORMAL")
+            forbindelse.execute("PRAGMA foreign_keys=ON")
+            _forbindelser[sti] = forbindelse
+    return forbindelse
+
+
+def _citer(navn):
+    return '"' + navn.replace('"', '""') + '"'
+
+
+class SQLiteLager:
+    """
+    Databasefil for ét skema.
+
+    Har samme brug som Journal i terminalprogrammet: følg(register) skriver
+    hver ændring til databasen med det samme, komprimer() rydder op og
+    luk() sørger for at alt ligger på disken.
+    """
+    def __init__(self, sti, skema):
+        self.sti = sti
+        self.skema = skema
+        self._felter = [felt for felt, slags in skema.felter.items() if slags != LISTE]
+        self._lister = [felt for felt, slags in skema.felter.items() if slags == LISTE]
+        self._forbindelse = forbind(sti)
+        self._lås = threading.Lock()
+        self._register = None
+        # Registerets række-id -> personer.id for det register der følges
+        self._db_id = []
+        self._opret_tabeller()
+
+        kolonner = ", ".join(map(_citer, ["id", "type", *self._felter]))
+        pladser = ", ".join("?" * (len(self._felter) + 2))
+        self._indsæt = f"INSERT INTO personer ({kolonner}) VALUES ({pladser})"
+        self._erstat = f"INSERT OR REPLACE INTO personer ({kolonner}) VALUES ({pladser})"
+        self._vælg = f"SELECT {kolonner} FROM personer"
+
+    # --- Tabeller ---
+    def _opret_tabeller(self):
+        kolonner = ["id INTEGER PRIMARY KEY", "type TEXT NOT NULL"]
+        for felt in self._felter:
+            kolonner.append(f"{_citer(felt)} {'INTEGER' if self.skema.felter[felt] == TAL else 'TEXT'}")
+        with self._forbindelse as f:
+            f.execute(f"CREATE TABLE IF NOT EXISTS personer ({', '.join(kolonner)})")
+            for felt in self._lister:
+                f.execute(
+                    f"CREATE TABLE IF NOT EXISTS {_citer(felt)} ("
+                    "person_id INTEGER NOT NULL REFERENCES personer(id) ON DELETE CASCADE, "
+                    f"nr INTEGER NOT NULL, {_citer(felt)} TEXT NOT NULL, "
+                    "PRIMARY KEY (person_id, nr)) WITHOUT ROWID"
+                )
+                f.execute(f"CREATE INDEX IF NOT EXISTS {_citer(felt + '_idx')} ON {_citer(felt)} ({_citer(felt)})")
+            for felt in INDEKS_FELTER:
+                if felt == "type" or felt in self._felter:
+                    f.execute(f"CREATE INDEX IF NOT EXISTS {_citer('personer_' + felt)} ON personer ({_citer(felt)})")
+
+        fundne = [række[1] for række in self._forbindelse.execute("PRAGMA table_info(personer)")]
+        if fundne != ["id", "type", *self._felter]:
+            raise ValueError(f"Databasen '{self.sti}' passer ikke til skemaet (kolonner: {fundne})")
+
+    # --- Rækker til og fra databasen ---
+    def _række(self, række_id, type_navn, felter):
+        return (række_id, type_navn, *[felter.get(felt) for felt in self._felter])
+
+    def _liste_rækker(self, række_id, felter):
+        for felt in self._lister:
+            for nr, værdi in enumerate(felter.get(felt) or ()):
+                yield felt, (række_id, nr, værdi)
+
+    def _alle_rækker(self, register):
+        """Levende rækker direkte fra kolonnerne: (personer-rækker, {listefelt: rækker})."""
+        skema = register.skema
+        værdi = register._symboler.værdi
+        kolonner = [(register._kolonner[felt], skema.felter[felt] == TAL) for felt in self._felter]
+        bruger = [[felt in brugte for felt in self._felter] for brugte in register._brugte_felter]
+        liste_bruger = [[felt in brugte for felt in self._lister] for brugte in register._brugte_felter]
+        personer = []
+        lister = {felt: [] for felt in self._lister}
+        for række_id, kode in enumerate(register._typer):
+            if kode == SLETTET:
+                continue
+            række = [række_id, skema.type_navne[kode]]
+            for (kolonne, tal), brugt in zip(kolonner, bruger[kode]):
+                række.append((kolonne[række_id] if tal else værdi(kolonne[række_id])) if brugt else None)
+            personer.append(række)
+            for felt, brugt in zip(self._lister, liste_bruger[kode]):
+                if brugt:
+                    elementer = lister[felt]
+                    for nr, element in enumerate(værdi(register._kolonner[felt][række_id])):
+                        elementer.append((række_id, nr, element))
+        return personer, lister
+
+    def _slet_alt(self, f):
+        for felt in self._lister:
+            f.execute(f"DELETE FROM {_citer(felt)}")
+        f.execute("DELETE FROM personer")
+
+    def gem(self, register):
+        """Erstat databasens indhold med registeret i én transaktion."""
+        with instrumentering.fase("sqlite_skrivning") as måling:
+            personer, lister = self._alle_rækker(register)
+            måling.rækker += len(personer)
+            with self._lås, self._forbindelse as f:
+                self._slet_alt(f)
+                f.executemany(self._indsæt, personer)
+                for felt, rækker in lister.items():
+                    f.executemany(f"INSERT INTO {_citer(felt)} VALUES (?, ?, ?)", rækker)
+                if register is self._register:
+                    self._db_id = list(range(len(register._typer)))
+
+    def importer(self, rækker, batch_størrelse=STANDARD_BATCH):
+        """
+        Tilføj (type_navn, felter)-rækker der allerede er valideret, fx fra
+        valider_rækker. Rækkerne skrives i batches med executemany i én
+        transaktion. Returnerer antallet af tilføjede rækker.
+        """
+        with self._lås, self._forbindelse as f:
+            næste_id = f.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM personer").fetchone()[0]
+            start = næste_id
+            personer = []
+            lister = {felt: [] for felt in self._lister}
+
+            def skriv():
+                f.executemany(self._indsæt, personer)
+                for felt, elementer in lister.items():
+                    f.executemany(f"INSERT INTO {_citer(felt)} VALUES (?, ?, ?)", elementer)
+                    elementer.clear()
+                personer.clear()
+
+            for type_navn, felter in rækker:
+                personer.append(self._række(næste_id, type_navn, felter))
+                for felt, række in self._liste_rækker(næste_id, felter):
+                    lister[felt].append(række)
+                næste_id += 1
+                if len(personer) >= batch_størrelse:
+                    skriv()
+            skriv()
+        return næste_id - start
+
+    def _lister_for(self, hvor="", parametre=()):
+        lister = {felt: {} for felt in self._lister}
+        for felt, pr_person in lister.items():
+            sql = f"SELECT person_id, {_citer(felt)} FROM {_citer(felt)}"
+            if hvor:
+                sql += f" WHERE person_id IN (SELECT id FROM personer {hvor})"
+            for person_id, værdi in self._forbindelse.execute(sql + " ORDER BY person_id, nr", parametre):
+                pr_person.setdefault(person_id, []).append(værdi)
+        return lister
+
+    def _rækker_fra(self, markør, lister):
+        brugte = {type_navn: self.skema.typer[klasse] for type_navn, klasse in zip(self.skema.type_navne, self.skema.klasser)}
+        felter_navne = ["id", "type", *self._felter]
+        for række in markør:
+            alle = dict(zip(felter_navne, række))
+            person_id = alle["id"]
+            felter = {}
+            for felt in brugte[alle["type"]]:
+                if felt in lister:
+                    felter[felt] = lister[felt].get(person_id, [])
+                else:
+                    felter[felt] = alle[felt]
+            yield person_id, alle["type"], felter
+
+    def indlæs(self):
+        """Byg et PersonRegistry med hele databasens indhold."""
+        register = PersonRegistry(self.skema)
+        db_id = []
+        with instrumentering.fase("sqlite_indlæsning") as måling, self._lås:
+            lister = self._lister_for()
+            markør = self._forbindelse.execute(self._vælg + " ORDER BY id")
+            for person_id, type_navn, felter in self._rækker_fra(markør, lister):
+                register.tilføj_række(type_navn, felter)
+                db_id.append(person_id)
+            måling.rækker += len(db_id)
+        self._db_id = db_id
+        return register
+
+    # --- Forespørgsler ---
+    def _hvor(self, type_navn, felter):
+        betingelser = []
+        parametre = []
+        if type_navn:
+            betingelser.append("type = ?")
+            parametre.append(type_navn)
+        for felt, værdi in felter.items():
+            if felt not in self.skema.felter:
+                raise KeyError(felt)
+            if felt in self._lister:
+                betingelser.append(f"id IN (SELECT person_id FROM {_citer(felt)} WHERE {_citer(felt)} = ?)")
+                parametre.append(værdi)
+            elif isinstance(værdi, tuple):
+                betingelser.append(f"{_citer(felt)} BETWEEN ? AND ?")
+                parametre.extend(værdi)
+            else:
+                betingelser.append(f"{_citer(felt)} = ?")
+                parametre.append(værdi)
+        hvor = " WHERE " + " AND ".join(betingelser) if betingelser else ""
+        return hvor, parametre
+
+    def find(self, type_navn=None, **felter):
+        """
+        (id, type_navn, felter) for rækker der matcher, fx
+        find("Elev", skole="Byskolen") eller find(alder=(18, 30)).
+        En tuple (fra, til) betyder et interval med begge ender inklusive.
+        """
+        hvor, parametre = self._hvor(type_navn, felter)
+        with self._lås:
+            lister = self._lister_for(hvor, parametre)
+            markør = self._forbindelse.execute(f"{self._vælg}{hvor} ORDER BY id", parametre)
+            return list(self._rækker_fra(markør, lister))
+
+    def antal(self, type_navn=None, **felter):
+        hvor, parametre = self._hvor(type_navn, felter)
+        with self._lås:
+            return self._forbindelse.execute(f"SELECT COUNT(*) FROM personer{hvor}", parametre).fetchone()[0]
+
+    # --- Løbende ændringer ---
+    def følg(self, register):
+        """Skriv alle fremtidige ændringer i registeret til databasen."""
+        self._register = register
+        if len(self._db_id) != len(register._typer):
+            # Registeret kommer ikke fra indlæs() - databasen bringes i takt først
+            self.gem(register)
+            self._db_id = list(range(len(register._typer)))
+        register.tilføj_lytter(self._hændelse)
+
+    def _hændelse(self, hændelse, række_id):
+        with self._lås, self._forbindelse as f:
+            if hændelse == "tilføj":
+                person_id = f.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM personer").fetchone()[0]
+                self._db_id.append(person_id)
+            else:
+                person_id = self._db_id[række_id]
+            for felt in self._lister:
+                f.execute(f"DELETE FROM {_citer(felt)} WHERE person_id = ?", (person_id,))
+            if hændelse == "fjern":
+                f.execute("DELETE FROM personer WHERE id = ?", (person_id,))
+                return
+            type_navn, felter = self._register.række_felter(række_id)
+            f.execute(self._erstat, self._række(person_id, type_navn, felter))
+            for felt, række in self._liste_rækker(person_id, felter):
+                f.execute(f"INSERT INTO {_citer(felt)} VALUES (?, ?, ?)", række)
+
+    def synkroniser(self):
+        """Hver ændring er allerede sin egen transaktion - intet at gøre (samme brugsflade som Journal)."""
+
+    def komprimer(self):
+        """Alle ændringer er allerede gemt; her opdateres statistikken for forespørgslerne."""
+        with self._lås:
+            self._forbindelse.execute("PRAGMA optimize")
+            self._forbindelse.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def luk(self):
+        if self._register is not None:
+            self._register.fjern_lytter(self._hændelse)
+            self._register = None
+        with _forbindelser_lås, self._lås:
+            self._forbindelse.close()
+            _forbindelser.pop(os.path.abspath(self.sti), None)
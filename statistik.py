@@ -0,0 +1,232 @@
+"""
+Aggregeret statistik over talfelter i et PersonRegistry, fx Borgeres
+indkomst og husleje.
+
+Felterne gemmes som tekst i registeret. Hver forskellig tekst (symbol)
+omsættes til et tal én gang, og resultatet holdes i en kolonne af
+float64 med én plads pr. række (NaN for andre typer og tomme eller
+ugyldige værdier). Kolonnerne holdes ajour række for række via
+registerets lytter, og beregnede resultater caches indtil næste ændring.
+
+Med NumPy beregnes summer, gennemsnit, percentiler og grupperinger
+vektoriseret direkte oven på kolonnernes buffere; uden NumPy bruges en
+ren Python-udgave med samme resultater.
+"""
+import math
+from array import array
+
+from personregister import TAL, tal_fra_tekst
+
+try:
+    import numpy as np
+except ImportError:  # NumPy er valgfri
+    np = None
+
+_NAN = float("nan")
+
+
+def _percentil(sorteret, p):
+    """Lineær interpolation mellem nærmeste rækker - samme metode som numpy.percentile."""
+    if not sorteret:
+        return _NAN
+    position = (len(sorteret) - 1) * p / 100
+    nedre = math.floor(position)
+    øvre = min(nedre + 1, len(sorteret) - 1)
+    return sorteret[nedre] + (sorteret[øvre] - sorteret[nedre]) * (position - nedre)
+
+
+class Statistik:
+    """
+    Statistik for én type i et register, fx
+    Statistik(personer, "Borger", ("indkomst", "husleje")).
+
+    Filtre gives som nøgleord med feltets værdi, fx pensionist="Ja".
+    """
+    def __init__(self, register, type_navn="Borger", felter=("indkomst", "husleje")):
+        self.register = register
+        self.type_navn = type_navn
+        self.felter = tuple(felter)
+        self._kode = register.skema.type_navne.index(type_navn)
+        self._symbol_tal = {}
+        self._kolonner = {}
+        self._resultater = {}
+        register.tilføj_lytter(self._hændelse)
+
+    def luk(self):
+        self.register.fjern_lytter(self._hændelse)
+
+    # --- Talkolonner ---
+    def _tal(self, symbol_id):
+        værdi = self._symbol_tal.get(symbol_id)
+        if værdi is None:
+            værdi = self._symbol_tal[symbol_id] = tal_fra_tekst(self.register._symboler.værdi(symbol_id))
+        return værdi
+
+    def _rækkeværdi(self, felt, række_id):
+        if self.register._typer[række_id] != self._kode:
+            return _NAN
+        kodet = self.register._kolonner[felt][række_id]
+        if self.register.skema.felter[felt] == TAL:
+            return float(kodet)
+        return self._tal(kodet)
+
+    def _kolonne(self, felt):
+        kolonne = self._kolonner.get(felt)
+        if kolonne is None:
+            if felt not in self.register.skema.felter:
+                raise KeyError(felt)
+            kolonne = array("d", (self._rækkeværdi(felt, i) for i in range(len(self.register._typer))))
+            self._kolonner[felt] = kolonne
+        return kolonne
+
+    def _hændelse(self, hændelse, række_id):
+        # Kun den ændrede række regnes om; de cachede resultater er forældede
+        self._resultater.clear()
+        for felt, kolonne in self._kolonner.items():
+            værdi = _NAN if hændelse == "fjern" else self._rækkeværdi(felt, række_id)
+            if række_id == len(kolonne):
+                kolonne.append(værdi)
+            else:
+                kolonne[række_id] = værdi
+
+    # --- Udvalg af rækker ---
+    def _filter_koder(self, filter):
+        """[(kolonne, kodet værdi)] for filteret, eller None hvis en værdi ikke findes."""
+        koder = []
+        for felt, værdi in filter.items():
+            if self.register.skema.felter[felt] == TAL:
+                koder.append((self.register._kolonner[felt], int(værdi)))
+            else:
+                symbol_id = self.register._symboler.find_id(værdi)
+                if symbol_id is None:
+                    return None
+                koder.append((self.register._kolonner[felt], symbol_id))
+        return koder
+
+    def _udvalg(self, felt, filter):
+        """
+        Værdierne for felt i rækker af typen der matcher filteret (uden NaN).
+        Med NumPy et ndarray, ellers en liste. Med felt=None gives en maske/række-id'er.
+        """
+        koder = self._filter_koder(filter)
+        if np is not None:
+            if koder is None or not len(self.register._typer):
+                return np.empty(0)
+            maske = np.frombuffer(self.register._typer, dtype=np.uint8) == self._kode
+            for kolonne, kode in koder:
+                maske &= np.frombuffer(kolonne, dtype=_dtype(kolonne)) == kode
+            if felt is None:
+                return maske
+            værdier = np.frombuffer(self._kolonne(felt), dtype=np.float64)[maske]
+            return værdier[~np.isnan(værdier)]
+
+        if koder is None:
+            return []
+        typer = self.register._typer
+        række_id = [i for i, kode in enumerate(typer) if kode == self._kode]
+        for kolonne, kode in koder:
+            række_id = [i for i in række_id if kolonne[i] == kode]
+        if felt is None:
+            return række_id
+        kolonne = self._kolonne(felt)
+        return [v for v in map(kolonne.__getitem__, række_id) if v == v]
+
+    def _cachet(self, nøgle, beregn):
+        try:
+            return self._resultater[nøgle]
+        except KeyError:
+            resultat = self._resultater[nøgle] = beregn()
+            return resultat
+
+    # --- Aggregater ---
+    def antal(self, felt=None, **filter):
+        """Antal rækker af typen (med felt: kun dem hvor feltet har en talværdi)."""
+        def beregn():
+            if felt is None:
+                udvalg = self._udvalg(None, filter)
+                return int(udvalg.sum()) if np is not None else len(udvalg)
+            return len(self._udvalg(felt, filter))
+        return self._cachet(("antal", felt, tuple(sorted(filter.items()))), beregn)
+
+    def sum(self, felt, **filter):
+        def beregn():
+            return float(np.sum(self._udvalg(felt, filter))) if np is not None else math.fsum(self._udvalg(felt, filter))
+        return self._cachet(("sum", felt, tuple(sorted(filter.items()))), beregn)
+
+    def middel(self, felt, **filter):
+        """Gennemsnit; NaN hvis ingen rækker har en værdi."""
+        def beregn():
+            værdier = self._udvalg(felt, filter)
+            if not len(værdier):
+                return _NAN
+            return float(np.mean(værdier)) if np is not None else math.fsum(værdier) / len(værdier)
+        return self._cachet(("middel", felt, tuple(sorted(filter.items()))), beregn)
+
+    def percentil(self, felt, p, **filter):
+        """p'te percentil (0-100), fx percentil("indkomst", 50) for medianen."""
+        def beregn():
+            værdier = self._udvalg(felt, filter)
+            if np is not None:
+                return float(np.percentile(værdier, p)) if len(værdier) else _NAN
+            return _percentil(sorted(værdier), p)
+        return self._cachet(("percentil", felt, p, tuple(sorted(filter.items()))), beregn)
+
+    def grupper(self, felt, efter, funktion="sum", **filter):
+        """
+        {værdi af efter: aggregat af felt} for hver gruppe, fx
+        grupper("indkomst", "pensionist", "middel").
+        funktion er "sum", "middel" eller "antal".
+        """
+        if funktion not in ("sum", "middel", "antal"):
+            raise ValueError(f"Ukendt funktion: {funktion}")
+        return self._cachet(("grupper", felt, efter, funktion, tuple(sorted(filter.items()))),
+                            lambda: self._grupper(felt, efter, funktion, filter))
+
+    def _grupper(self, felt, efter, funktion, filter):
+        gruppe_kolonne = self.register._kolonner[efter]
+        tal_gruppe = self.register.skema.felter[efter] == TAL
+        navngiv = int if tal_gruppe else self.register._symboler.værdi
+
+        if np is not None:
+            maske = self._udvalg(None, filter)
+            if not len(maske):
+                return {}
+            værdier = np.frombuffer(self._kolonne(felt), dtype=np.float64)
+            maske = maske & ~np.isnan(værdier)
+            grupper = np.frombuffer(gruppe_kolonne, dtype=_dtype(gruppe_kolonne))[maske]
+            nøgler, position = np.unique(grupper, return_inverse=True)
+            antal = np.bincount(position, minlength=len(nøgler))
+            summer = np.bincount(position, weights=værdier[maske], minlength=len(nøgler))
+            resultat = {"sum": summer, "antal": antal, "middel": summer / np.maximum(antal, 1)}[funktion]
+            return {navngiv(int(nøgle)): resultat[i].item() for i, nøgle in enumerate(nøgler)}
+
+        kolonne = self._kolonne(felt)
+        summer = {}
+        antal = {}
+        for i in self._udvalg(None, filter):
+            værdi = kolonne[i]
+            if værdi == værdi:
+                nøgle = gruppe_kolonne[i]
+                summer[nøgle] = summer.get(nøgle, 0.0) + værdi
+                antal[nøgle] = antal.get(nøgle, 0) + 1
+        if funktion == "antal":
+            return {navngiv(nøgle): n for nøgle, n in sorted(antal.items())}
+        if funktion == "sum":
+            return {navngiv(nøgle): s for nøgle, s in sorted(summer.items())}
+        return {navngiv(nøgle): summer[nøgle] / antal[nøgle] for nøgle in sorted(summer)}
+
+    def oversigt(self, **filter):
+        """{felt: {"antal", "sum", "middel", "median"}} for alle statistikkens felter."""
+        return {
+            felt: {
+                "antal": self.antal(felt, **filter),
+                "sum": self.sum(felt, **filter),
+                "middel": self.middel(felt, **filter),
+                "median": self.percentil(felt, 50, **filter),
+            }
+            for felt in self.felter
+        }
+
+
+def _dtype(kolonne):
+    return {"B": np.uint8, "i": np.int32, "I": np.uint32, "d": np.float64}[kolonne.typecode]
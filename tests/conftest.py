@@ -0,0 +1,57 @@
+import os
+import sys
+
+import pytest
+
+# Modulerne ligger øverst i repoet ved siden af scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from personregister import LISTE, TAL, TEKST, RegisterSkema  # noqa: E402
+
+
+# --- Små testklasser i stedet for scripts' Person/Borger/Lærer ---
+class Person:
+    def __init__(self, navn, alder, adresse=""):
+        self.navn = navn
+        self.alder = alder
+        self.adresse = adresse
+
+
+class Borger(Person):
+    def __init__(self, navn, alder, adresse="", indkomst=""):
+        super().__init__(navn, alder, adresse)
+        self.indkomst = indkomst
+
+
+class Lærer(Person):
+    def __init__(self, navn, alder, adresse="", fag=()):
+        super().__init__(navn, alder, adresse)
+        self.fag = tuple(fag)
+
+
+KLASSER = {klasse.__name__: klasse for klasse in (Person, Borger, Lærer)}
+
+
+def opret_person(type_navn, felter):
+    return KLASSER[type_navn](**felter)
+
+
+@pytest.fixture
+def skema():
+    return RegisterSkema(
+        felter={"navn": TEKST, "alder": TAL, "adresse": TEKST, "indkomst": TEKST, "fag": LISTE},
+        typer={
+            Person: ("navn", "alder", "adresse"),
+            Borger: ("navn", "alder", "adresse", "indkomst"),
+            Lærer: ("navn", "alder", "adresse", "fag"),
+        },
+        indekser=("navn", "fag"),
+        intervaller=("alder",),
+    )
+
+
+def række_til_felter(row):
+    felter = {"navn": row["navn"], "alder": row["alder"], "adresse": row.get("adresse", "")}
+    if row.get("indkomst"):
+        return "Borger", dict(felter, indkomst=row["indkomst"])
+    return "Person", felter
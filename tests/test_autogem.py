@@ -0,0 +1,46 @@
+import threading
+
+from conftest import Person
+
+from autogem import Autogem
+from personregister import PersonRegistry
+
+
+class _Tæller:
+    def __init__(self, fejl=0):
+        self.antal = 0
+        self.fejl = fejl
+        self.kaldt = threading.Event()
+
+    def __call__(self):
+        self.antal += 1
+        self.kaldt.set()
+        if self.fejl:
+            self.fejl -= 1
+            raise OSError("disken er fuld")
+
+
+def test_ro_synkroniserer_kun(skema):
+    register = PersonRegistry(skema)
+    gem, synkroniser = _Tæller(), _Tæller()
+    autogem = Autogem(register, gem, synkroniser, interval=0.01)
+    register.tilføj(Person("Bo", 41))
+    assert synkroniser.kaldt.wait(5)
+    assert gem.antal == 0
+    autogem.gem_nu()
+    assert gem.kaldt.wait(5)
+    autogem.luk()
+    assert gem.antal == 1
+
+
+def test_fejlet_gemning_prøves_igen_fuldt(skema, capsys):
+    register = PersonRegistry(skema)
+    gem, synkroniser = _Tæller(fejl=1), _Tæller()
+    autogem = Autogem(register, gem, synkroniser, interval=0.01)
+    autogem.gem_nu()
+    assert gem.kaldt.wait(5)
+    gem.kaldt.clear()
+    assert gem.kaldt.wait(5)
+    autogem.luk()
+    assert gem.antal == 2 and synkroniser.antal == 0
+    assert "disken er fuld" in capsys.readouterr().out
@@ -0,0 +1,106 @@
+import csv
+import io
+import os
+
+import pytest
+from conftest import Borger, Lærer, Person
+
+import instrumentering
+from csv_skriver import CSVSkriver
+from personregister import PARTITION_STØRRELSE, PersonRegistry
+
+KOLONNER = ("type", "navn", "alder", "adresse", "indkomst", "fag")
+
+
+def _person(i):
+    if i % 3 == 1:
+        return Borger(f"B{i}", 40 + i % 50, f"Vej {i}, st.", str(1000 * i))
+    if i % 3 == 2:
+        return Lærer(f'L"{i}"', 30 + i % 40, f"Vej {i}", ("Dansk", "Musik") if i % 2 else ("Tysk",))
+    return Person(f"P{i}", 20 + i % 60, f"Vej {i}")
+
+
+def _fuld_csv(register):
+    """Hele registeret skrevet forfra med csv.writer - facit for CSVSkriver."""
+    ud = io.StringIO(newline="")
+    writer = csv.writer(ud)
+    writer.writerow(KOLONNER)
+    for række_id in register.række_id():
+        type_navn, felter = register.række_felter(række_id)
+        writer.writerow([type_navn, felter["navn"], felter["alder"], felter["adresse"],
+                         felter.get("indkomst", ""), ";".join(felter.get("fag", ()))])
+    return ud.getvalue().encode("utf-8")
+
+
+@pytest.fixture
+def tællere(monkeypatch):
+    tællere = {}
+    monkeypatch.setattr(instrumentering, "tæl", lambda navn, antal=1: tællere.__setitem__(navn, antal))
+    return tællere
+
+
+def _gem(skriver, register, sti):
+    """Som gem_atomisk: skriv ved siden af og skift filen ind."""
+    skriver.skriv(register, sti + ".tmp", forrige=sti)
+    os.replace(sti + ".tmp", sti)
+
+
+@pytest.fixture
+def register(skema):
+    return PersonRegistry(skema, [_person(i) for i in range(2 * PARTITION_STØRRELSE + 100)])
+
+
+def test_kun_ændret_partition_kodes(skema, register, tmp_path, tællere):
+    sti = str(tmp_path / "personliste.csv")
+    skriver = CSVSkriver(skema, KOLONNER)
+    _gem(skriver, register, sti)
+    assert tællere == {"partitioner_kodet": 3, "partitioner_genbrugt": 0}
+    with open(sti, "rb") as f:
+        assert f.read() == _fuld_csv(register)
+
+    register.erstat(PARTITION_STØRRELSE + 5, Borger("Ny, Navn", 55, "Vej", "123"))
+    _gem(skriver, register, sti)
+    assert tællere == {"partitioner_kodet": 1, "partitioner_genbrugt": 2}
+    with open(sti, "rb") as f:
+        assert f.read() == _fuld_csv(register)
+
+
+def test_ekstern_ændring_genbruges_ikke(skema, register, tmp_path, tællere):
+    sti = str(tmp_path / "personliste.csv")
+    skriver = CSVSkriver(skema, KOLONNER)
+    _gem(skriver, register, sti)
+    # Samme størrelse, men nyt indhold og ny mtime
+    with open(sti, "rb") as f:
+        data = f.read().replace(b"\r\nPerson,P3,", b"\r\nPerson,X3,")
+    info = os.stat(sti)
+    with open(sti, "wb") as f:
+        f.write(data)
+    os.utime(sti, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+
+    register.erstat(5, Person("Kim", 30, "Vej"))
+    _gem(skriver, register, sti)
+    assert tællere == {"partitioner_kodet": 3, "partitioner_genbrugt": 0}
+    with open(sti, "rb") as f:
+        assert f.read() == _fuld_csv(register)
+
+
+def test_fjernede_rækker_flytter_partitionsgrænser(skema, register, tmp_path, tællere):
+    sti = str(tmp_path / "personliste.csv")
+    skriver = CSVSkriver(skema, KOLONNER)
+    _gem(skriver, register, sti)
+
+    # Første partition bliver kortere, så de kopierede partitioner starter et andet sted
+    for række_id in range(0, 200, 3):
+        register.fjern(række_id)
+    _gem(skriver, register, sti)
+    assert tællere == {"partitioner_kodet": 1, "partitioner_genbrugt": 2}
+    with open(sti, "rb") as f:
+        assert f.read() == _fuld_csv(register)
+
+    # Placeringen fra forrige gemning skal passe til den flyttede fil
+    register.fjern(2 * PARTITION_STØRRELSE + 1)
+    register.tilføj(Person("Sidst", 99, "Vej"))
+    _gem(skriver, register, sti)
+    assert tællere == {"partitioner_kodet": 1, "partitioner_genbrugt": 2}
+    with open(sti, "rb") as f:
+        assert f.read() == _fuld_csv(register)
@@ -0,0 +1,123 @@
+import json
+import threading
+
+from conftest import Borger, Lærer, Person
+
+from journal import Journal
+from personregister import PersonRegistry
+from snapshot import skriv_snapshot, åbn_snapshot
+
+
+def _indhold(register):
+    return [register.række_felter(række_id) for række_id in register.række_id()]
+
+
+def _snapshot(skema, sti, *personer):
+    register = PersonRegistry(skema)
+    register.udvid(personer)
+    skriv_snapshot(register, sti)
+
+
+def _genindlæs(skema, sti):
+    register = åbn_snapshot(sti, skema)
+    Journal(sti, skriv_snapshot).genafspil(register)
+    return register
+
+
+def _poster(journal):
+    with open(journal.sti, encoding="utf-8") as f:
+        return [json.loads(linje) for linje in f][1:]
+
+
+def test_genafspil(skema, tmp_path):
+    sti = str(tmp_path / "personer.snap")
+    _snapshot(skema, sti, Person("Bo", 41, "Vej 1"), Person("Ida", 35, "Vej 2"))
+    register = åbn_snapshot(sti, skema)
+    journal = Journal(sti, skriv_snapshot)
+    journal.følg(register)
+    register.tilføj(Lærer("Kim", 30, "Vej 3", ("Dansk", "Musik")))
+    register.erstat(0, Borger("Bo", 42, "Vej 1", "300000"))
+    register.fjern(1)
+    journal.luk()
+
+    assert [post["op"] for post in _poster(journal)] == ["tilføj", "erstat", "fjern"]
+    genindlæst = åbn_snapshot(sti, skema)
+    assert Journal(sti, skriv_snapshot).genafspil(genindlæst) == 3
+    assert _indhold(genindlæst) == _indhold(register)
+
+
+def test_halvt_skrevet_linje_ignoreres(skema, tmp_path):
+    sti = str(tmp_path / "personer.snap")
+    _snapshot(skema, sti, Person("Bo", 41, "Vej 1"))
+    register = åbn_snapshot(sti, skema)
+    journal = Journal(sti, skriv_snapshot)
+    journal.følg(register)
+    register.tilføj(Person("Ida", 35, "Vej 2"))
+    journal.luk()
+    with open(journal.sti, "a", encoding="utf-8") as f:
+        f.write('{"op": "fjern", "id"')
+
+    assert [felter["navn"] for _, felter in _indhold(_genindlæs(skema, sti))] == ["Bo", "Ida"]
+
+
+def test_journal_til_andet_snapshot_ignoreres(skema, tmp_path):
+    sti = str(tmp_path / "personer.snap")
+    _snapshot(skema, sti, Person("Bo", 41, "Vej 1"))
+    register = åbn_snapshot(sti, skema)
+    journal = Journal(sti, skriv_snapshot)
+    journal.følg(register)
+    register.tilføj(Person("Ida", 35, "Vej 2"))
+    journal.luk()
+    # Et snapshot skrevet af en anden har allerede ændringerne med (eller ej)
+    _snapshot(skema, sti, Person("Ole", 70, "Vej 3"), Person("Kim", 30, "Vej 4"))
+
+    assert not Journal(sti, skriv_snapshot).har_ændringer()
+    assert [felter["navn"] for _, felter in _indhold(_genindlæs(skema, sti))] == ["Ole", "Kim"]
+
+
+def test_komprimering_forskyder_id(skema, tmp_path):
+    sti = str(tmp_path / "personer.snap")
+    _snapshot(skema, sti, *(Person(navn, 40, "Vej") for navn in ("Bo", "Ida", "Ole", "Kim")))
+    register = åbn_snapshot(sti, skema)
+    journal = Journal(sti, skriv_snapshot)
+    journal.følg(register)
+    register.fjern(1)
+    assert journal.komprimer(vent=True)
+    assert _poster(journal) == []
+
+    # Snapshot'et har kun de levende rækker, så række 3 er nu nummer 2 i filen
+    register.erstat(3, Borger("Kim", 31, "Vej", "250000"))
+    register.fjern(2)
+    register.tilføj(Person("Eva", 25, "Vej"))
+    journal.luk()
+
+    assert [(post["op"], post["id"]) for post in _poster(journal)] == [("erstat", 2), ("fjern", 1), ("tilføj", 3)]
+    assert len(åbn_snapshot(sti, skema)) == 3
+    assert _indhold(_genindlæs(skema, sti)) == _indhold(register)
+
+
+def test_ændringer_under_baggrundskomprimering(skema, tmp_path):
+    sti = str(tmp_path / "personer.snap")
+    _snapshot(skema, sti, Person("Bo", 41, "Vej 1"), Person("Ida", 35, "Vej 2"), Person("Ole", 70, "Vej 3"))
+    startet = threading.Event()
+    fortsæt = threading.Event()
+
+    def langsom_skriv_snapshot(kopi, filsti):
+        startet.set()
+        fortsæt.wait(5)
+        skriv_snapshot(kopi, filsti)
+
+    register = åbn_snapshot(sti, skema)
+    journal = Journal(sti, langsom_skriv_snapshot)
+    journal.følg(register)
+    register.fjern(0)
+    assert journal.komprimer(baggrund=True, vent=False)
+    assert startet.wait(5)
+    # Kommer efter kopien og skal med i den nye journal, forskudt efter det nye snapshot
+    register.erstat(2, Borger("Ole", 71, "Vej 3", "200000"))
+    register.tilføj(Person("Eva", 25, "Vej 4"))
+    fortsæt.set()
+    journal.luk()
+
+    assert [(post["op"], post["id"]) for post in _poster(journal)] == [("erstat", 1), ("tilføj", 2)]
+    assert _indhold(_genindlæs(skema, sti)) == _indhold(register)
@@ -0,0 +1,86 @@
+import csv
+
+import pytest
+
+from migrering import FORMATER, migrer
+from parallel_import import find_intervaller
+from validering import ValideringsRapport
+
+
+def _skriv(sti, kolonner, rækker):
+    with open(sti, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(kolonner)
+        writer.writerows(rækker)
+
+
+def _bytes(sti):
+    with open(sti, "rb") as f:
+        return f.read()
+
+
+def _læs(sti):
+    with open(sti, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_rundtur_gennem_alle_formater(tmp_path):
+    # Kun navn og alder findes i alle tre formater
+    kilde = str(tmp_path / "kode.csv")
+    _skriv(kilde, FORMATER["kode"].kolonner,
+           [[f"Person {i}, \"{i}\"", str(20 + i), "", "", "", ""] for i in range(50)])
+    før = _bytes(kilde)
+
+    sti = kilde
+    for fra, til in (("kode", "registrering"), ("registrering", "gammel"), ("gammel", "kode")):
+        ny = str(tmp_path / f"{til}.csv")
+        rapport = ValideringsRapport()
+        resultat = migrer(sti, ny, til, rapport=rapport)
+        assert (resultat.fra, resultat.til, resultat.skrevet) == (fra, til, 50)
+        assert not rapport and not resultat.tabt
+        sti = ny
+    assert _læs(str(tmp_path / "registrering.csv"))[1][:3] == ["Person", 'Person 0, "0"', "20"]
+    assert _bytes(sti) == før
+
+
+def test_værdier_uden_plads_tælles_eller_afvises(tmp_path):
+    kilde = str(tmp_path / "kode.csv")
+    _skriv(kilde, FORMATER["kode"].kolonner, [
+        ["Bo", "41", "", "", "", ""],
+        ["Ole", "70", "", "Ja", "200000", "5000"],
+        ["Ida", "fire", "", "", "", ""],
+    ])
+    ud = str(tmp_path / "gammel.csv")
+    rapport = ValideringsRapport()
+    resultat = migrer(kilde, ud, "gammel", rapport=rapport)
+    assert resultat.skrevet == 2 and dict(resultat.tabt) == {"indkomst": 1}
+    assert [(fejl.række, fejl.felt) for fejl in rapport.fejl] == [(3, "alder")]
+    assert _læs(ud)[1:] == [["Bo", "41", "", "", ""], ["Ole", "70", "Ja", "", "5000"]]
+
+    rapport = ValideringsRapport()
+    assert migrer(kilde, ud, "gammel", rapport=rapport, streng=True).skrevet == 1
+    assert [(fejl.række, fejl.felt) for fejl in rapport.fejl] == [(2, "indkomst"), (3, "alder")]
+
+
+@pytest.mark.parametrize("til", ["kode", "gammel"])
+def test_parallel_migrering_giver_samme_fil(tmp_path, til):
+    kilde = str(tmp_path / "registrering.csv")
+    rækker = []
+    for i in range(3000):
+        if i % 3 == 0:
+            rækker.append(["Lærer", f"L{i}", "40", "K", "", "", f"l{i}@skole.dk", "12345678", "Dansk;Musik"])
+        elif i % 3 == 1:
+            rækker.append(["Elev", f"E{i}", "12", "M", "Byskolen", "6", "", "", ""])
+        else:
+            rækker.append(["Person", f"P{i}", "fire" if i == 2000 else "30", "", "", "", "", "", ""])
+    _skriv(kilde, FORMATER["registrering"].kolonner, rækker)
+    assert len(find_intervaller(kilde, 4096)[1]) > 1
+
+    alene, parallel = str(tmp_path / "alene.csv"), str(tmp_path / "parallel.csv")
+    rapport_alene, rapport_parallel = ValideringsRapport(), ValideringsRapport()
+    resultat = migrer(kilde, alene, til, rapport=rapport_alene)
+    assert migrer(kilde, parallel, til, rapport=rapport_parallel, arbejdere=2, blok_størrelse=4096) == resultat
+    assert _bytes(parallel) == _bytes(alene)
+    assert resultat.skrevet == 2999 and len(_læs(alene)) == 3000
+    assert rapport_parallel.antal_rækker == rapport_alene.antal_rækker == 3000
+    assert [(fejl.række, fejl.felt) for fejl in rapport_parallel.fejl] == [(2001, "alder")]
@@ -0,0 +1,114 @@
+import pytest
+from conftest import Person
+
+from personregister import TAL_MAX, PersonRegistry
+
+
+def _tilstand(register):
+    """Alt hvad en fejlet ændring ikke må røre: kolonner, indekser og ændringsspor."""
+    return (
+        bytes(register._typer),
+        {felt: bytes(kolonne) for felt, kolonne in register._kolonner.items()},
+        len(register),
+        register.partition_versioner(),
+        sorted(register.find_id("navn", "Bo")),
+        sorted(register.find_interval_id("alder", 0, 100)),
+    )
+
+
+def test_tilføj_rækker(skema):
+    register = PersonRegistry(skema)
+    register.tilføj_rækker([
+        ("Person", {"navn": "Bo", "alder": 41, "adresse": "Vej 1"}),
+        ("Lærer", {"navn": "Ida", "alder": 35, "adresse": "Vej 2", "fag": ("Dansk", "Musik")}),
+        ("Borger", {"navn": "Bo", "alder": 70, "adresse": "Vej 3", "indkomst": "200000"}),
+    ])
+    assert len(register) == 3
+    assert sorted(register.find_id("navn", "Bo")) == [0, 2]
+    assert list(register.find_id("fag", "Musik")) == [1]
+    assert sorted(register.find_interval_id("alder", 40, 80)) == [0, 2]
+    assert register.række_felter(1) == ("Lærer", {"navn": "Ida", "alder": 35, "adresse": "Vej 2",
+                                                   "fag": ["Dansk", "Musik"]})
+
+
+def test_tilføj_rækker_tal_uden_for_kolonnen(skema):
+    register = PersonRegistry(skema)
+    register.tilføj_rækker([("Person", {"navn": "Bo", "alder": 41, "adresse": "Vej 1"})])
+    register.find_id("navn", "Bo")  # Bygger indekserne, så de også skal holde
+    før = _tilstand(register)
+    with pytest.raises(ValueError, match="alder"):
+        register.tilføj_rækker([
+            ("Person", {"navn": "Ny", "alder": 30, "adresse": "Vej 2"}),
+            ("Person", {"navn": "Bo", "alder": TAL_MAX + 1, "adresse": "Vej 3"}),
+        ])
+    assert _tilstand(register) == før
+    # Registeret kan stadig bruges bagefter
+    register.tilføj_rækker([("Person", {"navn": "Bo", "alder": 50, "adresse": "Vej 4"})])
+    assert sorted(register.find_id("navn", "Bo")) == [0, 1]
+
+
+def test_tilføj_og_erstat_tal_uden_for_kolonnen(skema):
+    register = PersonRegistry(skema)
+    register.tilføj(Person("Bo", 41, "Vej 1"))
+    register.find_id("navn", "Bo")
+    før = _tilstand(register)
+    with pytest.raises(ValueError):
+        register.tilføj(Person("Ny", 3_000_000_000, "Vej 2"))
+    with pytest.raises(ValueError):
+        register.erstat(0, Person("Bo", 3_000_000_000, "Vej 1"))
+    assert _tilstand(register) == før
+    assert register.tilføj(Person("Ny", 30, "Vej 2")) == 1
+
+
+class _Faglærer:
+    """Som scripts' Lærer: fagene i en dict, udleveret som skrivebeskyttet keys-visning."""
+    def __init__(self, navn, fag=()):
+        self.navn = navn
+        self._fag = dict.fromkeys(fag)
+
+    @property
+    def fag(self):
+        return self._fag.keys()
+
+    def tilføj_fag(self, fag_navn):
+        if fag_navn not in self._fag:
+            self._fag[fag_navn] = None
+
+    def fjern_fag(self, fag_navn):
+        if fag_navn in self._fag:
+            del self._fag[fag_navn]
+
+
+def test_listefelt_i_visning_opfører_sig_som_objektet():
+    from personregister import LISTE, TEKST, RegisterSkema
+    skema = RegisterSkema({"navn": TEKST, "fag": LISTE}, {_Faglærer: ("navn", "fag")}, indekser=("fag",))
+    lærer = _Faglærer("Ida", ["Dansk", "Musik"])
+    register = PersonRegistry(skema, [lærer])
+    visning = register[0]
+    assert list(visning.fag) == list(lærer.fag) == ["Dansk", "Musik"]
+    assert "Musik" in visning.fag and "Musik" in lærer.fag
+
+    visning.tilføj_fag("Tysk")
+    visning.tilføj_fag("Dansk")
+    visning.fjern_fag("Musik")
+    assert register[0].fag == ("Dansk", "Tysk")
+    assert list(register.find_id("fag", "Tysk")) == [0]
+    assert list(register.find_id("fag", "Musik")) == []
+    with pytest.raises(TypeError):
+        visning._fag.update({"Fransk": None})
+
+
+def test_læsning_af_fag_kopierer_ikke():
+    from personregister import LISTE, TEKST, RegisterSkema
+    skema = RegisterSkema({"navn": TEKST, "fag": LISTE}, {_Faglærer: ("navn", "fag")})
+    lærer = _Faglærer("Ida", ["Dansk", "Musik"])
+    fag = lærer.fag
+    lærer.tilføj_fag("Tysk")
+    assert list(fag) == ["Dansk", "Musik", "Tysk"]  # Visning af lærerens egen dict, ikke en kopi
+
+    register = PersonRegistry(skema, [lærer])
+    visning = register[0]
+    assert visning.fag is visning.fag is register[0].fag
+    assert visning.fag is register._symboler.værdi(register._kolonner["fag"][0])
+    with pytest.raises(AttributeError):
+        visning.fag = ("Fransk",)
@@ -0,0 +1,65 @@
+from conftest import Person, opret_person, række_til_felter
+
+from registerprogram import Registerprogram
+from validering import ValideringsRapport
+
+KOLONNER = ["navn", "alder", "adresse", "indkomst"]
+
+
+def _program(skema, mappe):
+    return Registerprogram(skema, KOLONNER, række_til_felter, opret_person, mappe=str(mappe), lagertype="csv")
+
+
+def test_kildefil_med_afviste_rækker_overskrives_ikke(skema, tmp_path, capsys):
+    kilde = tmp_path / "personliste.csv"
+    kilde.write_text("navn,alder,adresse,indkomst\nBo,41,Vej 1,\nIda,fire,Vej 2,\nOle,70,Vej 3,200000\n",
+                     encoding="utf-8")
+    før = kilde.read_bytes()
+    program = _program(skema, tmp_path)
+    lager, personer = program.åbn_lager()
+    assert program.afviste == 1 and len(personer) == 2
+    lager.følg(personer)
+    personer.tilføj(Person("Kim", 30, "Vej 4"))
+    program.gem_lager(lager, personer)
+    lager.luk()
+    assert kilde.read_bytes() == før
+    assert "overskrives ikke" in capsys.readouterr().out
+
+    # Ændringen genafspilles fra journalen oven på den uændrede fil
+    lager, personer = _program(skema, tmp_path).åbn_lager()
+    assert [person.navn for person in personer] == ["Bo", "Ole", "Kim"]
+
+
+def test_fejlfri_kildefil_gemmes(skema, tmp_path):
+    kilde = tmp_path / "personliste.csv"
+    kilde.write_text("navn,alder,adresse,indkomst\nBo,41,Vej 1,\n", encoding="utf-8")
+    program = _program(skema, tmp_path)
+    lager, personer = program.åbn_lager()
+    lager.følg(personer)
+    personer.tilføj(Person("Kim", 30, "Vej 4"))
+    program.gem_lager(lager, personer)
+    lager.luk()
+    assert kilde.read_bytes() == b"navn,alder,adresse,indkomst\r\nBo,41,Vej 1,\r\nKim,30,Vej 4,\r\n"
+
+
+def test_iter_personer_csv_læser_dovent(skema, tmp_path):
+    kilde = tmp_path / "personliste.csv"
+    kilde.write_text("navn,alder,adresse,indkomst\n" + "".join(f"P{i},{20 + i},Vej {i},\n" for i in range(10))
+                     + "Ida,fire,Vej,\n", encoding="utf-8")
+    læste = []
+
+    def tællende_række_til_felter(row):
+        læste.append(row["navn"])
+        return række_til_felter(row)
+
+    program = Registerprogram(skema, KOLONNER, tællende_række_til_felter, opret_person, mappe=str(tmp_path))
+    rapport = ValideringsRapport()
+    batches = program.iter_personer_csv(batch_størrelse=3, rapport=rapport)
+    første = next(batches)
+    assert læste == ["P0", "P1", "P2"]
+    assert [person.navn for person in første] == ["P0", "P1", "P2"]
+    assert isinstance(første[0], Person) and første[0].alder == 20
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [(fejl.række, fejl.felt) for fejl in rapport.fejl] == [(11, "alder")]
+    assert [person.navn for person in program.iter_personer_csv()] == [f"P{i}" for i in range(10)]
@@ -0,0 +1,88 @@
+import os
+
+from conftest import Borger, Lærer, Person
+
+from personregister import LISTE, TEKST, PersonRegistry, RegisterSkema
+from snapshot import MmapSymbolTabel, skriv_snapshot, åbn_snapshot
+
+
+def _indhold(register):
+    return [register.række_felter(række_id) for række_id in register.række_id()]
+
+
+def _register(skema):
+    return PersonRegistry(skema, [
+        Person("Bo", 41, ""),
+        Lærer("Ida", -35, "Vej 2, st.", ("Dansk", "Musik")),
+        Borger("Ole", 70, "Vej 3", ""),
+        Lærer("Kim", 30, "", ()),
+        Person("Åse æøå", 2_000_000_000, "Vej\n4"),
+    ])
+
+
+def test_rundtur(skema, tmp_path):
+    sti = str(tmp_path / "personliste.bin")
+    register = _register(skema)
+    register.fjern(2)
+    skriv_snapshot(register, sti)
+
+    åbnet = åbn_snapshot(sti, skema)
+    assert len(åbnet) == 4  # Fjernede rækker kommer ikke med
+    assert _indhold(åbnet) == _indhold(register)
+    assert sorted(åbnet.find_id("fag", "Musik")) == [1]
+
+    # Et snapshot skrevet fra et åbnet snapshot genbruger de rå bytes for de gamle symboler
+    åbnet.tilføj(Lærer("Eva", 25, "Vej 5", ("Fysik", "Dansk")))
+    skriv_snapshot(åbnet, sti)
+    assert _indhold(åbn_snapshot(sti, skema)) == _indhold(åbnet)
+
+
+def test_forældet_snapshot_afvises(skema, tmp_path):
+    kilde = tmp_path / "personliste.csv"
+    kilde.write_text("navn,alder,adresse,indkomst\nBo,41,Vej 1,\n", encoding="utf-8")
+    sti = str(tmp_path / "personliste.bin")
+    skriv_snapshot(_register(skema), sti, kilde=str(kilde))
+    assert åbn_snapshot(sti, skema, kilde=str(kilde)) is not None
+
+    # Samme størrelse, ny mtime
+    info = os.stat(kilde)
+    os.utime(kilde, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+    assert åbn_snapshot(sti, skema, kilde=str(kilde)) is None
+
+    skriv_snapshot(_register(skema), sti, kilde=str(kilde))
+    with open(kilde, "a", encoding="utf-8") as f:
+        f.write("Ida,35,Vej 2,\n")
+    assert åbn_snapshot(sti, skema, kilde=str(kilde)) is None
+
+
+def test_andet_skema_eller_format_afvises(skema, tmp_path):
+    sti = str(tmp_path / "personliste.bin")
+    skriv_snapshot(_register(skema), sti)
+    andet = RegisterSkema({"navn": TEKST, "fag": LISTE}, {Lærer: ("navn", "fag")})
+    assert åbn_snapshot(sti, andet) is None
+    assert åbn_snapshot(str(tmp_path / "mangler.bin"), skema) is None
+    (tmp_path / "forkert.bin").write_bytes(b"navn,alder\r\nBo,41\r\n")
+    assert åbn_snapshot(str(tmp_path / "forkert.bin"), skema) is None
+
+
+def test_symboler_afkodes_dovent(skema, tmp_path):
+    sti = str(tmp_path / "personliste.bin")
+    skriv_snapshot(_register(skema), sti)
+    åbnet = åbn_snapshot(sti, skema)
+    symboler = åbnet._symboler
+    assert isinstance(symboler, MmapSymbolTabel)
+    assert symboler._værdier.count(None) == len(symboler)
+
+    assert åbnet[0].navn == "Bo"
+    assert len(symboler) - symboler._værdier.count(None) == 1
+    assert not symboler._omvendt_klar
+
+    # Tom tekst og tom liste er to forskellige symboler
+    assert åbnet[0].adresse == "" and åbnet[3].adresse == ""
+    assert åbnet[3].fag == () and åbnet[2].indkomst == ""
+    assert åbnet[1].fag == ("Dansk", "Musik")
+    assert åbnet[4].navn == "Åse æøå" and åbnet[4].adresse == "Vej\n4"
+
+    # Opslag på tekst bygger den omvendte tabel første gang
+    assert list(åbnet.find_id("navn", "Ida")) == [1]
+    assert symboler._omvendt_klar
@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+from conftest import Borger, Lærer, Person
+
+from personregister import LISTE, TEKST, PersonRegistry, RegisterSkema
+from sqlite_lager import SQLiteLager
+
+
+def _indhold(register):
+    return [register.række_felter(række_id) for række_id in register.række_id()]
+
+
+def test_ændringer_følger_med_til_databasen(skema, tmp_path):
+    sti = str(tmp_path / "personliste.db")
+    register = PersonRegistry(skema, [Person("Bo", 41, "Vej 1"), Lærer("Ida", 35, "Vej 2", ("Dansk", "Musik"))])
+    lager = SQLiteLager(sti, skema)
+    lager.følg(register)  # Tom database: registeret skrives først
+    register.tilføj(Borger("Ole", 70, "Vej 3", "200000"))
+    register.erstat(0, Lærer("Bo", 42, "Vej 1", ("Tysk",)))
+    register[1].fag = ("Musik", "Dansk", "Idræt")
+    register.fjern(2)
+    register.tilføj(Person("Kim", 30, "Vej 4"))
+    lager.luk()
+
+    lager = SQLiteLager(sti, skema)
+    genindlæst = lager.indlæs()
+    assert _indhold(genindlæst) == _indhold(register)
+    assert lager.antal() == 3
+    assert [felter["navn"] for _, _, felter in lager.find(fag="Dansk")] == ["Ida"]
+    assert [felter["navn"] for _, _, felter in lager.find(alder=(40, 50))] == ["Bo"]
+
+    # Et genåbnet lager følger videre med de id'er databasen allerede har
+    lager.følg(genindlæst)
+    genindlæst.fjern(0)
+    genindlæst.tilføj(Lærer("Eva", 25, "Vej 5", ("Fysik",)))
+    lager.luk()
+    lager = SQLiteLager(sti, skema)
+    try:
+        assert _indhold(lager.indlæs()) == _indhold(genindlæst)
+    finally:
+        lager.luk()
+
+
+def test_tabeller_og_indekser_fra_skemaet(skema, tmp_path):
+    sti = str(tmp_path / "personliste.db")
+    SQLiteLager(sti, skema).luk()
+    with sqlite3.connect(sti) as forbindelse:
+        kolonner = [række[1] for række in forbindelse.execute("PRAGMA table_info(personer)")]
+        fag = [række[1] for række in forbindelse.execute("PRAGMA table_info(fag)")]
+        indekser = {navn for (navn,) in forbindelse.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert kolonner == ["id", "type", "navn", "alder", "adresse", "indkomst"]
+    assert fag == ["person_id", "nr", "fag"]
+    assert {"personer_type", "personer_navn", "personer_alder", "fag_idx"} <= indekser
+
+
+def test_database_til_andet_skema_afvises(skema, tmp_path):
+    sti = str(tmp_path / "personliste.db")
+    SQLiteLager(sti, skema).luk()
+    andet = RegisterSkema({"navn": TEKST, "fag": LISTE}, {Lærer: ("navn", "fag")})
+    with pytest.raises(ValueError, match="passer ikke"):
+        SQLiteLager(sti, andet)
@@ -0,0 +1,104 @@
+import asyncio
+import contextlib
+import socket
+import threading
+import time
+
+import pytest
+from conftest import opret_person
+
+from journal import Journal
+from kommandoer import Kommandomotor
+from personregister import PersonRegistry
+from tjeneste import Registerklient, Registertjeneste
+from validering import ValideringsRapport
+
+
+@pytest.fixture
+def tjeneste(skema, tmp_path):
+    """En kørende tjeneste på en Unix-socket; giver (adresse, fil, register, tjeneste)."""
+    fil = str(tmp_path / "personliste.csv")
+    register = PersonRegistry(skema)
+    lager = Journal(fil, lambda personer, sti: None)
+    lager.følg(register)
+    tjeneste = Registertjeneste(register, Kommandomotor(register, opret_person), lager, fil)
+    adresse = f"unix:{tmp_path / 'tjeneste.sock'}"
+
+    async def kør():
+        with contextlib.suppress(asyncio.CancelledError):
+            await tjeneste.kør(adresse)
+
+    loop = asyncio.new_event_loop()
+    opgave = loop.create_task(kør())
+    tråd = threading.Thread(target=loop.run_until_complete, args=(opgave,), daemon=True)
+    tråd.start()
+    for _ in range(100):
+        if (tmp_path / "tjeneste.sock").exists():
+            break
+        time.sleep(0.02)
+    yield adresse, fil, register, tjeneste
+    loop.call_soon_threadsafe(opgave.cancel)
+    tråd.join(5)
+    loop.close()
+    lager.luk()
+
+
+def test_fejl_i_en_skrivning_stopper_ikke_skrivekøen(skema, tjeneste, monkeypatch):
+    adresse, fil, register, _ = tjeneste
+    klient = Registerklient(adresse, skema, opret_person, fil)
+    try:
+        tilføj = register.tilføj
+
+        def fejlende_tilføj(person):
+            if person.navn == "Fejl":
+                raise OverflowError("for stort")
+            return tilføj(person)
+
+        monkeypatch.setattr(register, "tilføj", fejlende_tilføj)
+        with pytest.raises(ValueError, match="for stort"):
+            klient.udfør({"kommando": "tilføj", "navn": "Fejl", "alder": 1, "adresse": ""})
+        with pytest.raises(ValueError, match="Mangler feltet"):
+            klient.udfør({"kommando": "tilføj", "navn": "Bo"})
+        # Skrivekøen kører stadig
+        assert klient.udfør({"kommando": "tilføj", "navn": "Bo", "alder": 41, "adresse": "Vej 1"}) == 0
+        assert [person.navn for person in klient.register] == ["Bo"]
+    finally:
+        klient.luk()
+
+
+def test_afbrudt_abonnent_fjernes_under_skrivebatch(skema, tjeneste, caplog):
+    adresse, fil, register, tjenesten = tjeneste
+    væk = Registerklient(adresse, skema, opret_person, fil)
+    klient = Registerklient(adresse, skema, opret_person, fil)
+    try:
+        def afbryd(hændelse, række_id):
+            # Abonnenten forsvinder efter første ændring i batchen
+            if række_id == 0:
+                væk.luk()
+
+        register.tilføj_lytter(afbryd)
+        kommandoer = [{"kommando": "tilføj", "navn": f"P{i}", "alder": 30, "adresse": ""} for i in range(200)]
+        with caplog.at_level("WARNING", logger="asyncio"):
+            klient.udfør_batch(kommandoer, ValideringsRapport())
+            klient.synkroniser()
+        assert len(klient.register) == 200
+        assert len(tjenesten._abonnenter) == 1
+        assert not [post for post in caplog.records if post.name == "asyncio"]
+    finally:
+        register.fjern_lytter(afbryd)
+        klient.luk()
+
+
+def test_find_uden_svar_giver_none(skema, tmp_path):
+    # Noget lytter på adressen, men svarer aldrig på "hej"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as lytter:
+        sti = str(tmp_path / "stum.sock")
+        lytter.bind(sti)
+        lytter.listen()
+        start = time.monotonic()
+        assert Registerklient.find(f"unix:{sti}", skema, opret_person) is None
+        assert time.monotonic() - start < 10
+
+
+def test_find_uden_tjeneste_giver_none(skema, tmp_path):
+    assert Registerklient.find(f"unix:{tmp_path / 'ingen.sock'}", skema, opret_person) is None
@@ -0,0 +1,19 @@
+from personregister import TAL_MAX, PersonRegistry
+from validering import ValideringsRapport, importer_rækker, valider_alder
+
+
+def test_valider_alder():
+    rapport = ValideringsRapport()
+    værdier = ["41", 7, "-1", "fire", str(TAL_MAX), str(TAL_MAX + 1)]
+    assert valider_alder(værdier, range(1, 7), rapport) == [41, 7, None, None, TAL_MAX, None]
+    assert [fejl.række for fejl in rapport.fejl] == [3, 4, 6]
+
+
+def test_importer_rækker_afviser_for_stor_alder(skema):
+    register = PersonRegistry(skema)
+    rapport = ValideringsRapport()
+    rækker = [{"navn": "Bo", "alder": "41"}, {"navn": "Ida", "alder": "3000000000"}, {"navn": "Ole"}]
+    importer_rækker(rækker, lambda row: ("Person", {"navn": row["navn"], "alder": row["alder"]}), register, rapport)
+    assert len(register) == 1
+    assert rapport.antal_rækker == 3
+    assert rapport.afviste_rækker == [2, 3]
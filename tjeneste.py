@@ -0,0 +1,330 @@
+"""
+Registertjeneste: ét fælles register i hukommelsen for mange lokale klienter.
+
+Kører flere terminalprogrammer hver med sin egen kopi af personliste.csv,
+vinder den der gemmer sidst. I stedet holder tjenesten det eneste register
+og lageret (journal eller SQLite), og klienterne taler med den over TCP
+("127.0.0.1:8765") eller en Unix-socket ("unix:/sti/til/socket").
+
+Protokollen er JSON-linjer. En anmodning er en kommando fra kommandoer.py
+(tilføj, opgrader, fjern, gem) eller en af tjenestens egne ("hej",
+"register", "ping", "batch", "flet") med et løbenummer "nr"; svaret har
+samme "nr" og enten "svar" eller "fejl". Derudover sendes hver ændring af
+registeret som {"hændelse": ..., "id": ..., "type": ..., "felter": ...} til
+de klienter der har hentet registeret, så deres lokale kopi følger med.
+
+Læsninger besvares straks. Skrivninger lægges i en kø, som én opgave
+udfører i batches: alle ventende ændringer anvendes, journalen fsync'es én
+gang for hele batchen, og først derefter svares der. Fuld gemning sker som
+hidtil i Autogem's baggrundstråd.
+"""
+import asyncio
+import base64
+import json
+import os
+import socket
+from array import array
+from itertools import islice
+
+from dubletter import Dubletsøgning, flet
+from kommandoer import Kommandomotor
+from personregister import TAL, PersonRegistry
+from validering import ValideringsRapport
+
+STANDARD_ADRESSE = os.environ.get("PERSONREGISTER_TJENESTE", "127.0.0.1:8765")
+# Højst så mange ventende skrivninger anvendes før der fsync'es og svares
+MAKS_BATCH = 1000
+# Længste linje der modtages (en batch af kommandoer kan være stor)
+MAKS_LINJE = 64 * 1024 * 1024
+# En klient der ikke læser sine hændelser, og som har mere end dette i kø, afbrydes
+MAKS_BUFFER = 64 * 1024 * 1024
+# Sekunder en klient venter på forbindelsen og tjenestens "hej" - find() ved
+# hver opstart må ikke hænge på en adresse hvor intet svarer
+FORBIND_TIMEOUT = 2.0
+
+# Kommandoer der ændrer registeret og derfor går gennem skrivekøen
+SKRIVNINGER = frozenset(("tilføj", "opgrader", "fjern", "gem", "batch", "flet"))
+
+
+def _del_adresse(adresse):
+    """("unix", sti) eller ("tcp", (vært, port))."""
+    if adresse.startswith("unix:"):
+        return "unix", adresse[len("unix:"):]
+    vært, _, port = adresse.rpartition(":")
+    return "tcp", (vært or "127.0.0.1", int(port))
+
+
+def _json_linje(besked):
+    return (json.dumps(besked, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# --- Tjenesten ---
+class Registertjeneste:
+    """
+    register: det fælles PersonRegistry. motor: en Kommandomotor på det.
+    lager: Journal eller SQLiteLager der allerede følger registeret.
+    fil: datafilen - klienterne tjekker at de taler med tjenesten for samme fil.
+
+    En batch fra en klient gemmer ikke hele registeret bagefter (som i
+    batchkørsel) - journalen sikrer ændringerne, og Autogem gemmer som altid.
+    """
+    def __init__(self, register, motor, lager, fil):
+        self.register = register
+        self.motor = motor
+        self._batchmotor = Kommandomotor(register, motor.opret_person)
+        self.lager = lager
+        self.fil = fil
+        self._abonnenter = set()
+        self._kø = None
+        register.tilføj_lytter(self._hændelse)
+
+    async def kør(self, adresse=STANDARD_ADRESSE):
+        """Lyt på adressen indtil opgaven afbrydes."""
+        self._kø = asyncio.Queue()
+        skriver = asyncio.create_task(self._skriver())
+        slags, mål = _del_adresse(adresse)
+        if slags == "unix":
+            if os.path.exists(mål):
+                os.remove(mål)  # Efterladt af en tjeneste der ikke blev lukket pænt
+            server = await asyncio.start_unix_server(self._forbindelse, mål, limit=MAKS_LINJE)
+        else:
+            server = await asyncio.start_server(self._forbindelse, *mål, limit=MAKS_LINJE)
+        print(f"Registertjenesten lytter på {adresse} ({len(self.register)} personer fra '{self.fil}')")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            skriver.cancel()
+            self.register.fjern_lytter(self._hændelse)
+            if slags == "unix" and os.path.exists(mål):
+                os.remove(mål)
+
+    # --- Hændelser til klienternes kopier ---
+    def _hændelse(self, hændelse, række_id):
+        if not self._abonnenter:
+            return
+        besked = {"hændelse": hændelse, "id": række_id}
+        if hændelse != "fjern":
+            besked["type"], besked["felter"] = self.register.række_felter(række_id)
+        data = _json_linje(besked)
+        for writer in list(self._abonnenter):
+            # Kører midt i en skrivebatch, så forbindelsens egen oprydning kommer
+            # først bagefter - en klient der er væk, fjernes allerede her
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > MAKS_BUFFER:
+                self._abonnenter.discard(writer)
+                writer.close()
+            else:
+                writer.write(data)
+
+    def _kolonner(self):
+        """Hele registeret som kolonner (base64) og symboler - inkl. fjernede rækker, så id'erne passer."""
+        register = self.register
+        symboler = register._symboler
+        return {
+            "typer": base64.b64encode(register._typer.tobytes()).decode("ascii"),
+            "kolonner": {felt: base64.b64encode(kolonne.tobytes()).decode("ascii")
+                         for felt, kolonne in register._kolonner.items()},
+            "symboler": [symboler.værdi(symbol_id) for symbol_id in range(len(symboler))],
+        }
+
+    # --- Forbindelser ---
+    async def _forbindelse(self, reader, writer):
+        try:
+            while linje := await reader.readline():
+                try:
+                    anmodning = json.loads(linje)
+                    nr = anmodning.pop("nr", None)
+                except (ValueError, AttributeError):
+                    writer.write(_json_linje({"nr": None, "fejl": "Anmodningen skal være et JSON-objekt"}))
+                    continue
+                art = anmodning.get("kommando")
+                if art in SKRIVNINGER:
+                    svar = asyncio.get_running_loop().create_future()
+                    await self._kø.put((anmodning, svar))
+                    besked = await svar
+                else:
+                    besked = self._læs(art, anmodning, writer)
+                besked["nr"] = nr
+                writer.write(_json_linje(besked))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self._abonnenter.discard(writer)
+            writer.close()
+
+    def _læs(self, art, anmodning, writer):
+        if art == "hej":
+            skema = self.register.skema
+            return {"svar": {"fil": self.fil, "typer": skema.type_navne, "felter": skema.felter}}
+        if art == "register":
+            # Kolonnerne og abonnementet hænger sammen: ingen ændring kan falde imellem
+            self._abonnenter.add(writer)
+            return {"svar": self._kolonner()}
+        if art == "ping":
+            return {"svar": len(self.register)}
+        return {"fejl": f"Ukendt kommando: {art!r}"}
+
+    # --- Skrivninger ---
+    async def _skriver(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            ventende = [await self._kø.get()]
+            while len(ventende) < MAKS_BATCH and not self._kø.empty():
+                ventende.append(self._kø.get_nowait())
+            svar = [self._skriv(anmodning) for anmodning, _ in ventende]
+            try:
+                # Én fsync for hele batchen, før nogen får at vide at deres ændring er gemt
+                await loop.run_in_executor(None, self.lager.synkroniser)
+            except Exception as fejl:
+                svar = [{"fejl": f"Ændringen er ikke sikret på disken: {fejl}"} for _ in ventende]
+            for (_, fremtid), besked in zip(ventende, svar):
+                if not fremtid.done():
+                    fremtid.set_result(besked)
+
+    def _skriv(self, anmodning):
+        """Svaret på én skrivning. Ingen fejl må slippe ud og stoppe _skriver."""
+        art = anmodning["kommando"]
+        try:
+            if art == "batch":
+                rapport = ValideringsRapport()
+                udført = self._batchmotor.udfør_batch(anmodning.get("kommandoer", []), rapport)
+                return {"svar": {"udført": udført, "antal": rapport.antal_rækker, "fejl": rapport.fejl}}
+            if art == "flet":
+                return {"svar": flet(self.register, Dubletsøgning(self.register))}
+            return {"svar": self.motor.udfør(anmodning)}
+        except KeyError as fejl:
+            return {"fejl": f"Mangler feltet {fejl}"}
+        except Exception as fejl:
+            return {"fejl": str(fejl) or type(fejl).__name__}
+
+
+# --- Klienten ---
+class Registerklient:
+    """
+    Forbindelse til en kørende Registertjeneste med en lokal kopi af registeret.
+
+    Kopien (self.register) bruges til alt der kun læser - visning, statistik,
+    dubletsøgning - og holdes ajour med tjenestens hændelser, som anvendes
+    hver gang klienten venter på et svar (synkroniser() henter dem blot).
+    udfør() og udfør_batch() har samme brugsflade som Kommandomotor, så
+    menuen kan bruge klienten i stedet for en lokal motor.
+    """
+    def __init__(self, adresse, skema, opret, fil=None, timeout=FORBIND_TIMEOUT):
+        slags, mål = _del_adresse(adresse)
+        if slags == "unix":
+            self._sokkel = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sokkel.settimeout(timeout)
+            try:
+                self._sokkel.connect(mål)
+            except OSError:
+                self._sokkel.close()
+                raise
+        else:
+            self._sokkel = socket.create_connection(mål, timeout=timeout)
+        self._ind = self._sokkel.makefile("rb")
+        self._nr = 0
+        self.adresse = adresse
+        self.skema = skema
+        self.opret_person = opret
+        try:
+            hej = self._send({"kommando": "hej"})
+        except (OSError, ValueError):
+            # Også socket.timeout (en OSError): noget lytter, men det er ikke en tjeneste der svarer
+            self.luk()
+            raise
+        # Herefter kan svar (fx en stor batch) tage længere tid
+        self._sokkel.settimeout(None)
+        if hej["typer"] != skema.type_navne or hej["felter"] != skema.felter:
+            self.luk()
+            raise ValueError(f"Tjenesten på {adresse} bruger et andet skema ({', '.join(hej['typer'])})")
+        if fil is not None and os.path.abspath(hej["fil"]) != os.path.abspath(fil):
+            self.luk()
+            raise ValueError(f"Tjenesten på {adresse} kører for '{hej['fil']}', ikke '{fil}'")
+        self.fil = hej["fil"]
+        self.register = self._hent_register()
+        self._motor = Kommandomotor(self.register, opret)
+
+    @classmethod
+    def find(cls, adresse, skema, opret, fil=None):
+        """
+        En klient hvis der kører en tjeneste for samme skema og fil på adressen,
+        ellers None - også når intet svarer inden for FORBIND_TIMEOUT.
+        """
+        try:
+            return cls(adresse, skema, opret, fil)
+        except (OSError, ValueError):
+            return None
+
+    def _send(self, anmodning):
+        self._nr += 1
+        self._sokkel.sendall(_json_linje({**anmodning, "nr": self._nr}))
+        while True:
+            linje = self._ind.readline()
+            if not linje:
+                raise ConnectionError(f"Forbindelsen til registertjenesten på {self.adresse} blev afbrudt")
+            besked = json.loads(linje)
+            if "hændelse" in besked:
+                self._anvend(besked)
+            elif besked.get("nr") == self._nr:
+                if "fejl" in besked:
+                    raise ValueError(besked["fejl"])
+                return besked["svar"]
+
+    def _hent_register(self):
+        data = self._send({"kommando": "register"})
+        typer = array("B", base64.b64decode(data["typer"]))
+        kolonner = {}
+        for felt, slags in self.skema.felter.items():
+            kolonne = array("i" if slags == TAL else "I")
+            kolonne.frombytes(base64.b64decode(data["kolonner"][felt]))
+            kolonner[felt] = kolonne
+        # JSON har ingen tupler - lister i symboltabellen var tupler (LISTE-felter)
+        symboler = [tuple(værdi) if isinstance(værdi, list) else værdi for værdi in data["symboler"]]
+        register = PersonRegistry(self.skema)
+        register._tilføj_kolonner(typer, kolonner, symboler)
+        return register
+
+    def _anvend(self, besked):
+        register = self.register
+        hændelse, række_id = besked["hændelse"], besked["id"]
+        if hændelse == "tilføj":
+            register.tilføj_række(besked["type"], besked["felter"])
+        elif hændelse == "fjern":
+            register.fjern(række_id)
+        else:
+            register.erstat_række(række_id, besked["type"], besked["felter"])
+
+    # --- Samme brugsflade som Kommandomotor ---
+    def opret(self, kommando):
+        """Validér en tilføj-kommando lokalt (uden at sende den), som Kommandomotor.opret."""
+        return self._motor.opret(kommando)
+
+    def udfør(self, kommando):
+        return self._send(kommando)
+
+    def udfør_batch(self, kommandoer, rapport, batch_størrelse=MAKS_BATCH * 10):
+        """Send kommandoerne i bidder; fejlene lægges i rapporten med numre for hele strømmen."""
+        udført = {}
+        kommandoer = iter(kommandoer)
+        while bid := list(islice(kommandoer, batch_størrelse)):
+            svar = self._send({"kommando": "batch", "kommandoer": bid})
+            forskydning = rapport.antal_rækker
+            for række, felt, værdi, besked in svar["fejl"]:
+                rapport.tilføj(række + forskydning, felt, værdi, besked)
+            rapport.antal_rækker += svar["antal"]
+            for art, antal in svar["udført"].items():
+                udført[art] = udført.get(art, 0) + antal
+        return udført
+
+    def flet(self):
+        """Find og flet dubletter i tjenestens register. Returnerer (fjernet, konflikter)."""
+        return tuple(self._send({"kommando": "flet"}))
+
+    def synkroniser(self):
+        """Hent og anvend de ændringer andre klienter har lavet siden sidst."""
+        self._send({"kommando": "ping"})
+
+    def luk(self):
+        self._ind.close()
+        self._sokkel.close()
@@ -0,0 +1,191 @@
+"""
+Batch-validering af alder, email og telefon.
+
+Reglerne er de samme som i property-setterne i Person og Lærer, men en hel
+kolonne valideres i én gennemgang med prækompilerede mønstre. Ugyldige
+værdier rejser ingen undtagelse - de noteres i en ValideringsRapport, så en
+stor import kan køre færdig og bagefter vise alle afviste rækker.
+"""
+import csv
+import re
+from collections import namedtuple
+
+from personregister import TAL_MAX
+
+EMAIL_MØNSTER = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_TELEFON_RENS = str.maketrans("", "", " -")
+
+# Rækker læses og valideres i bidder af denne størrelse
+STANDARD_BATCH = 10_000
+
+Valideringsfejl = namedtuple("Valideringsfejl", ["række", "felt", "værdi", "besked"])
+
+
+class ValideringsRapport:
+    """
+    Samler alle valideringsfejl fra en import.
+    Rækkenumre tælles fra 1 = første række efter hovedlinjen.
+    """
+    def __init__(self):
+        self.fejl = []
+        self.antal_rækker = 0
+
+    def __len__(self):
+        return len(self.fejl)
+
+    def tilføj(self, række, felt, værdi, besked):
+        self.fejl.append(Valideringsfejl(række, felt, værdi, besked))
+
+    @property
+    def afviste_rækker(self):
+        return sorted({fejl.række for fejl in self.fejl})
+
+    def skriv_csv(self, sti):
+        with open(sti, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(Valideringsfejl._fields)
+            writer.writerows(self.fejl)
+
+    def __str__(self):
+        return f"{len(self.afviste_rækker)} af {self.antal_rækker} rækker afvist ({len(self.fejl)} fejl)"
+
+
+# --- Kolonnevalidatorer ---
+# Hver validator får en kolonne af værdier og de tilhørende rækkenumre og
+# returnerer de normaliserede værdier - None hvor værdien er ugyldig.
+
+def valider_alder(værdier, rækker, rapport):
+    resultat = []
+    tilføj = resultat.append
+    for række, værdi in zip(rækker, værdier):
+        # Den almindelige vej (et heltal som tekst) klarer sig uden try/except
+        if værdi.__class__ is int:
+            alder = værdi
+        elif isinstance(værdi, str) and værdi.isascii() and værdi.isdigit():
+            alder = int(værdi)
+        else:
+            try:
+                alder = int(værdi)
+            except (TypeError, ValueError):
+                rapport.tilføj(række, "alder", værdi, "Alder skal være et heltal")
+                tilføj(None)
+                continue
+        if alder < 0:
+            rapport.tilføj(række, "alder", værdi, "Alder kan ikke være negativ")
+            tilføj(None)
+        elif alder > TAL_MAX:
+            # Større tal kan ikke ligge i registerets TAL-kolonne
+            rapport.tilføj(række, "alder", værdi, f"Alder kan højst være {TAL_MAX}")
+            tilføj(None)
+        else:
+            tilføj(alder)
+    return resultat
+
+
+def valider_email(værdier, rækker, rapport):
+    resultat = []
+    tilføj = resultat.append
+    match = EMAIL_MØNSTER.match
+    for række, værdi in zip(rækker, værdier):
+        if not isinstance(værdi, str):
+            rapport.tilføj(række, "email", værdi, "Email skal være tekst")
+            tilføj(None)
+        elif match(værdi) is None:
+            rapport.tilføj(række, "email", værdi, "Email skal have formatet: navn@domæne.dk")
+            tilføj(None)
+        else:
+            tilføj(værdi)
+    return resultat
+
+
+def valider_telefon(værdier, rækker, rapport):
+    resultat = []
+    tilføj = resultat.append
+    for række, værdi in zip(rækker, værdier):
+        renset = værdi.translate(_TELEFON_RENS) if isinstance(værdi, str) else ""
+        if not renset.isdigit():
+            rapport.tilføj(række, "telefon", værdi, "Telefonnummer må kun indeholde tal")
+            tilføj(None)
+        elif len(renset) != 8:
+            rapport.tilføj(række, "telefon", værdi, "Dansk telefonnummer skal være 8 cifre")
+            tilføj(None)
+        else:
+            tilføj(f"{renset[:2]} {renset[2:4]} {renset[4:6]} {renset[6:]}")
+    return resultat
+
+
+VALIDATORER = {
+    "alder": valider_alder,
+    "email": valider_email,
+    "telefon": valider_telefon,
+}
+
+
+# --- Hele rækker ---
+def valider_rækker(rækker, rapport, første_række=1, numre=None):
+    """
+    Validér en batch af (type_navn, felter)-rækker kolonne for kolonne.
+    Felterne normaliseres på stedet; kun de gyldige rækker returneres.
+    numre er rækkenumrene til rapporten, hvis de ikke følger efter hinanden
+    fra første_række (fx når kun nogle af filens rækker indlæses).
+    """
+    afvist = set()
+    for felt, validator in VALIDATORER.items():
+        positioner = [i for i, (_, felter) in enumerate(rækker) if felt in felter]
+        if not positioner:
+            continue
+        værdier = [rækker[i][1][felt] for i in positioner]
+        if numre is None:
+            felt_numre = [første_række + i for i in positioner]
+        else:
+            felt_numre = [numre[i] for i in positioner]
+        for i, ny in zip(positioner, validator(værdier, felt_numre, rapport)):
+            if ny is None:
+                afvist.add(i)
+            else:
+                rækker[i][1][felt] = ny
+    if not afvist:
+        return rækker
+    return [række for i, række in enumerate(rækker) if i not in afvist]
+
+
+def importer_rækker(rækker, række_til_felter, register, rapport, batch_størrelse=STANDARD_BATCH):
+    """
+    Læs rå rækker (fx fra csv.DictReader) ind i et PersonRegistry i batches.
+    Gyldige rækker tilføjes direkte som kolonner - uden at oprette objekter og
+    uden at køre setterne igen. Afviste rækker noteres i rapporten.
+    """
+    nummer = rapport.antal_rækker + 1
+    batch = []
+    start = nummer
+    fejl_start = len(rapport.fejl)
+    for row in rækker:
+        try:
+            batch.append(række_til_felter(row))
+        except KeyError as fejl:
+            rapport.tilføj(nummer, None, None, f"Mangler feltet {fejl}")
+            batch.append(None)
+        except ValueError as fejl:
+            # Rækken kan ikke oversættes, fx en ukendt type
+            rapport.tilføj(nummer, None, None, str(fejl))
+            batch.append(None)
+        nummer += 1
+        if len(batch) >= batch_størrelse:
+            _importer_batch(batch, start, register, rapport, fejl_start)
+            batch = []
+            start = nummer
+            fejl_start = len(rapport.fejl)
+    if batch:
+        _importer_batch(batch, start, register, rapport, fejl_start)
+    rapport.antal_rækker = nummer - 1
+
+
+def _importer_batch(batch, start, register, rapport, fejl_start):
+    if None in batch:
+        # Rækker der ikke kunne læses er allerede i rapporten; deres plads bevares
+        # med en tom type, så rækkenumrene stadig passer
+        batch = [række if række is not None else (None, {}) for række in batch]
+    # Rækkerne kodes kolonnevis i én omgang i stedet for én række ad gangen
+    register.tilføj_rækker([række for række in valider_rækker(batch, rapport, start) if række[0] is not None])
+    # Batchens fejl sorteres efter række, så rapporten ikke afhænger af batchstørrelsen
+    rapport.fejl[fejl_start:] = sorted(rapport.fejl[fejl_start:], key=lambda fejl: fejl.række)